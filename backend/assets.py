@@ -0,0 +1,141 @@
+"""
+Estáticos con huella y precomprimidos.
+
+    python -m backend.assets
+
+copia frontend/static/{css,js} a config.ASSETS_DIR con el hash del
+contenido en el nombre (css/main.css → css/main.3f2a9c01be.css), escribe a
+su lado las versiones .gz y .br (esta solo con el paquete `brotli`) y un
+manifest.json con la correspondencia. Las plantillas piden las rutas con
+{{ asset('css/main.css') }}:
+
+  - con manifest → /assets/css/main.3f2a9c01be.css, servido con caché de un
+    año (el nombre cambia con el contenido) y en .br/.gz ya comprimido según
+    Accept-Encoding, sin comprimir en cada petición;
+  - sin manifest (no se ha construido) → /static/css/main.css, como siempre.
+
+Se vuelve a construir tras cada cambio de CSS/JS; las versiones antiguas
+se borran.
+"""
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+from backend.compresion import brotli_disponible, codificacion_aceptada, comprimir
+from backend.config import config
+
+_ORIGEN = os.path.join(config.BASE_DIR, "frontend", "static")
+_CARPETAS = ("css", "js")
+_MANIFEST = "manifest.json"
+_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_EXTENSIONES = {"br": ".br", "gzip": ".gz"}
+
+_manifest = {"mtime": None, "rutas": {}}
+
+
+# ─── Construcción ─────────────────────────────────────────────────────────────
+
+def _con_huella(relativa: str, datos: bytes) -> str:
+    base, ext = os.path.splitext(relativa)
+    return f"{base}.{hashlib.sha256(datos).hexdigest()[:10]}{ext}"
+
+
+def construir(destino: str = None) -> dict:
+    """Genera los estáticos con huella y sus .gz/.br. Devuelve el manifest."""
+    destino = destino or config.ASSETS_DIR
+    rutas = {}
+    for carpeta in _CARPETAS:
+        for raiz, _, ficheros in os.walk(os.path.join(_ORIGEN, carpeta)):
+            for nombre in sorted(ficheros):
+                origen = os.path.join(raiz, nombre)
+                relativa = os.path.relpath(origen, _ORIGEN).replace(os.sep, "/")
+                with open(origen, "rb") as f:
+                    datos = f.read()
+                rutas[relativa] = _con_huella(relativa, datos)
+                salida = os.path.join(destino, rutas[relativa])
+                os.makedirs(os.path.dirname(salida), exist_ok=True)
+                with open(salida, "wb") as f:
+                    f.write(datos)
+                # Nivel máximo: se comprime una vez por versión
+                with open(salida + ".gz", "wb") as f:
+                    f.write(comprimir(datos, "gzip", nivel=9))
+                if brotli_disponible():
+                    with open(salida + ".br", "wb") as f:
+                        f.write(comprimir(datos, "br", nivel=11))
+
+    # Borrar versiones de construcciones anteriores
+    vigentes = set(rutas.values())
+    for carpeta in _CARPETAS:
+        for raiz, _, ficheros in os.walk(os.path.join(destino, carpeta)):
+            for nombre in ficheros:
+                ruta = os.path.join(raiz, nombre)
+                relativa = os.path.relpath(ruta, destino).replace(os.sep, "/")
+                for ext in _EXTENSIONES.values():
+                    if relativa.endswith(ext):
+                        relativa = relativa[:-len(ext)]
+                if relativa not in vigentes:
+                    os.remove(ruta)
+
+    temporal = os.path.join(destino, _MANIFEST + ".tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(rutas, f, indent=2, sort_keys=True)
+    os.replace(temporal, os.path.join(destino, _MANIFEST))
+    return rutas
+
+
+# ─── Uso desde las plantillas ─────────────────────────────────────────────────
+
+def _rutas() -> dict:
+    """Manifest actual; se relee si se ha reconstruido con el servidor en marcha."""
+    try:
+        mtime = os.stat(os.path.join(config.ASSETS_DIR, _MANIFEST)).st_mtime
+    except FileNotFoundError:
+        return {}
+    if mtime != _manifest["mtime"]:
+        with open(os.path.join(config.ASSETS_DIR, _MANIFEST), encoding="utf-8") as f:
+            _manifest["rutas"] = json.load(f)
+        _manifest["mtime"] = mtime
+    return _manifest["rutas"]
+
+
+def url_asset(relativa: str) -> str:
+    """'css/main.css' → URL con huella si está construido, /static/... si no."""
+    con_huella = _rutas().get(relativa)
+    if con_huella:
+        return f"/assets/{con_huella}"
+    return f"/static/{relativa}"
+
+
+def servir_asset(ruta: str):
+    """/assets/<ruta>: la versión .br/.gz precomprimida si el cliente la acepta."""
+    original = safe_join(config.ASSETS_DIR, ruta)
+    if original is None or ruta.endswith(tuple(_EXTENSIONES.values())) or not os.path.isfile(original):
+        abort(404)
+    codificacion = codificacion_aceptada(request.accept_encodings)
+    fichero = original
+    if codificacion and os.path.isfile(original + _EXTENSIONES[codificacion]):
+        fichero = original + _EXTENSIONES[codificacion]
+    else:
+        codificacion = ""
+
+    resp = send_file(fichero, mimetype=mimetypes.guess_type(original)[0], conditional=True)
+    resp.headers["Cache-Control"] = _CACHE_CONTROL
+    resp.vary.add("Accept-Encoding")
+    if codificacion:
+        resp.headers["Content-Encoding"] = codificacion
+    return resp
+
+
+def init_assets(app):
+    app.add_url_rule("/assets/<path:ruta>", "assets", servir_asset)
+    app.jinja_env.globals["asset"] = url_asset
+
+
+if __name__ == "__main__":
+    manifest = construir()
+    print(f"[Assets] {len(manifest)} ficheros en {config.ASSETS_DIR}"
+          f"{'' if brotli_disponible() else ' (sin brotli: solo .gz)'}")
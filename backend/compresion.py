@@ -0,0 +1,111 @@
+"""
+Compresión de las respuestas dinámicas (JSON, HTML…) según Accept-Encoding.
+
+Brotli si el cliente lo acepta y el paquete `brotli` está instalado; si no,
+gzip. Solo se comprimen cuerpos de al menos config.COMPRESION_MIN_BYTES y
+de los tipos de _TIPOS; el audio, los ficheros (send_file) y las respuestas
+en streaming pasan tal cual. Los estáticos con huella ya van comprimidos de
+antemano (ver backend/assets).
+
+Las respuestas con ETag (las de la caché de la API) se comprimen una sola
+vez: el resultado se guarda por (etag, codificación) en un LRU pequeño.
+"""
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+from backend.config import config
+from backend.services import metricas
+
+try:
+    import brotli
+    _BROTLI_DISPONIBLE = True
+except ImportError:
+    _BROTLI_DISPONIBLE = False
+
+_TIPOS = {
+    "application/json", "text/html", "text/css", "text/plain",
+    "application/javascript", "text/javascript", "image/svg+xml",
+}
+_MEMO_MAX = 256
+
+_memo = OrderedDict()       # (etag, codificación) → cuerpo comprimido
+_lock = threading.Lock()
+
+
+def brotli_disponible() -> bool:
+    return _BROTLI_DISPONIBLE
+
+
+def codificacion_aceptada(accept_encodings) -> str:
+    """'br', 'gzip' o '' según Accept-Encoding y lo disponible en el servidor."""
+    if _BROTLI_DISPONIBLE and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return ""
+
+
+def comprimir(datos: bytes, codificacion: str, nivel: int = None) -> bytes:
+    if codificacion == "br":
+        return brotli.compress(datos, quality=nivel if nivel is not None else config.COMPRESION_NIVEL_BROTLI)
+    return gzip.compress(datos, compresslevel=nivel if nivel is not None else config.COMPRESION_NIVEL_GZIP, mtime=0)
+
+
+def _comprimir_memo(datos: bytes, codificacion: str, etag: str) -> bytes:
+    if not etag:
+        return comprimir(datos, codificacion)
+    clave = (etag, codificacion)
+    with _lock:
+        if clave in _memo:
+            _memo.move_to_end(clave)
+            return _memo[clave]
+    comprimido = comprimir(datos, codificacion)
+    with _lock:
+        _memo[clave] = comprimido
+        while len(_memo) > _MEMO_MAX:
+            _memo.popitem(last=False)
+    return comprimido
+
+
+def _comprimir_respuesta(resp):
+    if (
+        resp.status_code < 200 or resp.status_code in (204, 206, 304)
+        or resp.direct_passthrough or resp.is_streamed
+        or resp.mimetype not in _TIPOS
+        or "Content-Encoding" in resp.headers
+    ):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    codificacion = codificacion_aceptada(request.accept_encodings)
+    if not codificacion:
+        return resp
+    datos = resp.get_data()
+    if len(datos) < config.COMPRESION_MIN_BYTES:
+        return resp
+
+    etag, debil = resp.get_etag()
+    comprimido = _comprimir_memo(datos, codificacion, etag)
+    if len(comprimido) >= len(datos):
+        return resp
+    resp.set_data(comprimido)
+    resp.headers["Content-Encoding"] = codificacion
+    if etag and not debil:
+        # Mismo contenido, otros bytes: el ETag fuerte pasa a débil (If-None-Match compara en débil)
+        resp.set_etag(etag, weak=True)
+    metricas.sumar("compresion_bytes", f"{codificacion}_entrada", len(datos))
+    metricas.sumar("compresion_bytes", f"{codificacion}_salida", len(comprimido))
+    return resp
+
+
+def init_compresion(app):
+    """Registra la compresión como after_request (se ejecuta tras los demás hooks)."""
+    app.after_request(_comprimir_respuesta)
+
+
+def estado() -> dict:
+    with _lock:
+        memo = len(_memo)
+    return {"brotli": brotli_disponible(), "min_bytes": config.COMPRESION_MIN_BYTES, "memo": memo}
@@ -19,6 +19,12 @@ class Config:
         "DATABASE_URL",
         f"sqlite:///{os.path.join(_BASE_DIR, 'data', 'carnavalplay.db')}"
     )
+    SQLITE_PERFIL = os.getenv("SQLITE_PERFIL", "rendimiento")          # rendimiento | seguro
+    SQLITE_PRAGMAS = os.getenv("SQLITE_PRAGMAS", "")                    # ajustes extra: "cache_size=-20000,synchronous=FULL"
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+    DB_POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", 8))
+    DB_ESCRITURA_TIMEOUT = int(os.getenv("DB_ESCRITURA_TIMEOUT", 60))   # s esperando la conexión de escritura
+    DB_AVISO_CONSULTAS = int(os.getenv("DB_AVISO_CONSULTAS", 20))       # avisar si una petición hace más
 
     # YouTube Data API v3 — valor en .env
     YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY", "")
@@ -33,6 +39,61 @@ class Config:
     GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
     GROQ_MODEL = "llama3-70b-8192"
 
+    # Biblioteca de audio (data/audio/{modalidad}/{grupo}/*.mp3)
+    AUDIO_DIR = os.getenv("AUDIO_DIR", os.path.join(_BASE_DIR, "data", "audio"))
+    AUDIO_SCAN_INTERVAL = int(os.getenv("AUDIO_SCAN_INTERVAL", 60))   # segundos entre escaneos
+    AUDIO_META_WORKERS = int(os.getenv("AUDIO_META_WORKERS", 4))      # hilos leyendo cabeceras MP3
+    AUDIO_FD_MAX = int(os.getenv("AUDIO_FD_MAX", 64))                 # ficheros abiertos en el pool de streaming
+
+    # Versiones de menor bitrate (64/96 kbps) generadas con ffmpeg
+    FFMPEG_PATH = os.getenv("FFMPEG_PATH", "")                        # vacío = buscar en el PATH
+    AUDIO_TRANSCODE_WORKERS = int(os.getenv("AUDIO_TRANSCODE_WORKERS", 2))
+    AUDIO_TRANSCODE_COLA = int(os.getenv("AUDIO_TRANSCODE_COLA", 32))   # versiones pendientes como mucho
+    RENDICIONES_DIR = os.getenv("RENDICIONES_DIR", os.path.join(_BASE_DIR, "data", "audio_versiones"))
+    RENDICIONES_MAX_MB = int(os.getenv("RENDICIONES_MAX_MB", 2048))
+
+    # Caché de respuestas de la API (memoria, fichero, redis, ninguno)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria")
+    CACHE_TTL = int(os.getenv("CACHE_TTL", 300))                 # segundos
+    CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", 512))
+    CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(_BASE_DIR, "data", "cache"))
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+    # Canal Live 24/7
+    LIVE_MARGEN = int(os.getenv("LIVE_MARGEN", 5))      # s tras el final del vídeo antes de pasar al siguiente
+    LIVE_COLA = int(os.getenv("LIVE_COLA", 5))          # vídeos elegidos por adelantado
+    LIVE_MODO = os.getenv("LIVE_MODO", "cola")          # cola (un proceso) | determinista (varios procesos)
+    LIVE_HORARIO_TTL = int(os.getenv("LIVE_HORARIO_TTL", 10))   # s que cada proceso reutiliza la programación leída
+    LIVE_SEMILLA = int(os.getenv("LIVE_SEMILLA", 0))            # determinista: semilla de la programación inicial
+    LIVE_EPOCA = os.getenv("LIVE_EPOCA", "2025-01-01T00:00:00")  # determinista: inicio (UTC) de la programación inicial
+
+    # Servidor (ver backend/servidor.py): desarrollo | waitress | eventlet | gevent
+    SERVIDOR = os.getenv("SERVIDOR", "desarrollo")
+    SERVIDOR_HILOS = int(os.getenv("SERVIDOR_HILOS", 32))              # waitress: hilos atendiendo peticiones
+    SERVIDOR_CONEXIONES = int(os.getenv("SERVIDOR_CONEXIONES", 1000))  # conexiones simultáneas máximas
+    SERVIDOR_KEEPALIVE = int(os.getenv("SERVIDOR_KEEPALIVE", 75))      # s de inactividad antes de cerrar una conexión
+    SERVIDOR_APAGADO = int(os.getenv("SERVIDOR_APAGADO", 15))          # s esperando peticiones en curso al apagar
+    SOCKETIO_ASYNC_MODE = os.getenv(
+        "SOCKETIO_ASYNC_MODE", "threading" if SERVIDOR in ("desarrollo", "waitress") else SERVIDOR
+    )
+    # Varios procesos: cola compartida para los emits (redis://…, amqp://…); vacío = salas por proceso
+    SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+    SOCKETIO_CANAL = os.getenv("SOCKETIO_CANAL", "carnavalix")         # canal pub/sub (separa despliegues)
+    CHAT_BOT = os.getenv("CHAT_BOT", "True").lower() == "true"         # con varios procesos, activo en uno solo
+
+    # Diario del chat (services/chat_diario): los mensajes se emiten al momento y se guardan por lotes
+    CHAT_LOTE = int(os.getenv("CHAT_LOTE", 200))                 # mensajes por transacción (y umbral de volcado)
+    CHAT_VOLCADO_MS = int(os.getenv("CHAT_VOLCADO_MS", 250))     # intervalo máximo entre volcados
+    CHAT_COLA_MAX = int(os.getenv("CHAT_COLA_MAX", 5000))        # mensajes sin volcar antes de frenar
+    CHAT_COLA_ESPERA = float(os.getenv("CHAT_COLA_ESPERA", 2))   # s que espera un mensaje con la cola llena
+    CHAT_IDS_BLOQUE = int(os.getenv("CHAT_IDS_BLOQUE", 100))     # ids reservados por transacción
+
+    # Compresión de respuestas y estáticos precomprimidos (python -m backend.assets)
+    COMPRESION_MIN_BYTES = int(os.getenv("COMPRESION_MIN_BYTES", 1024))      # cuerpos menores van sin comprimir
+    COMPRESION_NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", 6))
+    COMPRESION_NIVEL_BROTLI = int(os.getenv("COMPRESION_NIVEL_BROTLI", 5))   # 0-11; más alto = más CPU por petición
+    ASSETS_DIR = os.getenv("ASSETS_DIR", os.path.join(_BASE_DIR, "frontend", "build"))
+
     # Scheduler
     SCRAPER_INTERVAL_HOURS = int(os.getenv("SCRAPER_INTERVAL_HOURS", 24))
 
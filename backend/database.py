@@ -1,15 +1,259 @@
-from sqlalchemy import create_engine, text
+"""
+Engines y sesiones de la base de datos.
+
+Con SQLite hay tres engines sobre el mismo fichero:
+  - engine:            lectura/escritura, peticiones que modifican (POST/PATCH…)
+  - engine_lectura:    conexiones `mode=ro` para los GET (pool propio, no
+                       compiten con los escritores gracias a WAL)
+  - engine_escritura:  una única conexión para las escrituras por lotes de
+                       los trabajos en segundo plano (scrapers, importador,
+                       índice de audio): se turnan en el pool en lugar de
+                       pelearse por el lock de SQLite. Se usa solo con
+                       escritura(): una transacción corta por lote, nunca
+                       abierta durante E/S de red o de disco
+
+Cada conexión aplica los PRAGMA del perfil config.SQLITE_PERFIL (más los
+ajustes de config.SQLITE_PRAGMAS). estado_pools() expone ocupación de los
+pools, esperas para obtener conexión y errores "database is locked".
+
+Las rutas HTTP usan db_peticion(): una sesión por petición guardada en
+flask.g, cerrada en el teardown y con un contador de consultas que
+main.py devuelve en la cabecera X-DB-Queries (útil para cazar N+1).
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from flask import g, has_request_context, request
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import QueuePool
 from backend.config import config
 
 
-engine = create_engine(
-    config.DATABASE_URL,
-    connect_args={"check_same_thread": False},  # SQLite
-    echo=config.DEBUG,
-)
+# ─── Perfil de SQLite ─────────────────────────────────────────────────────────
+
+PERFILES_SQLITE = {
+    # Servidor de catálogo: WAL, fsync solo en checkpoints, cachés generosas
+    "rendimiento": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,           # KiB (negativo) → 64 MB por conexión
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,           # ms esperando un lock antes de fallar
+    },
+    # Máxima durabilidad (fsync en cada commit), por ejemplo en discos poco fiables
+    "seguro": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+}
+
+# journal_mode persiste en el fichero y no se puede fijar desde una conexión mode=ro
+_PRAGMAS_SOLO_ESCRITURA = {"journal_mode"}
+
+
+def _pragmas() -> dict:
+    pragmas = dict(PERFILES_SQLITE.get(config.SQLITE_PERFIL, PERFILES_SQLITE["rendimiento"]))
+    for ajuste in filter(None, (a.strip() for a in config.SQLITE_PRAGMAS.split(","))):
+        clave, _, valor = ajuste.partition("=")
+        pragmas[clave.strip()] = valor.strip()
+    return pragmas
+
+
+# ─── Métricas de pools ────────────────────────────────────────────────────────
+
+_metricas_db: dict = {}         # nombre de engine → contadores
+_lock_metricas = threading.Lock()
+
+
+def _anotar(nombre: str, **valores):
+    with _lock_metricas:
+        m = _metricas_db.setdefault(nombre, {
+            "checkouts": 0, "espera_total_ms": 0.0, "espera_max_ms": 0.0,
+            "timeouts": 0, "bloqueos": 0,
+        })
+        espera = valores.pop("espera_ms", None)
+        if espera is not None:
+            m["checkouts"] += 1
+            m["espera_total_ms"] += espera
+            m["espera_max_ms"] = max(m["espera_max_ms"], espera)
+        for clave, n in valores.items():
+            m[clave] += n
+
+
+class _PoolMedido(QueuePool):
+    """QueuePool que mide cuánto espera cada petición de conexión."""
+    nombre = "general"
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except exc.TimeoutError:
+            _anotar(self.nombre, timeouts=1)
+            raise
+        _anotar(self.nombre, espera_ms=(time.perf_counter() - inicio) * 1000)
+        return conexion
+
+
+def _pool_medido(nombre: str):
+    return type(f"Pool_{nombre}", (_PoolMedido,), {"nombre": nombre})
+
+
+def _crear_engine(nombre: str, solo_lectura: bool = False, **opciones):
+    url = make_url(config.DATABASE_URL)
+    es_sqlite = url.get_backend_name() == "sqlite"
+    kwargs = {"echo": config.DEBUG}
+    if es_sqlite:
+        kwargs["connect_args"] = {"check_same_thread": False}
+        if url.database and url.database != ":memory:":
+            kwargs.update(poolclass=_pool_medido(nombre), **opciones)
+        if solo_lectura:
+            uri = Path(url.database).resolve().as_uri() + "?mode=ro"
+            kwargs["creator"] = lambda: sqlite3.connect(uri, uri=True, check_same_thread=False)
+    else:
+        kwargs.update(opciones)
+
+    eng = create_engine(url, **kwargs)
+
+    if es_sqlite:
+        pragmas = {
+            k: v for k, v in _pragmas().items()
+            if not (solo_lectura and k in _PRAGMAS_SOLO_ESCRITURA)
+        }
+
+        @event.listens_for(eng, "connect")
+        def _al_conectar(dbapi_conn, _registro):
+            cursor = dbapi_conn.cursor()
+            for clave, valor in pragmas.items():
+                cursor.execute(f"PRAGMA {clave}={valor}")
+            cursor.close()
+
+    @event.listens_for(eng, "handle_error")
+    def _al_error(contexto):
+        if "database is locked" in str(contexto.original_exception):
+            _anotar(nombre, bloqueos=1)
+
+    return eng
+
+
+def _url_es_fichero_sqlite() -> bool:
+    url = make_url(config.DATABASE_URL)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+engine = _crear_engine("general", pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_POOL_OVERFLOW)
+
+if _url_es_fichero_sqlite():
+    engine_lectura = _crear_engine(
+        "lectura", solo_lectura=True,
+        pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_POOL_OVERFLOW,
+    )
+    engine_escritura = _crear_engine(
+        "escritura", pool_size=1, max_overflow=0, pool_timeout=config.DB_ESCRITURA_TIMEOUT,
+    )
+else:
+    # Otros motores (o SQLite en memoria): un único engine para todo
+    engine_lectura = engine_escritura = engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLectura = sessionmaker(autocommit=False, autoflush=False, bind=engine_lectura)
+SessionEscritura = sessionmaker(autocommit=False, autoflush=False, bind=engine_escritura)
+
+
+@contextmanager
+def escritura():
+    """
+    Sesión del escritor para un lote: confirma al salir (o deshace si hay
+    error) y devuelve la conexión. Dentro solo van operaciones de BD; la
+    E/S lenta (yt-dlp, HTTP, disco) se hace antes, fuera del bloque.
+
+        with escritura() as db:
+            db.add_all(videos)
+    """
+    db = SessionEscritura()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def sesion_para(metodo: str):
+    """Sesión de solo lectura para GET/HEAD; de lectura-escritura para el resto."""
+    return SessionLectura() if metodo in ("GET", "HEAD") else SessionLocal()
+
+
+# ─── Sesión por petición ──────────────────────────────────────────────────────
+
+def db_peticion():
+    """
+    Sesión de la petición HTTP en curso: se crea en el primer uso (de solo
+    lectura si es GET/HEAD) y la cierra cerrar_db_peticion al terminar.
+    La comparten load_user y el handler: una sola conexión por petición.
+    """
+    if "db" not in g:
+        g.db = sesion_para(request.method)
+        g.db_consultas = 0
+    return g.db
+
+
+def cerrar_db_peticion(error=None):
+    """teardown_appcontext: deshace lo no confirmado y devuelve la conexión al pool."""
+    db = g.pop("db", None)
+    if db is None:
+        return
+    if error is not None:
+        db.rollback()
+    db.close()
+
+
+def consultas_peticion() -> int:
+    """Nº de sentencias SQL ejecutadas en la petición en curso."""
+    return g.get("db_consultas", 0)
+
+
+def _contar_consulta(conn, cursor, sentencia, parametros, contexto, executemany):
+    if has_request_context():
+        g.db_consultas = g.get("db_consultas", 0) + 1
+
+
+for _eng in {engine, engine_lectura, engine_escritura}:
+    event.listen(_eng, "before_cursor_execute", _contar_consulta)
+
+
+def estado_pools() -> dict:
+    """Ocupación de cada pool y esperas/bloqueos acumulados (para admin)."""
+    engines = {"general": engine, "lectura": engine_lectura, "escritura": engine_escritura}
+    resultado = {}
+    for nombre, eng in engines.items():
+        pool = eng.pool
+        with _lock_metricas:
+            metricas = dict(_metricas_db.get(nombre, {}))
+        if metricas.get("checkouts"):
+            metricas["espera_media_ms"] = round(metricas["espera_total_ms"] / metricas["checkouts"], 3)
+        resultado[nombre] = {
+            "pool": pool.status(),
+            "en_uso": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            **metricas,
+        }
+    resultado["pragmas"] = _pragmas()
+    return resultado
+
+
+def cerrar_engines():
+    """Cierra las conexiones de los tres pools (al apagar el servidor)."""
+    for eng in (engine, engine_lectura, engine_escritura):
+        eng.dispose()
 
 
 class Base(DeclarativeBase):
@@ -28,22 +272,156 @@ def get_db():
 def init_db():
     """Crea todas las tablas si no existen."""
     from backend import models  # noqa: F401 — importar para registrar modelos
+    from backend.services import catalogo  # noqa: F401 — versionado/invalidación de cachés
     Base.metadata.create_all(bind=engine)
+    _migrar_columnas(engine)
+    _crear_indices(engine)
     _enable_fts(engine)
     print("[DB] Base de datos inicializada correctamente.")
 
 
+def _migrar_columnas(eng):
+    """
+    Añade a las tablas existentes las columnas nuevas de los modelos
+    (create_all no altera tablas) y rellena la clave `busqueda` pendiente.
+    """
+    from sqlalchemy import inspect
+    from backend.models import _CAMPOS_BUSQUEDA
+    from backend.services.busqueda import normalizar
+
+    insp = inspect(eng)
+    with eng.connect() as conn:
+        for tabla in Base.metadata.sorted_tables:
+            existentes = {c["name"] for c in insp.get_columns(tabla.name)}
+            for col in tabla.columns:
+                if col.name in existentes or col.primary_key or col.unique:
+                    continue
+                tipo = col.type.compile(dialect=eng.dialect)
+                conn.execute(text(f'ALTER TABLE {tabla.name} ADD COLUMN "{col.name}" {tipo}'))
+                print(f"[DB] Columna añadida: {tabla.name}.{col.name}")
+
+        conn.connection.dbapi_connection.create_function("normalizar", 1, normalizar)
+        for modelo, campos in _CAMPOS_BUSQUEDA.items():
+            concat = " || ' ' || ".join(f"coalesce({c}, '')" for c in campos)
+            conn.execute(text(
+                f"UPDATE {modelo.__tablename__} SET busqueda = normalizar({concat}) "
+                f"WHERE busqueda IS NULL"
+            ))
+        conn.commit()
+
+
+# Índices de una sola columna sustituidos por los compuestos de models.py
+_INDICES_OBSOLETOS = ("ix_videos_año", "ix_videos_fase", "ix_videos_modalidad", "ix_letras_año")
+
+
+def _crear_indices(eng):
+    """
+    Crea los índices declarados en los modelos que falten en tablas ya
+    existentes y elimina los que han quedado cubiertos por un compuesto.
+    """
+    with eng.connect() as conn:
+        for nombre in _INDICES_OBSOLETOS:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{nombre}"'))
+        for tabla in Base.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                indice.create(bind=conn, checkfirst=True)
+        conn.execute(text("PRAGMA optimize"))   # estadísticas para el planificador
+        conn.commit()
+
+
+# Tablas FTS: nombre → (tabla de contenido, columnas indexadas, tokenizer)
+_TOKENIZER_TEXTO = "unicode61 remove_diacritics 2"
+_FTS_TABLAS = {
+    "videos_fts": ("videos", ("titulo", "descripcion", "grupo_nombre"), _TOKENIZER_TEXTO),
+    "letras_fts": ("letras", ("titulo", "contenido", "grupo_nombre"), _TOKENIZER_TEXTO),
+    # Índices de trigramas sobre la clave normalizada (búsqueda difusa)
+    "videos_trgm": ("videos", ("busqueda",), "trigram"),
+    "letras_trgm": ("letras", ("busqueda",), "trigram"),
+    "grupos_trgm": ("grupos", ("busqueda",), "trigram"),
+}
+
+
 def _enable_fts(eng):
-    """Crea índice FTS5 para búsqueda de texto completo en vídeos y letras."""
+    """
+    Crea índice FTS5 para búsqueda de texto completo en vídeos y letras,
+    y los triggers que lo mantienen sincronizado con INSERT/UPDATE/DELETE.
+    Las tablas creadas con otro tokenizer se recrean; las tablas nuevas o
+    sin triggers (BD antigua) se reconstruyen desde su tabla de contenido.
+    """
+    from backend.services.busqueda import TRIGRAM_DISPONIBLE
+
     with eng.connect() as conn:
-        # FTS para vídeos
-        conn.execute(text("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts
-            USING fts5(titulo, descripcion, grupo_nombre, content='videos', content_rowid='id')
-        """))
-        # FTS para letras
-        conn.execute(text("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS letras_fts
-            USING fts5(titulo, contenido, grupo_nombre, content='letras', content_rowid='id')
-        """))
+        existentes = dict(conn.execute(
+            text("SELECT name, sql FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        ).all())
+
+        reconstruir = []
+        for fts, (tabla, columnas, tokenizer) in _FTS_TABLAS.items():
+            if tokenizer == "trigram" and not TRIGRAM_DISPONIBLE:
+                continue
+            if fts in existentes and f"tokenize='{tokenizer}'" not in existentes[fts]:
+                conn.execute(text(f"DROP TABLE {fts}"))
+                for sufijo in ("ai", "ad", "au"):
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{sufijo}"))
+                existentes.pop(f"{fts}_ai", None)
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{', '.join(columnas)}, content='{tabla}', content_rowid='id', "
+                f"tokenize='{tokenizer}')"
+            ))
+            if f"{fts}_ai" not in existentes:
+                reconstruir.append(fts)
+            for sql in _sql_triggers_fts(fts, tabla, columnas):
+                conn.execute(text(sql))
+
+        if reconstruir:
+            print(f"[DB] Reconstruyendo índices de búsqueda: {', '.join(reconstruir)}...")
+            _reconstruir_fts(conn, reconstruir)
+        conn.commit()
+
+
+def _sql_triggers_fts(fts: str, tabla: str, columnas: tuple) -> list:
+    """Triggers de sincronización para una tabla FTS5 de contenido externo."""
+    cols = ", ".join(columnas)
+    nuevos = ", ".join(f"new.{c}" for c in columnas)
+    viejos = ", ".join(f"old.{c}" for c in columnas)
+    borrar = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {viejos});"
+    insertar = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {nuevos});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN {insertar} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN {borrar} END",
+        # Solo al cambiar columnas indexadas (los votos/vistas no tocan el índice)
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {tabla} "
+        f"BEGIN {borrar} {insertar} END",
+    ]
+
+
+def _reconstruir_fts(conn, tablas=None):
+    existentes = {
+        r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+    }
+    for fts in tablas or _FTS_TABLAS:
+        if fts not in existentes:
+            continue
+        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('optimize')"))
+
+
+def reconstruir_fts():
+    """Reconstruye por completo los índices FTS y de trigramas (BD existentes o tras cargas masivas)."""
+    with engine.connect() as conn:
+        _reconstruir_fts(conn)
         conn.commit()
+    print("[DB] Índices FTS reconstruidos.")
+
+
+if __name__ == "__main__":
+    # python -m backend.database reconstruir-fts
+    import sys
+    if sys.argv[1:] == ["reconstruir-fts"]:
+        # Importar vía paquete: este fichero corre como __main__ y tendría otra Base
+        from backend import database
+        database.init_db()
+        database.reconstruir_fts()
+    else:
+        print("Uso: python -m backend.database reconstruir-fts")
@@ -1,10 +1,19 @@
+from backend.config import config
+from backend import servidor
+
+servidor.parchear()     # eventlet/gevent: antes de importar Flask y la red de la stdlib
+
 from flask import Flask
 from flask_socketio import SocketIO
 from flask_login import LoginManager
-from backend.config import config
-from backend.database import init_db
-
-socketio = SocketIO(cors_allowed_origins="*", async_mode="threading")
+from backend.database import init_db, db_peticion, cerrar_db_peticion, consultas_peticion, cerrar_engines
+from backend.services import metricas
+
+socketio = SocketIO(
+    cors_allowed_origins="*",
+    async_mode=config.SOCKETIO_ASYNC_MODE,
+    **servidor.opciones_socketio(),     # cola compartida entre procesos (SOCKETIO_MESSAGE_QUEUE)
+)
 login_manager = LoginManager()
 
 
@@ -16,6 +25,10 @@ def create_app() -> Flask:
     )
     app.secret_key = config.SECRET_KEY
 
+    # JSON compacto (orjson si está instalado)
+    from backend.serializacion import ProveedorJSON
+    app.json = ProveedorJSON(app)
+
     # Inicializar base de datos
     init_db()
 
@@ -26,13 +39,32 @@ def create_app() -> Flask:
 
     @login_manager.user_loader
     def load_user(user_id):
-        from backend.database import SessionLocal
         from backend.models import Usuario
-        db = SessionLocal()
-        try:
-            return db.query(Usuario).get(int(user_id))
-        finally:
-            db.close()
+        return db_peticion().get(Usuario, int(user_id))
+
+    # Sesión de BD por petición (ver database.db_peticion)
+    app.teardown_appcontext(cerrar_db_peticion)
+
+    # Compresión gzip/brotli (registrada primero: after_request corre en orden
+    # inverso, así comprime la respuesta ya completa) y estáticos con huella
+    from backend.compresion import init_compresion
+    from backend.assets import init_assets
+    init_compresion(app)
+    init_assets(app)
+    app.jinja_env.globals["socketio_transportes"] = servidor.transportes_socketio()
+
+    @app.after_request
+    def _cabecera_consultas(resp):
+        from flask import request
+        n = consultas_peticion()
+        resp.headers["X-DB-Queries"] = str(n)
+        if n > config.DB_AVISO_CONSULTAS:
+            print(f"[DB] {n} consultas en {request.method} {request.full_path} (¿N+1?)")
+        # Tamaño de las respuestas JSON por endpoint (ver /admin/metricas)
+        if resp.is_json and not resp.direct_passthrough and request.endpoint:
+            metricas.sumar("api_bytes", request.endpoint, resp.calculate_content_length() or 0)
+            metricas.sumar("api_respuestas", request.endpoint)
+        return resp
 
     # Registrar blueprints
     from backend.routes.videos import bp as videos_bp
@@ -76,13 +108,26 @@ def create_app() -> Flask:
     def letras_page():
         return render_template("letras.html")
 
+    # Al apagar (servidor.arrancar): cerrar los pools de BD lo último
+    servidor.al_apagar(cerrar_engines)
+
     # SocketIO
     socketio.init_app(app)
     from backend.routes import chat as chat_events  # noqa: F401
 
-    # Monitor del canal Live 24/7
-    from backend.services.live_service import iniciar_monitor
+    # Diario del chat: vuelca los mensajes por lotes; al apagar, lo pendiente
+    from backend.services.chat_diario import iniciar_diario, detener_diario
+    iniciar_diario()
+    servidor.al_apagar(detener_diario)
+
+    # Planificador del canal Live 24/7
+    from backend.services.live_service import iniciar_monitor, detener_monitor
     iniciar_monitor()
+    servidor.al_apagar(detener_monitor)
+
+    # Índice de la biblioteca de audio (escaneo incremental en segundo plano)
+    from backend.services.audio_catalogo import iniciar_escaner
+    iniciar_escaner()
 
     # Scheduler de tareas (scraping automático)
     if not config.DEBUG:
@@ -93,11 +138,4 @@ def create_app() -> Flask:
 
 
 if __name__ == "__main__":
-    app = create_app()
-    socketio.run(
-        app,
-        host=config.HOST,
-        port=config.PORT,
-        debug=config.DEBUG,
-        use_reloader=False,
-    )
+    servidor.arrancar(create_app(), socketio)
@@ -1,11 +1,39 @@
 from datetime import datetime
+from urllib.parse import quote
 from sqlalchemy import (
     Column, Integer, String, Text, Boolean, DateTime,
-    Float, ForeignKey, UniqueConstraint
+    Float, ForeignKey, UniqueConstraint, Index, event
 )
 from sqlalchemy.orm import relationship
 from flask_login import UserMixin
 from backend.database import Base
+from backend.services.busqueda import normalizar
+
+
+class ProyeccionDict:
+    """
+    Serialización desde una proyección de columnas (listados): la clase
+    declara CAMPOS_DICT y la query selecciona columnas_dict() en lugar de
+    la entidad, así no se construye un objeto ORM por fila.
+    `campos` (de ?fields=) limita la proyección a un subconjunto.
+    """
+    CAMPOS_DICT = ()
+
+    @classmethod
+    def campos_pedidos(cls, parametro) -> tuple:
+        """'titulo,año' → ('id', 'titulo', 'año'). Sin parámetro, todos; se ignoran los desconocidos."""
+        if not parametro:
+            return cls.CAMPOS_DICT
+        pedidos = {c.strip() for c in parametro.split(",")}
+        return tuple(c for c in cls.CAMPOS_DICT if c in pedidos or c == "id")
+
+    @classmethod
+    def columnas_dict(cls, campos: tuple = None) -> list:
+        return [getattr(cls, c) for c in campos or cls.CAMPOS_DICT]
+
+    @classmethod
+    def dict_desde_fila(cls, fila, campos: tuple = None) -> dict:
+        return dict(zip(campos or cls.CAMPOS_DICT, fila))
 
 
 class Usuario(UserMixin, Base):
@@ -49,6 +77,7 @@ class Grupo(Base):
     autores = Column(String(500))
     descripcion = Column(Text)
     imagen_url = Column(String(500))
+    busqueda = Column(String(700))                   # nombre + autores normalizados
     created_at = Column(DateTime, default=datetime.utcnow)
 
     videos = relationship("Video", back_populates="grupo")
@@ -65,10 +94,28 @@ class Grupo(Base):
         }
 
 
-class Video(Base):
+class Video(ProyeccionDict, Base):
     """Vídeo COAC indexado desde YouTube."""
     __tablename__ = "videos"
-    __table_args__ = (UniqueConstraint("youtube_id", name="uq_youtube_id"),)
+    __table_args__ = (
+        UniqueConstraint("youtube_id", name="uq_youtube_id"),
+        # Orden del catálogo y clave del cursor: (año DESC, vistas DESC, id DESC).
+        # Cada filtro de igualdad del listado lleva detrás las columnas de orden,
+        # así SQLite busca por el filtro y recorre el índice ya ordenado.
+        Index("ix_videos_año_vistas_id", "año", "vistas", "id"),
+        Index("ix_videos_modalidad_orden", "modalidad", "año", "vistas", "id"),
+        Index("ix_videos_fase_orden", "fase", "año", "vistas", "id"),
+        Index("ix_videos_tipo_orden", "tipo", "año", "vistas", "id"),
+        Index("ix_videos_grupo_orden", "grupo_id", "año", "vistas", "id"),
+        Index("ix_videos_destacado_orden", "destacado", "año", "vistas", "id"),
+        Index("ix_videos_letra_orden", "tiene_letra", "año", "vistas", "id"),
+        # Búsqueda por agrupación (busqueda.filtro_grupos): grupo_id OR grupo_nombre
+        Index("ix_videos_grupo_nombre", "grupo_nombre"),
+        # Ranking: ORDER BY puntuacion_media DESC, total_votos DESC
+        Index("ix_videos_ranking", "puntuacion_media", "total_votos"),
+        Index("ix_videos_modalidad_ranking", "modalidad", "puntuacion_media", "total_votos"),
+        Index("ix_videos_año_ranking", "año", "puntuacion_media", "total_votos"),
+    )
 
     id = Column(Integer, primary_key=True)
     youtube_id = Column(String(20), nullable=False, unique=True, index=True)
@@ -80,14 +127,15 @@ class Video(Base):
     fecha_publicacion = Column(DateTime)
 
     # Clasificación COAC
-    año = Column(Integer, index=True)
-    fase = Column(String(50), index=True)       # preliminar, cuartos, semifinal, final, callejera
-    modalidad = Column(String(50), index=True)  # chirigota, comparsa, coro, cuarteto
+    año = Column(Integer)
+    fase = Column(String(50))       # preliminar, cuartos, semifinal, final, callejera
+    modalidad = Column(String(50))  # chirigota, comparsa, coro, cuarteto
     tipo = Column(String(20), default="coac")   # coac, callejera, especial
 
     grupo_id = Column(Integer, ForeignKey("grupos.id"), nullable=True)
     grupo_nombre = Column(String(200))           # desnormalizado para FTS
     grupo = relationship("Grupo", back_populates="videos")
+    busqueda = Column(String(700))               # titulo + grupo normalizados (sin tildes)
 
     tiene_letra = Column(Boolean, default=False)
     odysee_url = Column(String(500))
@@ -103,39 +151,40 @@ class Video(Base):
     letras = relationship("Letra", back_populates="video")
     votos = relationship("Voto", back_populates="video")
 
+    CAMPOS_DICT = (
+        "id", "youtube_id", "titulo", "thumbnail", "duracion", "año", "fase",
+        "modalidad", "tipo", "grupo_nombre", "tiene_letra", "puntuacion_media",
+        "total_votos", "odysee_url",
+    )
+
     def to_dict(self, include_letras=False):
-        d = {
-            "id": self.id,
-            "youtube_id": self.youtube_id,
-            "titulo": self.titulo,
-            "thumbnail": self.thumbnail,
-            "duracion": self.duracion,
-            "año": self.año,
-            "fase": self.fase,
-            "modalidad": self.modalidad,
-            "tipo": self.tipo,
-            "grupo_nombre": self.grupo_nombre,
-            "tiene_letra": self.tiene_letra,
-            "puntuacion_media": self.puntuacion_media,
-            "total_votos": self.total_votos,
-            "odysee_url": self.odysee_url,
-        }
+        d = {c: getattr(self, c) for c in self.CAMPOS_DICT}
         if include_letras:
             d["letras"] = [l.to_dict() for l in self.letras]
         return d
 
 
-class Letra(Base):
+class Letra(ProyeccionDict, Base):
     """Letra de una pieza del Carnaval (de Carnaval-Letras o manual)."""
     __tablename__ = "letras"
+    __table_args__ = (
+        Index("ix_letras_año_id", "año", "id"),     # orden del listado / cursor
+        Index("ix_letras_tipo_orden", "tipo_pieza", "año", "id"),
+        Index("ix_letras_video_id", "video_id"),    # /por-video y Video.letras
+        Index("ix_letras_fuente", "fuente"),        # deduplicado del importador
+        # Búsqueda por agrupación (busqueda.filtro_grupos): grupo_id OR grupo_nombre
+        Index("ix_letras_grupo_id", "grupo_id"),
+        Index("ix_letras_grupo_nombre", "grupo_nombre"),
+    )
 
     id = Column(Integer, primary_key=True)
     titulo = Column(String(300))
     tipo_pieza = Column(String(50))    # presentacion, pasodoble, cuple, estribillo, popurri, romance
     contenido = Column(Text, nullable=False)
     fuente = Column(String(200))       # URL origen
-    año = Column(Integer, index=True)
+    año = Column(Integer)
     grupo_nombre = Column(String(200))
+    busqueda = Column(String(500))     # titulo + grupo normalizados (sin tildes)
 
     video_id = Column(Integer, ForeignKey("videos.id"), nullable=True)
     grupo_id = Column(Integer, ForeignKey("grupos.id"), nullable=True)
@@ -145,15 +194,12 @@ class Letra(Base):
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    CAMPOS_DICT = ("id", "titulo", "tipo_pieza", "contenido", "año", "grupo_nombre")
+    # El listado lleva un extracto en lugar del texto completo (ver routes/letras)
+    CAMPOS_LISTADO = ("id", "titulo", "tipo_pieza", "año", "grupo_nombre")
+
     def to_dict(self):
-        return {
-            "id": self.id,
-            "titulo": self.titulo,
-            "tipo_pieza": self.tipo_pieza,
-            "contenido": self.contenido,
-            "año": self.año,
-            "grupo_nombre": self.grupo_nombre,
-        }
+        return {c: getattr(self, c) for c in self.CAMPOS_DICT}
 
 
 class Voto(Base):
@@ -173,6 +219,9 @@ class Voto(Base):
 class MensajeChat(Base):
     """Historial del chat 24/7."""
     __tablename__ = "mensajes_chat"
+    __table_args__ = (
+        Index("ix_mensajes_sala_fecha_id", "sala", "created_at", "id"),  # historial / cursor
+    )
 
     id = Column(Integer, primary_key=True)
     usuario = Column(String(100), default="Anónimo")        # nombre visible (denormalizado)
@@ -198,6 +247,29 @@ class MensajeChat(Base):
             d["avatar_emoji"] = self.usuario_obj.avatar_emoji
         return d
 
+    # Proyección para el historial: mensaje + avatar del autor en una sola
+    # consulta (LEFT JOIN usuarios), sin cargar usuario_obj mensaje a mensaje
+    @classmethod
+    def columnas_dict(cls) -> list:
+        return [cls.id, cls.usuario, cls.contenido, cls.tipo, cls.sala, cls.created_at,
+                Usuario.id, Usuario.avatar_color, Usuario.avatar_emoji]
+
+    @staticmethod
+    def dict_desde_fila(fila) -> dict:
+        id_, usuario, contenido, tipo, sala, creado, autor, color, emoji = fila
+        d = {
+            "id": id_,
+            "usuario": usuario,
+            "contenido": contenido,
+            "tipo": tipo,
+            "sala": sala,
+            "hora": creado.strftime("%H:%M"),
+        }
+        if autor is not None:
+            d["avatar_color"] = color
+            d["avatar_emoji"] = emoji
+        return d
+
 
 class EstadoLive(Base):
     """Estado del canal Live 24/7 (singleton — siempre id=1)."""
@@ -227,6 +299,80 @@ class EstadoLive(Base):
         }
 
 
+class ProgramacionLive(Base):
+    """
+    Lista fija del modo determinista del canal Live (LIVE_MODO=determinista):
+    lo que se emite es función de (videos, inicio, reloj). Rige la última fila.
+    """
+    __tablename__ = "programacion_live"
+
+    id = Column(Integer, primary_key=True)
+    semilla = Column(Integer, nullable=False)
+    inicio = Column(DateTime, nullable=False)       # época (UTC) en que empieza el primer vídeo
+    videos = Column(Text, nullable=False)           # JSON [[youtube_id, titulo, duracion, canal_fuente], …]
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class OverrideLive(Base):
+    """Vídeo forzado desde admin durante [inicio, fin), por encima de la programación determinista."""
+    __tablename__ = "overrides_live"
+    __table_args__ = (Index("ix_overrides_live_fin", "fin"),)
+
+    id = Column(Integer, primary_key=True)
+    youtube_id = Column(String(20), nullable=False)
+    titulo = Column(String(500))
+    duracion = Column(Integer, default=0)           # segundos; si la ventana es más larga, se repite
+    canal_fuente = Column(String(200), default="ONDACADIZCARNAVAL")
+    inicio = Column(DateTime, nullable=False)
+    fin = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PistaAudio(Base):
+    """Pista MP3 de data/audio/{modalidad}/{grupo}/ indexada por el escáner de audio."""
+    __tablename__ = "pistas_audio"
+    __table_args__ = (
+        Index("ix_pistas_grupo_orden", "modalidad", "grupo", "numero", "archivo"),
+        Index("ix_pistas_pista_id", "pista_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    pista_id = Column(String(12))                             # id estable: sha1(ruta)[:12]
+    ruta = Column(String(700), nullable=False, unique=True)   # relativa a data/audio, con '/'
+    modalidad = Column(String(50), nullable=False)            # nombre de la carpeta: chirigotas, comparsas…
+    grupo = Column(String(300), nullable=False)               # nombre de la carpeta del grupo
+    archivo = Column(String(300), nullable=False)
+    numero = Column(Integer)                                  # nº de pista según el nombre de archivo
+    titulo = Column(String(300))
+    tamaño = Column(Integer)                                  # bytes
+    mtime = Column(Float)                                     # st_mtime del fichero indexado
+    duracion = Column(Integer)                                # segundos (None = desconocida)
+    bitrate = Column(Integer)                                 # kbps medio (None = pendiente, 0 = ilegible)
+    inicio_audio = Column(Integer)                            # tramo de audio puro [inicio, fin):
+    fin_audio = Column(Integer)                               # sin etiquetas ID3 ni trama Xing/Info
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def url(self) -> str:
+        # URL con codificación para caracteres especiales
+        return "/api/audio/file/{}/{}/{}".format(
+            quote(self.modalidad, safe=""),
+            quote(self.grupo, safe=""),
+            quote(self.archivo, safe=""),
+        )
+
+    def to_dict(self):
+        return {
+            "id": self.pista_id,
+            "titulo": self.titulo,
+            "url": self.url,
+            "numero": self.numero,
+            "tamaño": self.tamaño,
+            "duracion": self.duracion,
+            "bitrate": self.bitrate or None,
+        }
+
+
 class ConfigSistema(Base):
     """Par clave-valor para configuración dinámica desde admin."""
     __tablename__ = "config_sistema"
@@ -236,3 +382,26 @@ class ConfigSistema(Base):
     valor = Column(Text)
     descripcion = Column(String(300))
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# ─── Clave de búsqueda normalizada ────────────────────────────────────────────
+# Se recalcula en cada INSERT/UPDATE hecho con el ORM (scrapers, importador,
+# admin). Los índices *_trgm la siguen mediante triggers.
+
+_CAMPOS_BUSQUEDA = {
+    Grupo: ("nombre", "autores"),
+    Video: ("titulo", "grupo_nombre"),
+    Letra: ("titulo", "grupo_nombre"),
+}
+
+
+def _actualizar_busqueda(mapper, connection, target):
+    campos = _CAMPOS_BUSQUEDA[type(target)]
+    clave = normalizar(" ".join(getattr(target, c) or "" for c in campos))
+    if target.busqueda != clave:
+        target.busqueda = clave
+
+
+for _modelo in _CAMPOS_BUSQUEDA:
+    event.listen(_modelo, "before_insert", _actualizar_busqueda)
+    event.listen(_modelo, "before_update", _actualizar_busqueda)
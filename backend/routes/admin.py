@@ -1,12 +1,42 @@
 import re
+import threading
 from flask import Blueprint, jsonify, request, render_template
-from backend.database import SessionLocal
-from backend.models import Video, Letra, Grupo, ConfigSistema
+from backend.database import db_peticion
+from backend.models import Video, ConfigSistema
+from backend.routes.auth import es_admin_o_setup
 
 bp = Blueprint("admin", __name__)
 
 _YT_ID_RE = re.compile(r'(?:v=|youtu\.be/|/embed/|/shorts/)([a-zA-Z0-9_-]{11})')
 
+# Trabajos de mantenimiento en curso (uno de cada tipo a la vez)
+_trabajos = {"fts": threading.Lock(), "audio": threading.Lock()}
+
+
+def _sin_permiso():
+    """Respuesta 403 si la petición no es de un admin (o del setup inicial); None si puede seguir."""
+    if not es_admin_o_setup(db_peticion()):
+        return jsonify({"error": "Se requiere cuenta de administrador"}), 403
+    return None
+
+
+def _en_segundo_plano(tipo: str, nombre: str, funcion):
+    """Lanza `funcion` en un hilo y responde 202; 409 si ya hay un trabajo `tipo` en marcha."""
+    lock = _trabajos[tipo]
+    if not lock.acquire(blocking=False):
+        return jsonify({"ok": False, "error": f"{nombre}: ya está en marcha"}), 409
+
+    def _run():
+        try:
+            funcion()
+        except Exception as e:
+            print(f"[Admin] Error en {nombre}: {e}")
+        finally:
+            lock.release()
+
+    threading.Thread(target=_run, daemon=True, name=f"admin-{tipo}").start()
+    return jsonify({"ok": True, "mensaje": f"{nombre}: en marcha. Revisa la consola para ver el progreso."}), 202
+
 
 def _extraer_yt_id(valor: str) -> str:
     """Extrae el ID de YouTube de una URL completa, o devuelve el valor tal cual."""
@@ -22,16 +52,112 @@ def panel():
 
 @bp.route("/estadisticas", methods=["GET"])
 def estadisticas():
-    db = SessionLocal()
-    try:
-        return jsonify({
-            "videos": db.query(Video).count(),
-            "letras": db.query(Letra).count(),
-            "grupos": db.query(Grupo).count(),
-            "videos_con_letra": db.query(Video).filter(Video.tiene_letra == True).count(),  # noqa: E712
-        })
-    finally:
-        db.close()
+    from backend.services import estadisticas as _stats
+    db = db_peticion()
+    datos = _stats.obtener(db)
+    return jsonify({
+        "videos": datos["total_videos"],
+        "letras": datos["total_letras"],
+        "grupos": datos["total_grupos"],
+        "videos_con_letra": datos["con_letra"],
+    })
+
+
+@bp.route("/fts/reconstruir", methods=["POST"])
+def reconstruir_busqueda():
+    """
+    Reconstruye los índices FTS de vídeos y letras en segundo plano
+    (equivale a `python -m backend.database reconstruir-fts`). Responde 202.
+    """
+    denegado = _sin_permiso()
+    if denegado:
+        return denegado
+    from backend.database import reconstruir_fts
+    return _en_segundo_plano("fts", "Reconstrucción de índices FTS", reconstruir_fts)
+
+
+@bp.route("/audio/escanear", methods=["POST"])
+def escanear_audio():
+    """
+    Reescanea data/audio completo, actualiza el índice de pistas y extrae
+    metadatos, en segundo plano. Responde 202; el resumen sale por consola.
+    """
+    denegado = _sin_permiso()
+    if denegado:
+        return denegado
+    from backend.services.audio_catalogo import escanear, extraer_metadatos
+
+    def _escanear():
+        resumen = escanear(completo=True)
+        print(f"[Admin] Reescaneo de audio: {resumen}, metadatos {extraer_metadatos()}")
+
+    return _en_segundo_plano("audio", "Reescaneo de audio", _escanear)
+
+
+@bp.route("/metricas", methods=["GET"])
+def metricas():
+    """Contadores de uso del proceso (bytes de audio por pista, peticiones…)."""
+    denegado = _sin_permiso()
+    if denegado:
+        return denegado
+    from backend.services import metricas as _metricas
+    from backend.services.audio_stream import estado_pool
+    from backend.services.audio_calidades import estado as estado_versiones
+    from backend.compresion import estado as estado_compresion
+    from backend.servidor import estado_socketio
+    from backend.services.chat_diario import estado as estado_chat
+    top = request.args.get("top", 50, type=int)
+    return jsonify({
+        **_metricas.instantanea(top=top),
+        "audio_pool": estado_pool(),
+        "audio_versiones": estado_versiones(),
+        "compresion": estado_compresion(),
+        "socketio": estado_socketio(),
+        "chat_diario": estado_chat(),
+    })
+
+
+@bp.route("/cache", methods=["GET"])
+def estado_cache():
+    """Aciertos/fallos de la caché de respuestas de la API."""
+    denegado = _sin_permiso()
+    if denegado:
+        return denegado
+    from backend.services.cache_respuestas import estadisticas as _stats_cache
+    return jsonify(_stats_cache())
+
+
+@bp.route("/db/pools", methods=["GET"])
+def estado_pools():
+    """Ocupación de los pools de conexiones, esperas y bloqueos de SQLite."""
+    denegado = _sin_permiso()
+    if denegado:
+        return denegado
+    from backend.database import estado_pools as _estado_pools
+    return jsonify(_estado_pools())
+
+
+@bp.route("/db/planes", methods=["GET"])
+def planes_consulta():
+    """EXPLAIN QUERY PLAN de cada forma de consulta del catálogo; ok=false si hay scan completo."""
+    denegado = _sin_permiso()
+    if denegado:
+        return denegado
+    from backend.services.diagnostico import planes_consulta as _planes
+    db = db_peticion()
+    planes = _planes(db)
+    return jsonify({"ok": all(p["ok"] for p in planes), "consultas": planes})
+
+
+@bp.route("/db/serializacion", methods=["GET"])
+def comparar_serializacion():
+    """ms, consultas y bytes de los listados: ORM frente a proyección, letras completas frente a extracto."""
+    denegado = _sin_permiso()
+    if denegado:
+        return denegado
+    from backend.services.diagnostico import comparar_serializacion as _comparar
+    limite = min(request.args.get("limit", 200, type=int), 1000)
+    return jsonify(_comparar(db_peticion(), limite=limite))
 
 
 @bp.route("/scraper/youtube", methods=["POST"])
@@ -50,7 +176,6 @@ def lanzar_scraper_youtube():
       forzar_ytdlp true/false — omite la API y usa yt-dlp directamente
       max_videos  Máximo de vídeos al scrapear canal (defecto 200)
     """
-    import threading
     from backend.config import config as cfg
 
     data = request.json or {}
@@ -126,73 +251,63 @@ def añadir_video_manual():
     if not meta:
         return jsonify({"error": f"No se pudo obtener metadata del vídeo {youtube_id}. Comprueba que el ID es correcto."}), 400
 
-    db = SessionLocal()
-    try:
-        from backend.models import Video as V
-        existente = db.query(V).filter(V.youtube_id == youtube_id).first()
-        if existente:
-            return jsonify({"error": "El vídeo ya existe", "id": existente.id}), 409
-
-        video = V(
-            youtube_id=youtube_id,
-            titulo=meta.get("titulo", ""),
-            descripcion=meta.get("descripcion", ""),
-            thumbnail=meta.get("thumbnail", ""),
-            duracion=meta.get("duracion", 0),
-            vistas=meta.get("vistas", 0),
-            fecha_publicacion=meta.get("fecha_publicacion"),
-            año=data.get("año"),
-            fase=data.get("fase"),
-            modalidad=data.get("modalidad"),
-            tipo=data.get("tipo", "coac"),
-            grupo_nombre=data.get("grupo_nombre", ""),
-            destacado=data.get("destacado", False),
-        )
-        db.add(video)
-        db.commit()
-        return jsonify({"ok": True, "id": video.id})
-    finally:
-        db.close()
+    db = db_peticion()
+    from backend.models import Video as V
+    existente = db.query(V).filter(V.youtube_id == youtube_id).first()
+    if existente:
+        return jsonify({"error": "El vídeo ya existe", "id": existente.id}), 409
+
+    video = V(
+        youtube_id=youtube_id,
+        titulo=meta.get("titulo", ""),
+        descripcion=meta.get("descripcion", ""),
+        thumbnail=meta.get("thumbnail", ""),
+        duracion=meta.get("duracion", 0),
+        vistas=meta.get("vistas", 0),
+        fecha_publicacion=meta.get("fecha_publicacion"),
+        año=data.get("año"),
+        fase=data.get("fase"),
+        modalidad=data.get("modalidad"),
+        tipo=data.get("tipo", "coac"),
+        grupo_nombre=data.get("grupo_nombre", ""),
+        destacado=data.get("destacado", False),
+    )
+    db.add(video)
+    db.commit()
+    return jsonify({"ok": True, "id": video.id})
 
 
 @bp.route("/video/<int:video_id>", methods=["PATCH"])
 def editar_video(video_id):
     """Edita metadatos de un vídeo (año, fase, modalidad, grupo_nombre, destacado)."""
-    db = SessionLocal()
-    try:
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if not video:
-            return jsonify({"error": "No encontrado"}), 404
+    db = db_peticion()
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        return jsonify({"error": "No encontrado"}), 404
 
-        data = request.json or {}
-        for campo in ["año", "fase", "modalidad", "tipo", "grupo_nombre", "destacado", "odysee_url"]:
-            if campo in data:
-                setattr(video, campo, data[campo])
+    data = request.json or {}
+    for campo in ["año", "fase", "modalidad", "tipo", "grupo_nombre", "destacado", "odysee_url"]:
+        if campo in data:
+            setattr(video, campo, data[campo])
 
-        db.commit()
-        return jsonify({"ok": True})
-    finally:
-        db.close()
+    db.commit()
+    return jsonify({"ok": True})
 
 
 @bp.route("/video/<int:video_id>", methods=["DELETE"])
 def eliminar_video(video_id):
-    db = SessionLocal()
-    try:
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if not video:
-            return jsonify({"error": "No encontrado"}), 404
-        db.delete(video)
-        db.commit()
-        return jsonify({"ok": True})
-    finally:
-        db.close()
+    db = db_peticion()
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        return jsonify({"error": "No encontrado"}), 404
+    db.delete(video)
+    db.commit()
+    return jsonify({"ok": True})
 
 
 @bp.route("/odysee/sync", methods=["POST"])
 def sincronizar_odysee():
     """Lanza la sincronización con Odysee en segundo plano."""
-    import threading
     from backend.config import config as cfg
 
     if not cfg.ODYSEE_EMAIL or not cfg.ODYSEE_PASSWORD:
@@ -212,26 +327,20 @@ def sincronizar_odysee():
 
 @bp.route("/config", methods=["GET"])
 def get_config():
-    db = SessionLocal()
-    try:
-        items = db.query(ConfigSistema).all()
-        return jsonify({i.clave: i.valor for i in items})
-    finally:
-        db.close()
+    db = db_peticion()
+    items = db.query(ConfigSistema).all()
+    return jsonify({i.clave: i.valor for i in items})
 
 
 @bp.route("/config", methods=["POST"])
 def set_config():
-    db = SessionLocal()
-    try:
-        data = request.json or {}
-        for clave, valor in data.items():
-            item = db.query(ConfigSistema).filter(ConfigSistema.clave == clave).first()
-            if item:
-                item.valor = str(valor)
-            else:
-                db.add(ConfigSistema(clave=clave, valor=str(valor)))
-        db.commit()
-        return jsonify({"ok": True})
-    finally:
-        db.close()
+    db = db_peticion()
+    data = request.json or {}
+    for clave, valor in data.items():
+        item = db.query(ConfigSistema).filter(ConfigSistema.clave == clave).first()
+        if item:
+            item.valor = str(valor)
+        else:
+            db.add(ConfigSistema(clave=clave, valor=str(valor)))
+    db.commit()
+    return jsonify({"ok": True})
@@ -1,18 +1,22 @@
 """
 backend/routes/audio.py
-Escanea data/audio/{modalidad}/{grupo}/*.mp3 y sirve los archivos.
+Listado de data/audio/{modalidad}/{grupo}/*.mp3 (desde el índice pistas_audio)
+y servicio de los archivos.
 """
-import re
+import os
 from pathlib import Path
 from urllib.parse import quote
 
-from flask import Blueprint, jsonify, send_from_directory, current_app, abort
+from flask import Blueprint, jsonify, request, abort
+from werkzeug.security import safe_join
 
-bp = Blueprint("audio", __name__)
+from backend.config import config
+from backend.database import db_peticion
+from backend.models import PistaAudio
+from backend.services import audio_calidades, audio_stream
+from backend.services.cache_respuestas import cacheado
 
-_AUDIO_SUBDIR = Path("data") / "audio"
-# Elimina prefijo "01 - 01.- " o "01 - 01 - " del nombre de archivo
-_PREFIX_RE = re.compile(r"^\d+\s*[-–]\s*\d+[.\-]*\s*")
+bp = Blueprint("audio", __name__)
 
 ICONOS_MODALIDAD = {
     "chirigotas": "🎭",
@@ -22,24 +26,38 @@ ICONOS_MODALIDAD = {
     "romanceros":  "📜",
 }
 
+_ORDEN_PISTAS = (PistaAudio.modalidad, PistaAudio.grupo, PistaAudio.numero, PistaAudio.archivo)
+
 
 def _audio_dir() -> Path:
-    """Ruta absoluta a data/audio/ relativa al paquete backend."""
-    return Path(current_app.root_path).parent / _AUDIO_SUBDIR
+    """Ruta absoluta a data/audio/."""
+    return Path(config.AUDIO_DIR)
 
 
-def _limpiar_titulo(nombre: str) -> str:
-    """'01 - 02.- Presentación.mp3' → 'Presentación'"""
-    stem = Path(nombre).stem
-    return _PREFIX_RE.sub("", stem).strip()
+def _agrupar(pistas) -> list:
+    """Pistas ordenadas → [{modalidad, icono, grupos: [{nombre, tracks}]}]"""
+    resultado = []
+    for p in pistas:
+        if not resultado or resultado[-1]["modalidad"] != p.modalidad:
+            resultado.append({
+                "modalidad": p.modalidad,
+                "icono":     ICONOS_MODALIDAD.get(p.modalidad, "🎵"),
+                "grupos":    [],
+            })
+        grupos = resultado[-1]["grupos"]
+        if not grupos or grupos[-1]["nombre"] != p.grupo:
+            grupos.append({"nombre": p.grupo, "tracks": []})
+        grupos[-1]["tracks"].append(p.to_dict())
+    return resultado
 
 
 # ── API: listado ──────────────────────────────────────────────────────────────
 
 @bp.route("/", methods=["GET"])
+@cacheado("pistas_audio")
 def listar_audio():
     """
-    Devuelve estructura completa de data/audio/ como JSON:
+    Devuelve la biblioteca de audio como JSON:
     [
       {
         "modalidad": "chirigotas",
@@ -47,62 +65,109 @@ def listar_audio():
         "grupos": [
           {
             "nombre": "Los Yesterday - Juan Carlos Aragón",
-            "slug_url": "chirigotas/Los%20Yesterday...",
             "tracks": [
-              { "titulo": "Presentación", "url": "/api/audio/file/..." }
+              { "id": "3f9a1c0b7d2e", "titulo": "Presentación",
+                "url": "/api/audio/file/...", "numero": 1, "tamaño": 3116069,
+                "duracion": 194, "bitrate": 128 }
             ]
           }
         ]
       }
     ]
+    Filtro opcional: modalidad.
+    Con page/per_page pagina por grupos y devuelve
+    {"total_grupos", "page", "pages", "modalidades": [...]}.
     """
-    base = _audio_dir()
-    if not base.exists():
-        return jsonify([])
+    modalidad = request.args.get("modalidad")
+    page = request.args.get("page", type=int)
+
+    db = db_peticion()
+    q = db.query(PistaAudio)
+    if modalidad:
+        q = q.filter(PistaAudio.modalidad == modalidad)
+
+    if not page:
+        return jsonify(_agrupar(q.order_by(*_ORDEN_PISTAS).all()))
+
+    # Paginación por grupos (no por pistas) para no partir un álbum
+    per_page = min(request.args.get("per_page", 20, type=int), 100)
+    grupos_q = q.with_entities(PistaAudio.modalidad, PistaAudio.grupo).distinct()
+    total = grupos_q.count()
+    grupos = (
+        grupos_q.order_by(PistaAudio.modalidad, PistaAudio.grupo)
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .subquery()
+    )
+    pistas = (
+        q.join(grupos, (grupos.c.modalidad == PistaAudio.modalidad) & (grupos.c.grupo == PistaAudio.grupo))
+        .order_by(*_ORDEN_PISTAS)
+        .all()
+    )
+    return jsonify({
+        "total_grupos": total,
+        "page": page,
+        "pages": (total + per_page - 1) // per_page,
+        "modalidades": _agrupar(pistas),
+    })
+
+
+def _pistas_de(db, modalidad: str, grupo: str) -> list:
+    return (
+        db.query(PistaAudio)
+        .filter(PistaAudio.modalidad == modalidad, PistaAudio.grupo == grupo)
+        .order_by(*_ORDEN_PISTAS)
+        .all()
+    )
 
-    resultado = []
 
-    for mod_dir in sorted(base.iterdir()):
-        if not mod_dir.is_dir():
-            continue
-
-        modalidad = mod_dir.name
-        icono = ICONOS_MODALIDAD.get(modalidad, "🎵")
-        grupos = []
-
-        for grupo_dir in sorted(mod_dir.iterdir()):
-            if not grupo_dir.is_dir():
-                continue
-
-            tracks = []
-            for f in sorted(grupo_dir.iterdir()):
-                if f.suffix.lower() != ".mp3":
-                    continue
-                # URL con codificación para caracteres especiales
-                url = "/api/audio/file/{}/{}/{}".format(
-                    quote(modalidad, safe=""),
-                    quote(grupo_dir.name, safe=""),
-                    quote(f.name, safe=""),
-                )
-                tracks.append({
-                    "titulo": _limpiar_titulo(f.name),
-                    "url":    url,
-                })
-
-            if tracks:
-                grupos.append({
-                    "nombre":  grupo_dir.name,
-                    "tracks":  tracks,
-                })
-
-        if grupos:
-            resultado.append({
-                "modalidad": modalidad,
-                "icono":     icono,
-                "grupos":    grupos,
-            })
+def _tramo(p: PistaAudio) -> tuple:
+    """[inicio, fin) de la pista dentro del stream del álbum (todo el fichero si no se conoce)."""
+    if p.inicio_audio is None or p.fin_audio is None:
+        return 0, p.tamaño or 0
+    return p.inicio_audio, p.fin_audio
 
-    return jsonify(resultado)
+
+@bp.route("/grupo/<modalidad>/<grupo>", methods=["GET"])
+@cacheado("pistas_audio")
+def pistas_grupo(modalidad, grupo):
+    """
+    Lista de reproducción de un grupo (un álbum): pistas en orden con tamaño
+    y duración, totales, y la posición de cada pista (bytes y segundos) dentro
+    del stream concatenado /api/audio/album/<modalidad>/<grupo>.
+
+    Cabecera Link: rel=preload de la pista siguiente a ?actual=<id> (o de la
+    primera), para que el navegador la descargue antes de que haga falta.
+    """
+    actual = request.args.get("actual")
+    db = db_peticion()
+    pistas = _pistas_de(db, modalidad, grupo)
+    if not pistas:
+        return jsonify({"error": "Grupo no encontrado"}), 404
+
+    tracks = []
+    offset = 0
+    segundo = 0
+    for p in pistas:
+        inicio, fin = _tramo(p)
+        tracks.append({**p.to_dict(), "album_offset": offset, "album_t": segundo})
+        offset += fin - inicio
+        segundo += p.duracion or 0
+
+    ids = [p.pista_id for p in pistas]
+    siguiente = ids.index(actual) + 1 if actual in ids else 0
+    resp = jsonify({
+        "modalidad": modalidad,
+        "icono":     ICONOS_MODALIDAD.get(modalidad, "🎵"),
+        "nombre":    grupo,
+        "tracks":    tracks,
+        "tamaño":    offset,
+        "duracion":  segundo,
+        "album_url": "/api/audio/album/{}/{}".format(quote(modalidad, safe=""), quote(grupo, safe="")),
+    })
+    if siguiente < len(pistas):
+        resp.headers["Link"] = f"<{pistas[siguiente].url}>; rel=preload; as=audio"
+    return resp
 
 
 # ── Servicio de archivos MP3 ──────────────────────────────────────────────────
@@ -110,16 +175,53 @@ def listar_audio():
 @bp.route("/file/<modalidad>/<grupo>/<archivo>", methods=["GET"])
 def servir_audio(modalidad, grupo, archivo):
     """
-    Sirve el MP3 con send_from_directory.
-    Flask decodifica automáticamente la URL antes de pasarla al handler.
-    send_from_directory protege contra path traversal.
+    Sirve el MP3 con soporte de Range/If-Range (seek en el player), ver
+    services/audio_stream. Flask decodifica automáticamente la URL antes de
+    pasarla al handler; safe_join protege contra path traversal.
+
+    ?calidad=64|96|original o la cabecera Save-Data eligen una versión de
+    menor bitrate (services/audio_calidades); si aún no existe se encola y
+    se sirve el original. X-Calidad indica lo que se ha servido.
     """
-    grupo_dir = _audio_dir() / modalidad / grupo
-    if not grupo_dir.is_dir():
+    ruta = safe_join(str(_audio_dir()), modalidad, grupo, archivo)
+    if ruta is None or not os.path.isfile(ruta):
         abort(404)
-    return send_from_directory(
-        str(grupo_dir),
-        archivo,
-        mimetype="audio/mpeg",
-        conditional=True,   # soporta Range requests (seek en el player)
-    )
+
+    clave = f"{modalidad}/{grupo}/{archivo}"
+    kbps = audio_calidades.calidad_pedida(request.args, request.headers)
+    version = audio_calidades.ruta_version(ruta, kbps) if kbps else None
+    if version:
+        resp = audio_stream.responder(version, f"{clave}@{kbps}k")
+    else:
+        resp = audio_stream.responder(ruta, clave)
+    resp.headers["X-Calidad"] = f"{kbps}k" if version else "original"
+    if "calidad" not in request.args:
+        resp.vary.add("Save-Data")
+    return resp
+
+
+@bp.route("/album/<modalidad>/<grupo>", methods=["GET"])
+def servir_album(modalidad, grupo):
+    """
+    Todo el repertorio de un grupo como un único MP3 con Range: el audio de
+    cada pista (sin etiquetas ID3 ni trama Xing/Info) concatenado en orden.
+    Una sola conexión y sin huecos entre pistas; los offsets de cada pista
+    vienen en /api/audio/grupo/<modalidad>/<grupo>.
+    """
+    carpeta = safe_join(str(_audio_dir()), modalidad, grupo)
+    if carpeta is None or not os.path.isdir(carpeta):
+        abort(404)
+
+    db = db_peticion()
+    pistas = _pistas_de(db, modalidad, grupo)
+    if not pistas:
+        abort(404)
+
+    partes = []
+    for p in pistas:
+        ruta = safe_join(carpeta, p.archivo)
+        if ruta is None or not os.path.isfile(ruta):
+            continue        # borrada desde el último escaneo
+        inicio, fin = _tramo(p)
+        partes.append((ruta, inicio, fin, p.tamaño))
+    return audio_stream.responder_concatenado(partes, f"{modalidad}/{grupo}@album")
@@ -2,7 +2,7 @@ import re
 from flask import Blueprint, jsonify, request, render_template, redirect, url_for, session
 from flask_login import login_user, logout_user, login_required, current_user
 import bcrypt
-from backend.database import SessionLocal
+from backend.database import db_peticion
 from backend.models import Usuario
 
 bp = Blueprint("auth", __name__)
@@ -10,6 +10,13 @@ bp = Blueprint("auth", __name__)
 _USERNAME_RE = re.compile(r"^[a-zA-Z0-9_\-\.]{3,30}$")
 
 
+def es_admin_o_setup(db) -> bool:
+    """Admin autenticado, o cualquiera si aún no hay usuarios (setup inicial)."""
+    if current_user.is_authenticated and current_user.es_admin:
+        return True
+    return db.query(Usuario.id).first() is None
+
+
 # ─── Páginas ──────────────────────────────────────────────────────────────────
 
 @bp.route("/login")
@@ -49,26 +56,23 @@ def api_registro():
     if len(password) < 6:
         return jsonify({"error": "Contraseña mínima 6 caracteres"}), 400
 
-    db = SessionLocal()
-    try:
-        if db.query(Usuario).filter(Usuario.username == username).first():
-            return jsonify({"error": "Ese nombre de usuario ya está en uso"}), 409
-
-        pw_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-        usuario = Usuario(
-            username=username,
-            password_hash=pw_hash,
-            display_name=display_name,
-            avatar_emoji=avatar_emoji,
-            avatar_color=avatar_color,
-        )
-        db.add(usuario)
-        db.commit()
-        db.refresh(usuario)
-        login_user(usuario, remember=True)
-        return jsonify({"ok": True, "usuario": usuario.to_dict()})
-    finally:
-        db.close()
+    db = db_peticion()
+    if db.query(Usuario).filter(Usuario.username == username).first():
+        return jsonify({"error": "Ese nombre de usuario ya está en uso"}), 409
+
+    pw_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    usuario = Usuario(
+        username=username,
+        password_hash=pw_hash,
+        display_name=display_name,
+        avatar_emoji=avatar_emoji,
+        avatar_color=avatar_color,
+    )
+    db.add(usuario)
+    db.commit()
+    db.refresh(usuario)
+    login_user(usuario, remember=True)
+    return jsonify({"ok": True, "usuario": usuario.to_dict()})
 
 
 @bp.route("/api/auth/login", methods=["POST"])
@@ -80,24 +84,21 @@ def api_login():
     if not username or not password:
         return jsonify({"error": "Usuario y contraseña requeridos"}), 400
 
-    db = SessionLocal()
-    try:
-        usuario = db.query(Usuario).filter(
-            Usuario.username == username,
-            Usuario.activo == True  # noqa: E712
-        ).first()
+    db = db_peticion()
+    usuario = db.query(Usuario).filter(
+        Usuario.username == username,
+        Usuario.activo == True  # noqa: E712
+    ).first()
 
-        if not usuario or not bcrypt.checkpw(password.encode(), usuario.password_hash.encode()):
-            return jsonify({"error": "Usuario o contraseña incorrectos"}), 401
+    if not usuario or not bcrypt.checkpw(password.encode(), usuario.password_hash.encode()):
+        return jsonify({"error": "Usuario o contraseña incorrectos"}), 401
 
-        from datetime import datetime
-        usuario.last_seen = datetime.utcnow()
-        db.commit()
+    from datetime import datetime
+    usuario.last_seen = datetime.utcnow()
+    db.commit()
 
-        login_user(usuario, remember=data.get("recordar", True))
-        return jsonify({"ok": True, "usuario": usuario.to_dict()})
-    finally:
-        db.close()
+    login_user(usuario, remember=data.get("recordar", True))
+    return jsonify({"ok": True, "usuario": usuario.to_dict()})
 
 
 @bp.route("/api/auth/logout", methods=["POST"])
@@ -120,22 +121,19 @@ def api_yo():
 def api_actualizar_perfil():
     """Actualiza display_name, avatar_emoji, avatar_color."""
     data = request.json or {}
-    db = SessionLocal()
-    try:
-        usuario = db.query(Usuario).filter(Usuario.id == current_user.id).first()
-        if not usuario:
-            return jsonify({"error": "No encontrado"}), 404
-
-        if "display_name" in data:
-            usuario.display_name = (data["display_name"] or "").strip()[:80]
-        if "avatar_emoji" in data:
-            usuario.avatar_emoji = (data["avatar_emoji"] or "🎭")[:4]
-        if "avatar_color" in data:
-            color = data["avatar_color"]
-            if re.match(r"^#[0-9a-fA-F]{6}$", color):
-                usuario.avatar_color = color
-
-        db.commit()
-        return jsonify({"ok": True, "usuario": usuario.to_dict()})
-    finally:
-        db.close()
+    db = db_peticion()
+    usuario = db.query(Usuario).filter(Usuario.id == current_user.id).first()
+    if not usuario:
+        return jsonify({"error": "No encontrado"}), 404
+
+    if "display_name" in data:
+        usuario.display_name = (data["display_name"] or "").strip()[:80]
+    if "avatar_emoji" in data:
+        usuario.avatar_emoji = (data["avatar_emoji"] or "🎭")[:4]
+    if "avatar_color" in data:
+        color = data["avatar_color"]
+        if re.match(r"^#[0-9a-fA-F]{6}$", color):
+            usuario.avatar_color = color
+
+    db.commit()
+    return jsonify({"ok": True, "usuario": usuario.to_dict()})
@@ -5,9 +5,13 @@ from datetime import datetime
 from flask import Blueprint, jsonify, request
 from flask_socketio import emit, join_room, leave_room
 from flask_login import current_user
+from backend.config import config
 from backend.main import socketio
-from backend.database import SessionLocal
-from backend.models import MensajeChat, Letra, Video
+from backend.database import SessionLocal, db_peticion
+from backend.models import MensajeChat, Usuario
+from backend.services import chat_diario
+from backend.services.aleatorio import letra_aleatoria, video_aleatorio
+from backend.services.paginacion import pagina_keyset
 
 # Alias para acceder al SID del socket en handlers (Flask pone el SID en request.sid)
 _get_sid = lambda: getattr(request, "sid", None)
@@ -24,20 +28,44 @@ _bot_running = False
 
 @bp.route("/historial", methods=["GET"])
 def historial():
-    db = SessionLocal()
-    try:
-        sala = request.args.get("sala", "general")
-        limit = min(request.args.get("limit", 50, type=int), 200)
-        mensajes = (
-            db.query(MensajeChat)
-            .filter(MensajeChat.sala == sala)
-            .order_by(MensajeChat.created_at.desc())
-            .limit(limit)
-            .all()
-        )
-        return jsonify([m.to_dict() for m in reversed(mensajes)])
-    finally:
-        db.close()
+    """
+    Últimos mensajes de una sala en orden cronológico.
+    Modo cursor (opt-in): ?cursor= devuelve {"mensajes", "next_cursor"} y
+    next_cursor pide los mensajes anteriores (scroll hacia arriba).
+    Sin cursor se añaden los mensajes del diario aún sin volcar a la BD.
+    """
+    db = db_peticion()
+    sala = request.args.get("sala", "general")
+    limit = min(request.args.get("limit", 50, type=int), 200)
+    # Proyección con LEFT JOIN al autor: una consulta para todo el historial
+    q = (
+        db.query(*MensajeChat.columnas_dict())
+        .outerjoin(Usuario, Usuario.id == MensajeChat.usuario_id)
+        .filter(MensajeChat.sala == sala)
+    )
+
+    cursor = request.args.get("cursor")
+    if cursor is not None:
+        orden = [(MensajeChat.created_at, True), (MensajeChat.id, True)]
+        try:
+            mensajes, siguiente = pagina_keyset(q, orden, cursor, limit)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({
+            "mensajes": [MensajeChat.dict_desde_fila(m) for m in reversed(mensajes)],
+            "next_cursor": siguiente,
+        })
+
+    mensajes = (
+        q.order_by(MensajeChat.created_at.desc(), MensajeChat.id.desc())
+        .limit(limit)
+        .all()
+    )
+    resultado = [MensajeChat.dict_desde_fila(m) for m in reversed(mensajes)]
+    # Un lote recién confirmado puede seguir un instante en la cola: sin duplicados
+    guardados = {m["id"] for m in resultado}
+    resultado += [m for m in chat_diario.pendientes(sala) if m["id"] not in guardados]
+    return jsonify(resultado[-limit:])
 
 
 # ─── SocketIO: eventos ────────────────────────────────────────────────────────
@@ -73,41 +101,32 @@ def on_mensaje(data):
         return
 
     # Si el usuario está autenticado, usar su nombre y avatar
+    avatar = {}
     if current_user.is_authenticated:
         nombre = current_user.nombre_visible()
         usuario_id = current_user.id
+        avatar = {"avatar_color": current_user.avatar_color, "avatar_emoji": current_user.avatar_emoji}
     else:
         nombre = (data.get("usuario") or "Anónimo").strip()[:50]
         usuario_id = None
 
-    # Guardar en DB
-    payload = None
-    db = SessionLocal()
+    # Al diario (se guarda por lotes en segundo plano) y se emite ya
     try:
-        msg = MensajeChat(
-            usuario=nombre,
-            usuario_id=usuario_id,
-            contenido=contenido,
-            tipo="user",
-            sala=sala,
-        )
-        db.add(msg)
-        db.commit()
-        payload = msg.to_dict()
+        payload = chat_diario.registrar(nombre, contenido, sala, usuario_id=usuario_id, **avatar)
+    except chat_diario.ColaLlena:
+        emit("sistema", {"mensaje": "El chat va muy cargado, vuelve a intentarlo en unos segundos."})
+        return
     except Exception as e:
-        print(f"[Chat] Error guardando mensaje en DB: {e}")
-        db.rollback()
+        print(f"[Chat] Error registrando mensaje: {e}")
         # Emitir igualmente aunque no se haya persistido
-        from datetime import datetime as _dt
         payload = {
             "usuario": nombre,
             "contenido": contenido,
             "tipo": "user",
             "sala": sala,
-            "hora": _dt.utcnow().strftime("%H:%M"),
+            "hora": datetime.utcnow().strftime("%H:%M"),
+            **avatar,
         }
-    finally:
-        db.close()
 
     if payload:
         # 1) Enviar directamente al emisor (garantiza que siempre vea su propio mensaje)
@@ -129,9 +148,7 @@ def _mensaje_bot_aleatorio() -> dict:
         tipo = random.choice(["letra", "video", "dato"])
 
         if tipo == "letra":
-            letra = db.query(Letra).order_by(
-                __import__("sqlalchemy.sql.expression", fromlist=["func"]).func.random()
-            ).first()
+            letra = letra_aleatoria(db, con_contenido=True, sin_repetir=True)
             if letra:
                 fragmento = (letra.contenido or "")[:280]
                 return {
@@ -143,9 +160,7 @@ def _mensaje_bot_aleatorio() -> dict:
                 }
 
         if tipo == "video":
-            video = db.query(Video).order_by(
-                __import__("sqlalchemy.sql.expression", fromlist=["func"]).func.random()
-            ).first()
+            video = video_aleatorio(db, sin_repetir=True)
             if video:
                 return {
                     "usuario": "Bot Carnaval 🎭",
@@ -181,20 +196,9 @@ def _loop_bot():
         if not _bot_running:
             break
         try:
-            payload = _mensaje_bot_aleatorio()
-            # Guardar en DB
-            db = SessionLocal()
-            try:
-                msg = MensajeChat(
-                    usuario=payload["usuario"],
-                    contenido=payload["contenido"],
-                    tipo="bot",
-                    sala=payload.get("sala", "general"),
-                )
-                db.add(msg)
-                db.commit()
-            finally:
-                db.close()
+            mensaje = _mensaje_bot_aleatorio()
+            payload = chat_diario.registrar(mensaje["usuario"], mensaje["contenido"],
+                                            mensaje.get("sala", "general"), tipo="bot")
             socketio.emit("mensaje", payload, to="general")
         except Exception as e:
             print(f"[Bot] Error: {e}")
@@ -202,6 +206,8 @@ def _loop_bot():
 
 def _iniciar_bot():
     global _bot_thread, _bot_running
+    if not config.CHAT_BOT:     # con varios procesos el bot va en uno solo
+        return
     if _bot_thread is None or not _bot_thread.is_alive():
         _bot_running = True
         _bot_thread = threading.Thread(target=_loop_bot, daemon=True)
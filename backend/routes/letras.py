@@ -1,85 +1,173 @@
 from flask import Blueprint, jsonify, request
-from sqlalchemy import desc
-from backend.database import SessionLocal
+from sqlalchemy import String, case, func, or_
+
+from backend.database import db_peticion
 from backend.models import Letra
+from backend.services.busqueda import (
+    expresion_fts, subconsulta_fts, ids_aproximados, orden_por_ids, PESOS_LETRAS,
+    grupos_exactos, grupos_aproximados, filtro_grupos, con_grupos,
+)
+from backend.services.paginacion import pagina_keyset, criterio_orden, contar_cacheado, clave_conteo
+from backend.services.cache_respuestas import cacheado
 
 bp = Blueprint("letras", __name__)
 
+LARGO_EXTRACTO = 160    # caracteres del extracto del listado sin búsqueda
+_COLUMNA_CONTENIDO = 1  # índice de `contenido` en letras_fts (titulo, contenido, grupo_nombre)
+
+# Orden del listado como (columna, descendente): sirve para ORDER BY y para el cursor
+ORDEN_LETRAS = ((Letra.año, True), (Letra.id, True))
+
+
+def _extracto_inicio():
+    """Primeros LARGO_EXTRACTO caracteres del contenido, con '…' si sigue."""
+    return case(
+        (func.length(Letra.contenido) > LARGO_EXTRACTO,
+         func.substr(Letra.contenido, 1, LARGO_EXTRACTO, type_=String) + "…"),
+        else_=Letra.contenido,
+    )
+
 
-def _db():
-    return SessionLocal()
+def _filtrar_grupo(q, grupo: str):
+    """Filtra por nombre de agrupación vía FTS (sin tildes ni mayúsculas)."""
+    fts = subconsulta_fts("letras_fts", expresion_fts(grupo, columna="grupo_nombre"), PESOS_LETRAS)
+    return q.join(fts, fts.c.rowid == Letra.id)
 
 
 @bp.route("/", methods=["GET"])
+@cacheado("letras")
 def listar_letras():
-    """Lista letras con filtros."""
-    db = _db()
-    try:
-        q = db.query(Letra)
-
-        año = request.args.get("año", type=int)
-        tipo_pieza = request.args.get("tipo_pieza")
-        grupo = request.args.get("grupo", "").strip()
-        busqueda = request.args.get("q", "").strip()
-
-        if año:
-            q = q.filter(Letra.año == año)
-        if tipo_pieza:
-            q = q.filter(Letra.tipo_pieza == tipo_pieza)
-        if grupo:
-            q = q.filter(Letra.grupo_nombre.ilike(f"%{grupo}%"))
-        if busqueda:
-            q = q.filter(
-                Letra.contenido.ilike(f"%{busqueda}%") |
-                Letra.titulo.ilike(f"%{busqueda}%") |
-                Letra.grupo_nombre.ilike(f"%{busqueda}%")
-            )
-
-        page = request.args.get("page", 1, type=int)
-        per_page = min(request.args.get("per_page", 20, type=int), 100)
-        total = q.count()
-        letras = q.order_by(desc(Letra.año)).offset((page - 1) * per_page).limit(per_page).all()
-
-        return jsonify({
-            "total": total,
-            "page": page,
-            "pages": (total + per_page - 1) // per_page,
-            "letras": [l.to_dict() for l in letras],
-        })
-    finally:
-        db.close()
+    """
+    Lista letras con filtros: año, tipo_pieza, grupo, q, page, per_page.
+    Cada letra lleva `extracto` en lugar del texto completo (que se pide a
+    /api/letras/<id>): el principio del contenido o, si hay q, el fragmento
+    donde aparece la búsqueda, con los términos entre busqueda.MARCA_INICIO
+    y MARCA_FIN.
+    fields=titulo,grupo_nombre… devuelve solo esos campos (fields=contenido,
+    el texto completo; añade extracto a la lista para conservarlo).
+    Modo cursor: cursor (vacío en la primera página), con_total=true opcional.
+    """
+    db = db_peticion()
+    # Proyección de columnas: el listado no necesita objetos ORM.
+    # ?fields=titulo,año limita las columnas (y el JSON) a las pedidas
+    fields = request.args.get("fields")
+    if fields:
+        campos = Letra.campos_pedidos(fields)
+        con_extracto = "extracto" in {c.strip() for c in fields.split(",")}
+    else:
+        campos, con_extracto = Letra.CAMPOS_LISTADO, True
+    q = db.query(*Letra.columnas_dict(campos))
+
+    año = request.args.get("año", type=int)
+    tipo_pieza = request.args.get("tipo_pieza")
+    grupo = request.args.get("grupo", "").strip()
+    busqueda = request.args.get("q", "").strip()
+
+    if año:
+        q = q.filter(Letra.año == año)
+    if tipo_pieza:
+        q = q.filter(Letra.tipo_pieza == tipo_pieza)
+    if expresion_fts(grupo):
+        q = _filtrar_grupo(q, grupo)
+
+    orden = list(ORDEN_LETRAS)
+    filtrada = q
+    if expresion_fts(busqueda):
+        fts = subconsulta_fts("letras_fts", expresion_fts(busqueda), PESOS_LETRAS,
+                              extracto=_COLUMNA_CONTENIDO if con_extracto else None)
+        # Nombre o autores de una agrupación ("martinez ares"): también sus letras
+        grupos = grupos_exactos(db, busqueda)
+        if grupos:
+            fts = con_grupos(fts, Letra, grupos)
+        q = q.join(fts, fts.c.rowid == Letra.id)
+        orden.insert(0, (fts.c.rank, False))
+        if con_extracto and grupos:
+            # Las letras que entran por la agrupación no tienen fragmento: el principio
+            q = q.add_columns(func.coalesce(fts.c.extracto, _extracto_inicio()).label("extracto"))
+        elif con_extracto:
+            q = q.add_columns(fts.c.extracto)
+    elif con_extracto:
+        q = q.add_columns(_extracto_inicio().label("extracto"))
+    if con_extracto:
+        campos = campos + ("extracto",)
+
+    criterio_difuso = None
+    if busqueda and not q.with_entities(Letra.id).first():
+        # Sin coincidencias (erratas): fallback difuso por trigramas en letras y agrupaciones
+        aproximados = ids_aproximados(db, "letras", busqueda)
+        grupos = grupos_aproximados(db, busqueda)
+        if aproximados or grupos:
+            q = filtrada.filter(or_(Letra.id.in_(aproximados), filtro_grupos(Letra, grupos)))
+            if con_extracto:
+                q = q.add_columns(_extracto_inicio().label("extracto"))
+            # Primero las letras por parecido, luego las de las agrupaciones
+            criterio_difuso = [orden_por_ids(Letra.id, aproximados)] if aproximados else []
+            criterio_difuso += criterio_orden(ORDEN_LETRAS)
+
+    per_page = min(request.args.get("per_page", 20, type=int), 100)
+
+    # Modo cursor (opt-in): ?cursor= vacío para la primera página
+    cursor = request.args.get("cursor")
+    if cursor is not None:
+        if criterio_difuso is not None:
+            # Resultados difusos: lista acotada, una sola página
+            letras = q.order_by(*criterio_difuso).limit(per_page).all()
+            siguiente = None
+        else:
+            try:
+                letras, siguiente = pagina_keyset(q, orden, cursor, per_page)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        resp = {
+            "per_page": per_page,
+            "next_cursor": siguiente,
+            "letras": [Letra.dict_desde_fila(l, campos) for l in letras],
+        }
+        if request.args.get("con_total", "false").lower() == "true":
+            resp["total"] = contar_cacheado(q.with_entities(Letra.id), clave_conteo(request.path, request.args, "letras", "grupos"))
+        return jsonify(resp)
+
+    page = request.args.get("page", 1, type=int)
+    total = q.with_entities(Letra.id).count()     # sin calcular extractos
+    if criterio_difuso is not None:
+        criterio = criterio_difuso
+    else:
+        criterio = criterio_orden(orden)
+    letras = q.order_by(*criterio).offset((page - 1) * per_page).limit(per_page).all()
+
+    return jsonify({
+        "total": total,
+        "page": page,
+        "pages": (total + per_page - 1) // per_page,
+        "letras": [Letra.dict_desde_fila(l, campos) for l in letras],
+    })
 
 
 @bp.route("/<int:letra_id>", methods=["GET"])
 def detalle_letra(letra_id):
     """Devuelve una letra. Si no tiene contenido, lo descarga de la API y lo cachea."""
-    db = _db()
-    try:
-        letra = db.query(Letra).filter(Letra.id == letra_id).first()
-        if not letra:
-            return jsonify({"error": "Letra no encontrada"}), 404
+    db = db_peticion()
+    letra = db.query(Letra).filter(Letra.id == letra_id).first()
+    if not letra:
+        return jsonify({"error": "Letra no encontrada"}), 404
 
-        # Contenido bajo demanda: si está vacío y tenemos URL de origen, lo descargamos
-        if not letra.contenido or len(letra.contenido) < 10:
-            from backend.services.letras_importer import obtener_contenido_api
-            obtener_contenido_api(letra_id)
-            # Re-leer tras la actualización
-            db.refresh(letra)
+    # Contenido bajo demanda: si está vacío y tenemos URL de origen, lo descargamos
+    if not letra.contenido or len(letra.contenido) < 10:
+        from backend.services.letras_importer import obtener_contenido_api
+        obtener_contenido_api(letra_id)
+        # Re-leer tras la actualización
+        db.refresh(letra)
 
-        return jsonify(letra.to_dict())
-    finally:
-        db.close()
+    return jsonify(letra.to_dict())
 
 
 @bp.route("/por-video/<int:video_id>", methods=["GET"])
 def letras_de_video(video_id):
     """Devuelve todas las letras asociadas a un vídeo (para mostrar mientras se reproduce)."""
-    db = _db()
-    try:
-        letras = db.query(Letra).filter(Letra.video_id == video_id).all()
-        return jsonify([l.to_dict() for l in letras])
-    finally:
-        db.close()
+    db = db_peticion()
+    campos = Letra.campos_pedidos(request.args.get("fields"))
+    letras = db.query(*Letra.columnas_dict(campos)).filter(Letra.video_id == video_id).all()
+    return jsonify([Letra.dict_desde_fila(l, campos) for l in letras])
 
 
 @bp.route("/por-grupo", methods=["GET"])
@@ -87,41 +175,28 @@ def letras_por_grupo():
     """Busca letras de un grupo por nombre (para vincular a vídeos)."""
     grupo = request.args.get("grupo", "").strip()
     año = request.args.get("año", type=int)
-    if not grupo:
+    if not expresion_fts(grupo):
         return jsonify({"error": "Parámetro 'grupo' requerido"}), 400
 
-    db = _db()
-    try:
-        q = db.query(Letra).filter(Letra.grupo_nombre.ilike(f"%{grupo}%"))
-        if año:
-            q = q.filter(Letra.año == año)
-        letras = q.limit(50).all()
-        return jsonify([l.to_dict() for l in letras])
-    finally:
-        db.close()
+    db = db_peticion()
+    campos = Letra.campos_pedidos(request.args.get("fields"))
+    q = _filtrar_grupo(db.query(*Letra.columnas_dict(campos)), grupo)
+    if año:
+        q = q.filter(Letra.año == año)
+    letras = q.limit(50).all()
+    return jsonify([Letra.dict_desde_fila(l, campos) for l in letras])
 
 
 @bp.route("/aleatoria", methods=["GET"])
 def letra_aleatoria():
     """Letra aleatoria para el bot del chat. Prefiere las que tienen contenido."""
-    db = _db()
-    try:
-        from sqlalchemy.sql.expression import func
-        # Primero intentar con contenido
-        letra = (
-            db.query(Letra)
-            .filter(Letra.contenido != "", Letra.contenido.isnot(None))
-            .order_by(func.random())
-            .first()
-        )
-        # Si no hay ninguna con contenido, cualquiera sirve
-        if not letra:
-            letra = db.query(Letra).order_by(func.random()).first()
-        if not letra:
-            return jsonify({"error": "Sin letras"}), 404
-        return jsonify(letra.to_dict())
-    finally:
-        db.close()
+    from backend.services.aleatorio import letra_aleatoria as _aleatoria
+    db = db_peticion()
+    # Primero intentar con contenido; si no hay ninguna, cualquiera sirve
+    letra = _aleatoria(db, con_contenido=True) or _aleatoria(db, con_contenido=False)
+    if not letra:
+        return jsonify({"error": "Sin letras"}), 404
+    return jsonify(letra.to_dict())
 
 
 @bp.route("/importar", methods=["POST"])
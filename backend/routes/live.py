@@ -2,18 +2,42 @@
 Rutas del canal Live 24/7.
 
 GET  /live/          — Página del canal live
-GET  /live/estado    — Estado actual (youtube_id, segundos_transcurridos, título)
+GET  /live/estado    — Estado actual (youtube_id, segundos_transcurridos, título, siguiente), desde memoria
+GET  /live/cola      — Próximos vídeos de la cola de emisión con su hora prevista
 POST /live/siguiente — Admin: avanza al siguiente vídeo aleatoriamente
 POST /live/programar — Admin: programa un vídeo específico por youtube_id
+
+Solo con LIVE_MODO=determinista:
+GET    /live/horario        — Programación + overrides para calcular el estado en el navegador
+POST   /live/horario        — Admin: vuelve a barajar la programación (semilla, inicio opcionales)
+DELETE /live/override/<id> — Admin: anula un override
 """
+from datetime import datetime, timezone
+
 from flask import Blueprint, jsonify, request, render_template
-from flask_login import current_user
-from backend.database import SessionLocal
-from backend.models import EstadoLive
+from backend.database import db_peticion
+from backend.routes.auth import es_admin_o_setup
 
 bp = Blueprint("live", __name__)
 
 
+def _fecha_utc(valor):
+    """ISO 8601 → datetime UTC sin zona (como se guardan); None si falta. ValueError si no es válida."""
+    if not valor:
+        return None
+    fecha = datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+def _solo_determinista():
+    from backend.services.live_service import modo
+    if modo() != "determinista":
+        return jsonify({"error": "El canal no está en modo determinista (LIVE_MODO)"}), 404
+    return None
+
+
 @bp.route("/")
 def live_page():
     return render_template("live.html")
@@ -22,27 +46,26 @@ def live_page():
 @bp.route("/estado", methods=["GET"])
 def estado_live():
     """
-    Devuelve el estado actual del canal live.
-    Si no hay estado o vídeo activo, intenta auto-iniciar con los vídeos del catálogo.
+    Devuelve el estado actual del canal live (desde memoria, sin consultar la BD).
+    Si no hay vídeo activo, en modo cola intenta auto-iniciar con los vídeos
+    del catálogo. En modo determinista un GET nunca escribe: sin programación
+    responde 404.
     """
-    db = SessionLocal()
-    try:
-        estado = db.query(EstadoLive).filter(EstadoLive.id == 1).first()
-        if not estado or not estado.youtube_id:
-            # Intentar arrancar automáticamente
-            db.close()
-            from backend.services.live_service import avanzar_al_siguiente
-            nuevo_id = avanzar_al_siguiente()
-            if not nuevo_id:
-                return jsonify({"error": "Sin contenido. Añade vídeos desde el Admin."}), 404
-            # Releer estado
-            db = SessionLocal()
-            estado = db.query(EstadoLive).filter(EstadoLive.id == 1).first()
-            if not estado:
-                return jsonify({"error": "Error iniciando el canal"}), 500
-        return jsonify(estado.to_dict())
-    finally:
-        db.close()
+    from backend.services.live_service import estado_dict, avanzar_al_siguiente, modo
+    estado = estado_dict()
+    if estado is None:
+        # Arranque automático (escribe con su propia sesión)
+        if modo() == "determinista" or not avanzar_al_siguiente():
+            return jsonify({"error": "Sin contenido. Añade vídeos desde el Admin."}), 404
+        estado = estado_dict()
+    return jsonify(estado)
+
+
+@bp.route("/cola", methods=["GET"])
+def cola_live():
+    """Vídeo en antena y los siguientes en cola, con su hora prevista de inicio (UTC)."""
+    from backend.services.live_service import estado_dict, programacion
+    return jsonify({"actual": estado_dict(), "cola": programacion()})
 
 
 @bp.route("/siguiente", methods=["POST"])
@@ -51,22 +74,12 @@ def siguiente_video():
     Avanza al siguiente vídeo manualmente.
     Requiere estar autenticado. Si no hay usuarios aún (setup inicial), permite acceso libre.
     """
-    from backend.database import SessionLocal as _SL
-    from backend.models import Usuario as _U
-
-    # Verificar si hay usuarios en el sistema
-    _db = _SL()
-    try:
-        hay_usuarios = _db.query(_U).first() is not None
-    finally:
-        _db.close()
-
-    # Si hay usuarios, requiere ser admin
-    if hay_usuarios and (not current_user.is_authenticated or not current_user.es_admin):
+    db = db_peticion()
+    if not es_admin_o_setup(db):
         return jsonify({"error": "Se requiere cuenta de administrador"}), 403
 
     from backend.services.live_service import avanzar_al_siguiente
-    nuevo_id = avanzar_al_siguiente()
+    nuevo_id = avanzar_al_siguiente(db)
     if nuevo_id:
         return jsonify({"ok": True, "youtube_id": nuevo_id})
     return jsonify({"error": "No hay vídeos disponibles en el catálogo"}), 404
@@ -80,28 +93,85 @@ def programar_video():
     Si no hay usuarios aún (setup inicial), permite acceso libre.
     """
     import re
-    from backend.database import SessionLocal as _SL
-    from backend.models import Usuario as _U
 
-    _db = _SL()
-    try:
-        hay_usuarios = _db.query(_U).first() is not None
-    finally:
-        _db.close()
-
-    if hay_usuarios and (not current_user.is_authenticated or not current_user.es_admin):
+    db = db_peticion()
+    if not es_admin_o_setup(db):
         return jsonify({"error": "Se requiere cuenta de administrador"}), 403
 
     data = request.json or {}
     valor = (data.get("youtube_id") or "").strip()
     if not valor:
         return jsonify({"error": "Falta youtube_id"}), 400
+    try:
+        inicio, fin = _fecha_utc(data.get("inicio")), _fecha_utc(data.get("fin"))
+    except ValueError:
+        return jsonify({"error": "inicio/fin deben ser fechas ISO 8601"}), 400
+    if inicio and fin and fin <= inicio:
+        return jsonify({"error": "fin debe ser posterior a inicio"}), 400
 
     # Extraer ID si se pasa una URL completa
     match = re.search(r'(?:v=|youtu\.be/|/embed/|/shorts/)([a-zA-Z0-9_-]{11})', valor)
     youtube_id = match.group(1) if match else valor
 
     from backend.services.live_service import programar_video as _programar
-    if _programar(youtube_id):
+    if _programar(youtube_id, db, inicio, fin):
         return jsonify({"ok": True, "youtube_id": youtube_id})
     return jsonify({"error": "No se pudo programar el vídeo"}), 400
+
+
+@bp.route("/horario", methods=["GET"])
+def horario_live():
+    """
+    Lista barajada, época de inicio, margen y overrides vigentes o futuros,
+    con la hora del servidor (ahora_ms) para corregir el reloj del cliente.
+    """
+    error = _solo_determinista()
+    if error:
+        return error
+    from backend.services import live_horario
+    resp = jsonify(live_horario.publico())
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@bp.route("/horario", methods=["POST"])
+def regenerar_horario():
+    """Baraja de nuevo el catálogo. Body opcional: {semilla, inicio}."""
+    error = _solo_determinista()
+    if error:
+        return error
+    db = db_peticion()
+    if not es_admin_o_setup(db):
+        return jsonify({"error": "Se requiere cuenta de administrador"}), 403
+
+    data = request.json or {}
+    try:
+        semilla = int(data["semilla"]) if data.get("semilla") is not None else None
+        inicio = _fecha_utc(data.get("inicio"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "semilla debe ser un entero e inicio una fecha ISO 8601"}), 400
+
+    from backend.services import live_horario
+    from backend.services.live_service import emitir_cambio
+    horario = live_horario.generar(db, semilla, inicio)
+    if horario is None:
+        return jsonify({"error": "No hay vídeos con duración conocida en el catálogo"}), 404
+    emitir_cambio()
+    return jsonify({"ok": True, "id": horario.id, "semilla": horario.semilla, "videos": len(horario.videos)})
+
+
+@bp.route("/override/<int:override_id>", methods=["DELETE"])
+def anular_override(override_id):
+    error = _solo_determinista()
+    if error:
+        return error
+    db = db_peticion()
+    if not es_admin_o_setup(db):
+        return jsonify({"error": "Se requiere cuenta de administrador"}), 403
+
+    from backend.services import live_horario
+    from backend.services.live_service import emitir_cambio
+    if not live_horario.anular(db, override_id):
+        return jsonify({"error": "Override no encontrado"}), 404
+    emitir_cambio()
+    return jsonify({"ok": True})
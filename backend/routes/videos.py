@@ -1,135 +1,205 @@
+import re
 from flask import Blueprint, jsonify, request
-from sqlalchemy import or_, desc
-from backend.database import SessionLocal
-from backend.models import Video, Grupo
+from sqlalchemy import desc, or_
+from sqlalchemy.orm import selectinload
+from backend.database import db_peticion
+from backend.models import Video
+from backend.services.busqueda import (
+    expresion_fts, subconsulta_fts, ids_aproximados, orden_por_ids, PESOS_VIDEOS,
+    grupos_exactos, grupos_aproximados, filtro_grupos, con_grupos,
+)
+from backend.services.paginacion import pagina_keyset, criterio_orden, contar_cacheado, clave_conteo
+from backend.services.cache_respuestas import cacheado
 
 bp = Blueprint("videos", __name__)
 
+_YT_ID_RE = re.compile(r"^[a-zA-Z0-9_-]{11}$")
 
-def _db():
-    return SessionLocal()
+# Orden del catálogo como (columna, descendente): sirve para ORDER BY y para el cursor
+ORDEN_CATALOGO = ((Video.año, True), (Video.vistas, True), (Video.id, True))
 
 
 @bp.route("/", methods=["GET"])
+@cacheado("videos")
 def listar_videos():
     """
     Lista vídeos con filtros opcionales.
-    Query params: año, fase, modalidad, tipo, grupo_id, q (búsqueda), page, per_page
+    Query params: año, fase, modalidad, tipo, grupo_id, q (búsqueda), page, per_page,
+    fields (campos a devolver, p.ej. fields=youtube_id,titulo,thumbnail)
+    Modo cursor: cursor (vacío en la primera página), con_total=true opcional.
     """
-    db = _db()
-    try:
-        q = db.query(Video)
-
-        año = request.args.get("año", type=int)
-        fase = request.args.get("fase")
-        modalidad = request.args.get("modalidad")
-        tipo = request.args.get("tipo")
-        grupo_id = request.args.get("grupo_id", type=int)
-        busqueda = request.args.get("q", "").strip()
-        destacados = request.args.get("destacados", "false").lower() == "true"
-        tiene_letra = request.args.get("tiene_letra", "false").lower() == "true"
-
-        if año:
-            q = q.filter(Video.año == año)
-        if fase:
-            q = q.filter(Video.fase == fase)
-        if modalidad:
-            q = q.filter(Video.modalidad == modalidad)
-        if tipo:
-            q = q.filter(Video.tipo == tipo)
-        if grupo_id:
-            q = q.filter(Video.grupo_id == grupo_id)
-        if destacados:
-            q = q.filter(Video.destacado == True)  # noqa: E712
-        if tiene_letra:
-            q = q.filter(Video.tiene_letra == True)  # noqa: E712
-        if busqueda:
-            patron = f"%{busqueda}%"
-            q = q.filter(
-                or_(
-                    Video.titulo.ilike(patron),
-                    Video.grupo_nombre.ilike(patron),
-                    Video.descripcion.ilike(patron),
-                )
-            )
-
-        # Paginación
-        page = request.args.get("page", 1, type=int)
-        per_page = min(request.args.get("per_page", 24, type=int), 100)
-        total = q.count()
-        videos = q.order_by(desc(Video.año), desc(Video.vistas)).offset((page - 1) * per_page).limit(per_page).all()
-
-        return jsonify({
-            "total": total,
-            "page": page,
+    db = db_peticion()
+    # Proyección de columnas: el listado no necesita objetos ORM.
+    # ?fields=titulo,año limita las columnas (y el JSON) a las pedidas
+    campos = Video.campos_pedidos(request.args.get("fields"))
+    q = db.query(*Video.columnas_dict(campos))
+
+    año = request.args.get("año", type=int)
+    fase = request.args.get("fase")
+    modalidad = request.args.get("modalidad")
+    tipo = request.args.get("tipo")
+    grupo_id = request.args.get("grupo_id", type=int)
+    busqueda = request.args.get("q", "").strip()
+    destacados = request.args.get("destacados", "false").lower() == "true"
+    tiene_letra = request.args.get("tiene_letra", "false").lower() == "true"
+
+    if año:
+        q = q.filter(Video.año == año)
+    if fase:
+        q = q.filter(Video.fase == fase)
+    if modalidad:
+        q = q.filter(Video.modalidad == modalidad)
+    if tipo:
+        q = q.filter(Video.tipo == tipo)
+    if grupo_id:
+        q = q.filter(Video.grupo_id == grupo_id)
+    if destacados:
+        q = q.filter(Video.destacado == True)  # noqa: E712
+    if tiene_letra:
+        q = q.filter(Video.tiene_letra == True)  # noqa: E712
+
+    orden = list(ORDEN_CATALOGO)
+    filtrada = q
+    if busqueda:
+        # Un youtube_id exacto va por el índice único, no por FTS
+        if _YT_ID_RE.match(busqueda) and db.query(Video.id).filter(Video.youtube_id == busqueda).first():
+            q = q.filter(Video.youtube_id == busqueda)
+        elif expresion_fts(busqueda):
+            fts = subconsulta_fts("videos_fts", expresion_fts(busqueda), PESOS_VIDEOS)
+            # Nombre o autores de una agrupación ("martinez ares"): también sus vídeos
+            grupos = grupos_exactos(db, busqueda)
+            if grupos:
+                fts = con_grupos(fts, Video, grupos)
+            q = q.join(fts, fts.c.rowid == Video.id)
+            orden.insert(0, (fts.c.rank, False))
+
+    criterio_difuso = None
+    if busqueda and not q.with_entities(Video.id).first():
+        # Sin coincidencias (erratas): fallback difuso por trigramas en vídeos y agrupaciones
+        aproximados = ids_aproximados(db, "videos", busqueda)
+        grupos = grupos_aproximados(db, busqueda)
+        if aproximados or grupos:
+            q = filtrada.filter(or_(Video.id.in_(aproximados), filtro_grupos(Video, grupos)))
+            # Primero los vídeos por parecido, luego los de las agrupaciones
+            criterio_difuso = [orden_por_ids(Video.id, aproximados)] if aproximados else []
+            criterio_difuso += criterio_orden(ORDEN_CATALOGO)
+
+    per_page = min(request.args.get("per_page", 24, type=int), 100)
+
+    # Modo cursor (opt-in): ?cursor= vacío para la primera página
+    cursor = request.args.get("cursor")
+    if cursor is not None:
+        if criterio_difuso is not None:
+            # Resultados difusos: lista acotada, una sola página
+            videos = q.order_by(*criterio_difuso).limit(per_page).all()
+            siguiente = None
+        else:
+            try:
+                videos, siguiente = pagina_keyset(q, orden, cursor, per_page)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        resp = {
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page,
-            "videos": [v.to_dict() for v in videos],
-        })
-    finally:
-        db.close()
+            "next_cursor": siguiente,
+            "videos": [Video.dict_desde_fila(v, campos) for v in videos],
+        }
+        if request.args.get("con_total", "false").lower() == "true":
+            resp["total"] = contar_cacheado(q, clave_conteo(request.path, request.args, "videos", "grupos"))
+        return jsonify(resp)
+
+    # Paginación clásica por página
+    page = request.args.get("page", 1, type=int)
+    total = q.count()
+    if criterio_difuso is not None:
+        criterio = criterio_difuso
+    else:
+        criterio = criterio_orden(orden)
+    videos = q.order_by(*criterio).offset((page - 1) * per_page).limit(per_page).all()
+
+    return jsonify({
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "pages": (total + per_page - 1) // per_page,
+        "videos": [Video.dict_desde_fila(v, campos) for v in videos],
+    })
 
 
 @bp.route("/<int:video_id>", methods=["GET"])
 def detalle_video(video_id):
     """Detalle de un vídeo con sus letras."""
-    db = _db()
-    try:
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if not video:
-            return jsonify({"error": "Vídeo no encontrado"}), 404
-        return jsonify(video.to_dict(include_letras=True))
-    finally:
-        db.close()
+    db = db_peticion()
+    video = db.query(Video).options(selectinload(Video.letras)).filter(Video.id == video_id).first()
+    if not video:
+        return jsonify({"error": "Vídeo no encontrado"}), 404
+    return jsonify(video.to_dict(include_letras=True))
+
+
+@bp.route("/yt/<youtube_id>", methods=["GET"])
+@cacheado("videos", "letras")
+def video_por_youtube_id(youtube_id):
+    """
+    Vídeo por youtube_id (índice único) con sus letras y vídeos relacionados.
+    Respuesta compuesta para la página del player: una sola petición.
+    """
+    db = db_peticion()
+    video = (
+        db.query(Video)
+        .options(selectinload(Video.letras))
+        .filter(Video.youtube_id == youtube_id)
+        .first()
+    )
+    if not video:
+        return jsonify({"error": "Vídeo no encontrado"}), 404
+
+    limite = min(request.args.get("relacionados", 6, type=int), 24)
+    q = db.query(*Video.columnas_dict()).filter(Video.id != video.id)
+    if video.modalidad:
+        q = q.filter(Video.modalidad == video.modalidad)
+    relacionados = q.order_by(desc(Video.año), desc(Video.vistas)).limit(limite).all()
+
+    return jsonify({
+        **video.to_dict(include_letras=True),
+        "relacionados": [Video.dict_desde_fila(v) for v in relacionados],
+    })
 
 
 @bp.route("/años", methods=["GET"])
+@cacheado("videos")
 def años_disponibles():
     """Lista de años con contenido."""
-    db = _db()
-    try:
-        años = db.query(Video.año).distinct().filter(Video.año.isnot(None)).order_by(desc(Video.año)).all()
-        return jsonify([a[0] for a in años])
-    finally:
-        db.close()
+    db = db_peticion()
+    años = db.query(Video.año).distinct().filter(Video.año.isnot(None)).order_by(desc(Video.año)).all()
+    return jsonify([a[0] for a in años])
 
 
 @bp.route("/estadisticas", methods=["GET"])
+@cacheado("videos", "letras", "grupos")
 def estadisticas():
-    """Resumen de contenido disponible."""
-    db = _db()
-    try:
-        total = db.query(Video).count()
-        por_modalidad = {}
-        for modalidad in ["chirigota", "comparsa", "coro", "cuarteto", "romancero"]:
-            por_modalidad[modalidad] = db.query(Video).filter(Video.modalidad == modalidad).count()
-        callejeras = db.query(Video).filter(Video.tipo == "callejera").count()
-        con_letra = db.query(Video).filter(Video.tiene_letra == True).count()  # noqa: E712
-
-        return jsonify({
-            "total_videos": total,
-            "por_modalidad": por_modalidad,
-            "callejeras": callejeras,
-            "con_letra": con_letra,
-            "total_grupos": db.query(Grupo).count(),
-        })
-    finally:
-        db.close()
+    """Resumen de contenido disponible (cacheado hasta el próximo cambio del catálogo)."""
+    from backend.services import estadisticas as _stats
+    db = db_peticion()
+    datos = _stats.obtener(db)
+    return jsonify({
+        "total_videos": datos["total_videos"],
+        "por_modalidad": datos["por_modalidad"],
+        "callejeras": datos["callejeras"],
+        "con_letra": datos["con_letra"],
+        "total_grupos": datos["total_grupos"],
+    })
 
 
 @bp.route("/aleatorio", methods=["GET"])
 def video_aleatorio():
-    """Devuelve un vídeo aleatorio (para modo shuffle)."""
-    db = _db()
-    try:
-        from sqlalchemy.sql.expression import func
-        modalidad = request.args.get("modalidad")
-        q = db.query(Video)
-        if modalidad:
-            q = q.filter(Video.modalidad == modalidad)
-        video = q.order_by(func.random()).first()
-        if not video:
-            return jsonify({"error": "Sin vídeos"}), 404
-        return jsonify(video.to_dict())
-    finally:
-        db.close()
+    """
+    Devuelve un vídeo aleatorio (para modo shuffle).
+    sin_repetir=true evita los últimos vídeos servidos.
+    """
+    from backend.services.aleatorio import video_aleatorio as _aleatorio
+    db = db_peticion()
+    modalidad = request.args.get("modalidad")
+    sin_repetir = request.args.get("sin_repetir", "false").lower() == "true"
+    video = _aleatorio(db, modalidad=modalidad, sin_repetir=sin_repetir)
+    if not video:
+        return jsonify({"error": "Sin vídeos"}), 404
+    return jsonify(video.to_dict())
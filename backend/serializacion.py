@@ -0,0 +1,61 @@
+"""
+Proveedor JSON de la app.
+
+Con orjson instalado las respuestas se codifican directamente a bytes con
+él (varias veces más rápido que json en listados grandes); si no está, o
+si un valor no es serializable por orjson, se usa el codificador estándar
+de Flask. Salida compacta (sin indentación ni claves ordenadas) en ambos
+casos. Las fechas siguen pasando por el `default` de Flask para que el
+formato no cambie según el codificador.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    _ORJSON_DISPONIBLE = True
+except ImportError:
+    _ORJSON_DISPONIBLE = False
+
+
+if _ORJSON_DISPONIBLE:
+    _OPCIONES_ORJSON = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ProveedorJSON(DefaultJSONProvider):
+    compact = True
+    sort_keys = False
+    ensure_ascii = False
+
+    def _orjson(self, obj):
+        """bytes con orjson, o None si no está disponible o no puede con el objeto."""
+        if not _ORJSON_DISPONIBLE:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=_OPCIONES_ORJSON)
+        except TypeError:
+            return None
+
+    def dumps(self, obj, **kwargs) -> str:
+        if not kwargs:
+            datos = self._orjson(obj)
+            if datos is not None:
+                return datos.decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if _ORJSON_DISPONIBLE and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass    # que el estándar lance su propio error
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        datos = self._orjson(self._prepare_response_obj(args, kwargs))
+        if datos is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(datos, mimetype=self.mimetype)
+
+
+def motor() -> str:
+    return "orjson" if _ORJSON_DISPONIBLE else "json"
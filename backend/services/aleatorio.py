@@ -0,0 +1,94 @@
+"""
+Selección aleatoria en tiempo constante.
+
+En vez de ORDER BY RANDOM() (ordena toda la tabla filtrada en cada
+llamada) se guarda en memoria un pool compacto de ids por filtro
+(modalidad, fases, letras con contenido…). El pool se reconstruye solo
+cuando cambia la versión del catálogo; elegir es random.choice + get por
+clave primaria.
+
+Opcionalmente se evita repetir los últimos N elegidos de cada pool
+(modo shuffle, canal live).
+"""
+import random
+import threading
+from array import array
+from collections import deque
+
+from backend.models import Letra, Video
+from backend.services import catalogo
+
+# Tamaño de la ventana sin repeticiones por pool
+VENTANA_SIN_REPETIR = 50
+_INTENTOS = 8
+
+_pools: dict = {}       # clave → (versión, array de ids)
+_recientes: dict = {}   # clave → deque de ids elegidos recientemente
+_lock = threading.Lock()
+
+
+def _pool(db, modelo, clave: tuple, filtros: list) -> array:
+    tabla = modelo.__tablename__
+    version = catalogo.version(tabla)
+    with _lock:
+        previo = _pools.get(clave)
+    if previo and previo[0] == version:
+        return previo[1]
+    ids = array("q", (fila[0] for fila in db.query(modelo.id).filter(*filtros)))
+    with _lock:
+        _pools[clave] = (version, ids)
+    return ids
+
+
+def _sortear(db, modelo, ids, excluir):
+    """Hasta _INTENTOS sorteos en `ids`, saltando `excluir` y los ids que ya no existen."""
+    for _ in range(_INTENTOS):
+        id_ = random.choice(ids)
+        if id_ in excluir:
+            continue
+        obj = db.get(modelo, id_)
+        if obj is not None:
+            return obj
+    return None
+
+
+def _elegir(db, modelo, clave: tuple, filtros: list, sin_repetir: bool):
+    ids = _pool(db, modelo, clave, filtros)
+    if not ids:
+        return None
+
+    with _lock:
+        recientes = _recientes.setdefault(clave, deque(maxlen=VENTANA_SIN_REPETIR))
+    # La ventana nunca puede cubrir todo el pool
+    ventana = set(list(recientes)[-(len(ids) // 2):]) if sin_repetir and len(ids) > 1 else set()
+
+    # Casi siempre acierta al primer sorteo (la ventana es como mucho la mitad del pool)
+    obj = _sortear(db, modelo, ids, ventana)
+    if obj is None and ventana:
+        # Mala racha: sortear solo entre los que quedan fuera de la ventana
+        obj = _sortear(db, modelo, list(set(ids) - ventana) or ids, ())
+    if obj is None:
+        # ids obsoletos (filas borradas antes de reconstruir el pool): cualquiera que exista
+        obj = _sortear(db, modelo, ids, ())
+    if obj is not None:
+        with _lock:
+            recientes.append(obj.id)
+    return obj
+
+
+def video_aleatorio(db, modalidad: str = None, fases: tuple = None, sin_repetir: bool = False):
+    """Vídeo aleatorio, opcionalmente de una modalidad y/o de ciertas fases."""
+    filtros = []
+    if modalidad:
+        filtros.append(Video.modalidad == modalidad)
+    if fases:
+        filtros.append(Video.fase.in_(fases))
+    clave = ("videos", modalidad, tuple(fases or ()))
+    return _elegir(db, Video, clave, filtros, sin_repetir)
+
+
+def letra_aleatoria(db, con_contenido: bool = True, sin_repetir: bool = False):
+    """Letra aleatoria; con_contenido=True descarta las que solo tienen metadata."""
+    filtros = [Letra.contenido != "", Letra.contenido.isnot(None)] if con_contenido else []
+    clave = ("letras", con_contenido)
+    return _elegir(db, Letra, clave, filtros, sin_repetir)
@@ -0,0 +1,183 @@
+"""
+Versiones de menor bitrate (64/96 kbps) de las pistas de data/audio.
+
+    /api/audio/file/...?calidad=64      → versión de 64 kbps
+    cabecera Save-Data: on              → la calidad más baja
+    ?calidad=original                   → siempre el fichero original
+
+Las versiones se generan con ffmpeg en segundo plano (pool de
+config.AUDIO_TRANSCODE_WORKERS procesos ffmpeg simultáneos) y se guardan en
+config.RENDICIONES_DIR con nombre {huella}-{kbps}.mp3, donde la huella se
+deriva de ruta + tamaño + mtime del original: si el MP3 cambia, la versión
+vieja deja de usarse y acaba expulsada. El directorio se mantiene por
+debajo de config.RENDICIONES_MAX_MB expulsando las menos usadas (LRU por
+mtime, que se refresca al servirlas).
+
+Mientras una versión se está generando se sirve el original. Si ffmpeg
+falla, la versión se anota como fallida y no se reintenta mientras el
+original no cambie (tamaño/mtime → otra huella). Como mucho hay
+config.AUDIO_TRANSCODE_COLA versiones pendientes; las que no caben se
+piden de nuevo en la siguiente reproducción.
+Sin ffmpeg en el sistema todo se sirve en calidad original.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from backend.config import config
+
+CALIDADES = (64, 96)            # kbps disponibles
+_TOQUE_MIN = 3600               # segundos entre actualizaciones del mtime (LRU)
+_TIMEOUT_FFMPEG = 300
+
+_ffmpeg = config.FFMPEG_PATH or shutil.which("ffmpeg")
+_pool = None
+_en_curso: set = set()          # nombres de fichero que se están generando (o en cola)
+_fallidas: set = set()          # nombres cuyo ffmpeg falló: no se reintentan
+_lock = threading.Lock()
+_estado = {"generadas": 0, "errores": 0, "expulsadas": 0, "descartadas": 0}
+
+
+def disponible() -> bool:
+    return bool(_ffmpeg)
+
+
+def calidad_pedida(args, headers):
+    """
+    kbps pedidos por el cliente, o None para el original.
+    Prioridad: ?calidad= explícito, luego la cabecera Save-Data.
+    """
+    valor = (args.get("calidad") or "").strip().lower()
+    if valor == "original":
+        return None
+    if valor.isdigit():
+        kbps = int(valor)
+        # La calidad disponible más cercana por debajo (o la mínima)
+        candidatas = [c for c in CALIDADES if c <= kbps]
+        return max(candidatas) if candidatas else CALIDADES[0]
+    if headers.get("Save-Data", "").lower() == "on":
+        return CALIDADES[0]
+    return None
+
+
+def _huella(ruta: str, st) -> str:
+    clave = f"{ruta}:{st.st_size}:{st.st_mtime_ns}"
+    return hashlib.sha1(clave.encode("utf-8")).hexdigest()[:20]
+
+
+def _directorio() -> Path:
+    return Path(config.RENDICIONES_DIR)
+
+
+def ruta_version(ruta_original: str, kbps: int):
+    """
+    Ruta de la versión a `kbps` si ya existe (y la marca como usada).
+    Si no existe la encola y devuelve None: el llamante sirve el original.
+    """
+    if not disponible() or kbps not in CALIDADES:
+        return None
+    st = os.stat(ruta_original)
+    nombre = f"{_huella(ruta_original, st)}-{kbps}.mp3"
+    destino = _directorio() / nombre
+    try:
+        mtime = destino.stat().st_mtime
+    except FileNotFoundError:
+        _encolar(ruta_original, destino, kbps)
+        return None
+    if time.time() - mtime > _TOQUE_MIN:
+        os.utime(destino)
+    return str(destino)
+
+
+def _encolar(origen: str, destino: Path, kbps: int):
+    global _pool
+    with _lock:
+        if destino.name in _en_curso or destino.name in _fallidas:
+            return
+        if len(_en_curso) >= config.AUDIO_TRANSCODE_COLA:
+            _estado["descartadas"] += 1
+            return
+        _en_curso.add(destino.name)
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=config.AUDIO_TRANSCODE_WORKERS,
+                thread_name_prefix="transcodificar",
+            )
+    _pool.submit(_generar, origen, destino, kbps)
+
+
+def _generar(origen: str, destino: Path, kbps: int):
+    """Lanza ffmpeg y publica el resultado con un rename atómico."""
+    temporal = destino.with_name(destino.name + ".tmp")
+    try:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        resultado = subprocess.run(
+            [
+                _ffmpeg, "-nostdin", "-v", "error", "-y",
+                "-i", origen,
+                "-map", "0:a:0", "-codec:a", "libmp3lame", "-b:a", f"{kbps}k",
+                "-f", "mp3", str(temporal),
+            ],
+            capture_output=True, text=True, timeout=_TIMEOUT_FFMPEG,
+        )
+        if resultado.returncode != 0:
+            raise RuntimeError(resultado.stderr.strip()[-300:])
+        os.replace(temporal, destino)
+        with _lock:
+            _estado["generadas"] += 1
+    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+        print(f"[Audio] Error generando versión {kbps}k de {origen}: {e}")
+        with _lock:
+            _estado["errores"] += 1
+            _fallidas.add(destino.name)
+        temporal.unlink(missing_ok=True)
+    else:
+        # La versión ya está publicada: un fallo al expulsar no la invalida
+        try:
+            _recortar()
+        except OSError as e:
+            print(f"[Audio] Error expulsando versiones antiguas: {e}")
+    finally:
+        with _lock:
+            _en_curso.discard(destino.name)
+
+
+def _recortar():
+    """Expulsa las versiones menos usadas hasta quedar bajo RENDICIONES_MAX_MB."""
+    limite = config.RENDICIONES_MAX_MB * 1024 * 1024
+    ficheros = []
+    for f in _directorio().glob("*.mp3"):
+        try:
+            st = f.stat()
+        except FileNotFoundError:
+            continue
+        ficheros.append((st.st_mtime, st.st_size, f))
+    total = sum(tam for _, tam, _ in ficheros)
+    for _, tam, f in sorted(ficheros, key=lambda x: x[0]):
+        if total <= limite:
+            break
+        f.unlink(missing_ok=True)
+        total -= tam
+        with _lock:
+            _estado["expulsadas"] += 1
+
+
+def estado() -> dict:
+    """Contadores y ocupación del directorio de versiones (para admin)."""
+    ficheros = list(_directorio().glob("*.mp3")) if _directorio().exists() else []
+    with _lock:
+        return {
+            **_estado,
+            "ffmpeg": _ffmpeg,
+            "en_curso": len(_en_curso),
+            "fallidas": len(_fallidas),
+            "max_cola": config.AUDIO_TRANSCODE_COLA,
+            "ficheros": len(ficheros),
+            "mb": round(sum(f.stat().st_size for f in ficheros) / 1024 / 1024, 1),
+            "max_mb": config.RENDICIONES_MAX_MB,
+        }
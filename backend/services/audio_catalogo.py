@@ -0,0 +1,253 @@
+"""
+Índice de la biblioteca de audio (tabla pistas_audio).
+
+El escáner recorre data/audio/{modalidad}/{grupo}/*.mp3 en segundo plano y
+mantiene una fila por pista con modalidad, grupo, nº de pista, título
+limpio, tamaño, mtime y duración. La API sirve el listado desde la tabla,
+sin tocar el disco en cada petición.
+
+Escaneo incremental: solo se revisan las carpetas de grupo cuyo mtime ha
+cambiado (altas/bajas de ficheros). Cada AUDIO_FULL_CADA ciclos se hace una
+pasada completa para detectar ficheros modificados in situ. Se usa sondeo
+de mtimes en lugar de inotify porque el despliegue es Windows.
+
+Tras cada escaneo, las pistas sin metadatos (nuevas o cuyo tamaño/mtime ha
+cambiado: bitrate NULL) pasan por mp3_meta en un pool de hilos, una tarea
+por carpeta de grupo. El resultado queda en la fila, así que la tabla hace
+de caché por ruta+mtime+tamaño y cada fichero se lee una sola vez.
+"""
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from pathlib import Path
+
+from sqlalchemy import or_
+
+from backend.config import config
+from backend.database import escritura
+from backend.models import PistaAudio
+from backend.services.mp3_meta import leer_metadatos
+
+# Elimina prefijo "01 - 01.- " o "01 - 01 - " del nombre de archivo
+_PREFIX_RE = re.compile(r"^\d+\s*[-–]\s*\d+[.\-]*\s*")
+_NUMERO_RE = re.compile(r"^(\d+)")
+
+# Una pasada completa (re-stat de todos los ficheros) cada N ciclos
+AUDIO_FULL_CADA = 10
+
+_dirs_vistos: dict = {}           # Path de la carpeta de grupo → st_mtime ya indexado
+_lock_escaneo = threading.Lock()  # un escaneo a la vez
+_hilo = None
+_activo = False
+
+
+def limpiar_titulo(nombre: str) -> str:
+    """'01 - 02.- Presentación.mp3' → 'Presentación'"""
+    stem = Path(nombre).stem
+    return _PREFIX_RE.sub("", stem).strip()
+
+
+def _numero_pista(nombre: str):
+    m = _NUMERO_RE.match(nombre)
+    return int(m.group(1)) if m else None
+
+
+def id_pista(ruta: str) -> str:
+    """Id estable de una pista a partir de su ruta relativa."""
+    return hashlib.sha1(ruta.encode("utf-8")).hexdigest()[:12]
+
+
+def _carpetas_grupo(base: Path):
+    """(modalidad, grupo, Path) de cada carpeta de grupo en disco."""
+    if not base.exists():
+        return
+    for mod_dir in sorted(base.iterdir()):
+        if not mod_dir.is_dir():
+            continue
+        for grupo_dir in sorted(mod_dir.iterdir()):
+            if grupo_dir.is_dir():
+                yield mod_dir.name, grupo_dir.name, grupo_dir
+
+
+def _sincronizar_carpeta(db, modalidad: str, grupo: str, carpeta: Path, resumen: dict):
+    """Alinea las filas de un grupo con los MP3 que hay en su carpeta."""
+    filas = {
+        p.archivo: p for p in
+        db.query(PistaAudio).filter(PistaAudio.modalidad == modalidad, PistaAudio.grupo == grupo)
+    }
+    for f in carpeta.iterdir():
+        if f.suffix.lower() != ".mp3" or not f.is_file():
+            continue
+        st = f.stat()
+        pista = filas.pop(f.name, None)
+        if pista is None:
+            ruta = f"{modalidad}/{grupo}/{f.name}"
+            db.add(PistaAudio(
+                pista_id=id_pista(ruta),
+                ruta=ruta,
+                modalidad=modalidad,
+                grupo=grupo,
+                archivo=f.name,
+                numero=_numero_pista(f.name),
+                titulo=limpiar_titulo(f.name),
+                tamaño=st.st_size,
+                mtime=st.st_mtime,
+            ))
+            resumen["nuevas"] += 1
+        elif pista.tamaño != st.st_size or pista.mtime != st.st_mtime:
+            pista.tamaño = st.st_size
+            pista.mtime = st.st_mtime
+            pista.duracion = None       # se vuelve a extraer
+            pista.bitrate = None
+            resumen["actualizadas"] += 1
+
+    # Lo que queda en BD ya no existe en disco
+    for pista in filas.values():
+        db.delete(pista)
+        resumen["eliminadas"] += 1
+
+
+def escanear(completo: bool = False) -> dict:
+    """
+    Sincroniza pistas_audio con data/audio. Devuelve un resumen
+    {nuevas, actualizadas, eliminadas, carpetas_revisadas}.
+    """
+    if not _lock_escaneo.acquire(blocking=False):
+        return {"en_curso": True}
+
+    resumen = {"nuevas": 0, "actualizadas": 0, "eliminadas": 0, "carpetas_revisadas": 0}
+    mtimes = {}
+    try:
+        with escritura() as db:
+            en_bd = set(db.query(PistaAudio.modalidad, PistaAudio.grupo).distinct())
+        en_disco = set()
+
+        # Una transacción corta por carpeta: el escritor queda libre entre carpetas
+        for modalidad, grupo, carpeta in _carpetas_grupo(Path(config.AUDIO_DIR)):
+            en_disco.add((modalidad, grupo))
+            mtime = carpeta.stat().st_mtime
+            mtimes[carpeta] = mtime
+            if not completo and _dirs_vistos.get(carpeta) == mtime:
+                continue
+            with escritura() as db:
+                _sincronizar_carpeta(db, modalidad, grupo, carpeta, resumen)
+            resumen["carpetas_revisadas"] += 1
+
+        # Carpetas de grupo (o modalidades enteras) borradas del disco
+        with escritura() as db:
+            for modalidad, grupo in en_bd - en_disco:
+                for pista in db.query(PistaAudio).filter(
+                    PistaAudio.modalidad == modalidad, PistaAudio.grupo == grupo
+                ):
+                    db.delete(pista)
+                    resumen["eliminadas"] += 1
+
+        _dirs_vistos.clear()
+        _dirs_vistos.update(mtimes)
+        if resumen["nuevas"] or resumen["actualizadas"] or resumen["eliminadas"]:
+            print(f"[Audio] Índice actualizado: {resumen}")
+        return resumen
+
+    except Exception as e:
+        print(f"[Audio] Error escaneando biblioteca: {e}")
+        return {**resumen, "error": str(e)}
+    finally:
+        _lock_escaneo.release()
+
+
+# ─── Metadatos (duración, bitrate) ────────────────────────────────────────────
+
+def _leer_carpeta(base: Path, pistas: list) -> list:
+    """[(id, ruta)] de una carpeta → [(id, metadatos | None)]. Corre en el pool."""
+    resultado = []
+    for id_, ruta in pistas:
+        try:
+            resultado.append((id_, leer_metadatos(str(base / ruta))))
+        except (OSError, ValueError) as e:
+            print(f"[Audio] Sin metadatos para {ruta}: {e}")
+            resultado.append((id_, None))
+    return resultado
+
+
+def extraer_metadatos() -> dict:
+    """
+    Lee las cabeceras MP3 de las pistas pendientes (bitrate NULL, o sin el
+    tramo de audio calculado) y guarda duración, bitrate, tramo de audio y
+    el id estable. Devuelve
+    {procesadas, fallidas}.
+    """
+    resumen = {"procesadas": 0, "fallidas": 0}
+    try:
+        with escritura() as db:
+            pendientes = (
+                db.query(PistaAudio.id, PistaAudio.ruta, PistaAudio.modalidad, PistaAudio.grupo)
+                .filter(or_(
+                    PistaAudio.bitrate.is_(None),
+                    (PistaAudio.bitrate > 0) & PistaAudio.fin_audio.is_(None),
+                ))
+                .order_by(PistaAudio.modalidad, PistaAudio.grupo)
+                .all()
+            )
+        if not pendientes:
+            return resumen
+
+        base = Path(config.AUDIO_DIR)
+        carpetas = [
+            [(p.id, p.ruta) for p in filas]
+            for _, filas in groupby(pendientes, key=lambda p: (p.modalidad, p.grupo))
+        ]
+        with ThreadPoolExecutor(max_workers=config.AUDIO_META_WORKERS) as pool:
+            for lote in pool.map(lambda c: _leer_carpeta(base, c), carpetas):
+                # Una transacción por carpeta, con las cabeceras ya leídas: el
+                # listado se completa progresivamente y el escritor no espera al disco
+                with escritura() as db:
+                    for id_, meta in lote:
+                        pista = db.get(PistaAudio, id_)
+                        if pista is None:
+                            continue
+                        pista.pista_id = pista.pista_id or id_pista(pista.ruta)
+                        if meta is None:
+                            pista.bitrate = 0       # ilegible: no se reintenta hasta que cambie
+                            resumen["fallidas"] += 1
+                            continue
+                        pista.duracion = round(meta["duracion"])
+                        pista.bitrate = meta["bitrate"]
+                        pista.inicio_audio = meta.get("inicio_audio")
+                        pista.fin_audio = meta.get("fin_audio")
+                        if pista.numero is None and (meta.get("pista") or "").split("/")[0].isdigit():
+                            pista.numero = int(meta["pista"].split("/")[0])
+                        resumen["procesadas"] += 1
+
+        print(f"[Audio] Metadatos extraídos: {resumen}")
+        return resumen
+
+    except Exception as e:
+        print(f"[Audio] Error extrayendo metadatos: {e}")
+        return {**resumen, "error": str(e)}
+
+
+def _loop_escaner():
+    ciclo = 0
+    while _activo:
+        escanear(completo=(ciclo % AUDIO_FULL_CADA == 0))
+        extraer_metadatos()
+        ciclo += 1
+        time.sleep(config.AUDIO_SCAN_INTERVAL)
+
+
+def iniciar_escaner():
+    """Inicia el hilo que mantiene actualizado el índice de audio."""
+    global _hilo, _activo
+    if _hilo and _hilo.is_alive():
+        return
+    _activo = True
+    _hilo = threading.Thread(target=_loop_escaner, daemon=True)
+    _hilo.start()
+
+
+def detener_escaner():
+    global _activo
+    _activo = False
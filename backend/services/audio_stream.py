@@ -0,0 +1,337 @@
+"""
+Servicio de MP3 para /api/audio/file con soporte completo de Range.
+
+  - Petición completa (200): el fichero va en wsgi.file_wrapper y el servidor
+    lo lee por bloques sin pasar por la vista. Va envuelto en _FicheroContado
+    para medir lo leído; sin fileno() a la vista, así que un servidor con
+    sendfile() lo leería igualmente por read() (ninguno de servidor.MODOS
+    usa sendfile).
+  - Rangos (206, seek del reproductor): se leen con os.pread sobre un
+    descriptor compartido de un pool LRU acotado (config.AUDIO_FD_MAX), así
+    que cada seek no reabre el fichero. En Windows (sin pread) se abre el
+    fichero por petición y se usa seek.
+  - Varios rangos → multipart/byteranges. If-Range con ETag o fecha.
+  - ETag/Last-Modified propios (tamaño + mtime) → 304 en revalidaciones.
+  - responder_concatenado: varios ficheros (un álbum) como un solo recurso
+    con Range, leyendo de cada fichero solo el tramo indicado.
+
+Los bytes servidos por pista se acumulan en services/metricas
+(familia "audio_bytes") a medida que salen hacia el cliente: si el
+reproductor corta la descarga al hacer seek, solo cuenta lo enviado. Las
+peticiones van en "audio_peticiones".
+"""
+import hashlib
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_date, quote_etag
+from werkzeug.wsgi import wrap_file
+
+from backend.config import config
+from backend.services import metricas
+
+_TROZO = 64 * 1024              # bytes por lectura al servir rangos
+_MAX_RANGOS = 16                # más rangos que esto se sirve como 200 completo
+_CACHE_CONTROL = "public, max-age=3600"
+
+_PREAD = hasattr(os, "pread")
+
+
+# ─── Pool de descriptores ─────────────────────────────────────────────────────
+
+class _Descriptor:
+    """fd abierto de una pista con contador de uso (no se cierra mientras se lee)."""
+
+    __slots__ = ("fd", "tamaño", "mtime", "usos", "expulsado")
+
+    def __init__(self, ruta: str, tamaño: int, mtime: float):
+        self.fd = os.open(ruta, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        self.tamaño = tamaño
+        self.mtime = mtime
+        self.usos = 0
+        self.expulsado = False
+
+
+class _PoolDescriptores:
+    """LRU de ficheros abiertos para las pistas más escuchadas."""
+
+    def __init__(self, maximo: int):
+        self._maximo = maximo
+        self._abiertos = OrderedDict()      # ruta → _Descriptor
+        self._lock = threading.Lock()
+
+    def tomar(self, ruta: str, tamaño: int, mtime: float) -> _Descriptor:
+        with self._lock:
+            d = self._abiertos.get(ruta)
+            if d and (d.tamaño != tamaño or d.mtime != mtime):
+                self._expulsar(ruta)        # el fichero cambió en disco
+                d = None
+            if d is None:
+                d = _Descriptor(ruta, tamaño, mtime)
+                self._abiertos[ruta] = d
+                while len(self._abiertos) > self._maximo:
+                    self._expulsar(next(iter(self._abiertos)))
+            else:
+                self._abiertos.move_to_end(ruta)
+            d.usos += 1
+            return d
+
+    def soltar(self, d: _Descriptor):
+        with self._lock:
+            d.usos -= 1
+            if d.expulsado and d.usos == 0:
+                os.close(d.fd)
+
+    def _expulsar(self, ruta: str):
+        d = self._abiertos.pop(ruta)
+        d.expulsado = True
+        if d.usos == 0:
+            os.close(d.fd)
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                "abiertos": len(self._abiertos),
+                "maximo": self._maximo,
+                "en_uso": sum(1 for d in self._abiertos.values() if d.usos),
+            }
+
+
+_pool = _PoolDescriptores(config.AUDIO_FD_MAX)
+
+
+def estado_pool() -> dict:
+    return {**_pool.estado(), "pread": _PREAD}
+
+
+# ─── Lectura de rangos ────────────────────────────────────────────────────────
+
+def _trozos(ruta: str, st, desde: int, hasta: int):
+    """Bytes [desde, hasta) del fichero en trozos de _TROZO (pread del pool, o seek)."""
+    if _PREAD:
+        d = _pool.tomar(ruta, st.st_size, st.st_mtime)
+        try:
+            while desde < hasta:
+                datos = os.pread(d.fd, min(_TROZO, hasta - desde), desde)
+                if not datos:
+                    return
+                desde += len(datos)
+                yield datos
+        finally:
+            _pool.soltar(d)
+    else:
+        with open(ruta, "rb") as f:
+            f.seek(desde)
+            while desde < hasta:
+                datos = f.read(min(_TROZO, hasta - desde))
+                if not datos:
+                    return
+                desde += len(datos)
+                yield datos
+
+
+def _leer(segmentos: list, rangos: list, partes: list, cierre: bytes, clave: str):
+    """
+    Genera los rangos pedidos del recurso formado por `segmentos` (uno por
+    fichero, en orden), precedidos de su cabecera multipart si la hay.
+    Al terminar o cortarse la descarga suma a "audio_bytes" el audio enviado.
+    """
+    enviados = 0
+    try:
+        for cabecera, (inicio, fin) in zip(partes, rangos):
+            if cabecera:
+                yield cabecera
+            base = 0
+            for seg in segmentos:
+                largo = seg.fin - seg.inicio
+                desde, hasta = max(inicio, base), min(fin, base + largo)
+                if desde < hasta:
+                    for datos in _trozos(seg.ruta, seg.st, seg.inicio + desde - base, seg.inicio + hasta - base):
+                        enviados += len(datos)
+                        yield datos
+                base += largo
+                if base >= fin:
+                    break
+        if cierre:
+            yield cierre
+    finally:
+        if enviados:
+            metricas.sumar("audio_bytes", clave, enviados)
+
+
+class _FicheroContado:
+    """
+    Fichero abierto para wsgi.file_wrapper que cuenta los bytes leídos y los
+    suma a "audio_bytes" al cerrarse (el servidor cierra al acabar o al cortar).
+    """
+
+    def __init__(self, ruta: str, clave: str):
+        self._f = open(ruta, "rb")
+        self._clave = clave
+        self._leidos = 0
+
+    def read(self, n: int = -1) -> bytes:
+        datos = self._f.read(n)
+        self._leidos += len(datos)
+        return datos
+
+    def seek(self, *args):
+        return self._f.seek(*args)
+
+    def tell(self) -> int:
+        return self._f.tell()
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.close()
+        if self._leidos:
+            metricas.sumar("audio_bytes", self._clave, self._leidos)
+
+
+def _rangos_pedidos(tamaño: int):
+    """
+    Rangos [inicio, fin) satisfacibles de la cabecera Range, ordenados y
+    fusionados. None si no hay cabecera (o es inválida); [] si ninguno cabe.
+    """
+    rango = request.range
+    if rango is None or rango.units != "bytes":
+        return None
+    rangos = []
+    for inicio, fin in rango.ranges:
+        if inicio < 0:                      # sufijo: "bytes=-500"
+            inicio, fin = max(0, tamaño + inicio), tamaño
+        fin = tamaño if fin is None else min(fin, tamaño)
+        if inicio < fin:
+            rangos.append((inicio, fin))
+    rangos.sort()
+    fusionados = []
+    for inicio, fin in rangos:
+        if fusionados and inicio <= fusionados[-1][1]:
+            fusionados[-1] = (fusionados[-1][0], max(fin, fusionados[-1][1]))
+        else:
+            fusionados.append((inicio, fin))
+    return fusionados
+
+
+def _if_range_valido(etag: str, modificado: datetime) -> bool:
+    """True si no hay If-Range o si coincide con la versión actual del fichero."""
+    valor = request.headers.get("If-Range")
+    if not valor:
+        return True
+    if valor.startswith(('"', "W/")):
+        return valor == etag                # If-Range exige comparación fuerte
+    fecha = parse_date(valor)
+    return fecha is not None and fecha == modificado
+
+
+# ─── Respuesta ────────────────────────────────────────────────────────────────
+
+class _Segmento(NamedTuple):
+    ruta: str
+    st: os.stat_result
+    inicio: int     # primer byte del fichero que se sirve
+    fin: int        # byte siguiente al último
+
+
+def responder(ruta: str, clave: str, mimetype: str = "audio/mpeg") -> Response:
+    """
+    Respuesta HTTP para el fichero `ruta` (ya validado).
+    `clave` identifica la pista en las métricas (ruta relativa).
+    """
+    st = os.stat(ruta)
+    etag = f"{st.st_size:x}-{int(st.st_mtime * 1000):x}"
+    return _responder([_Segmento(ruta, st, 0, st.st_size)], etag, st.st_mtime,
+                      clave, mimetype, fichero=ruta)
+
+
+def responder_concatenado(partes: list, clave: str, mimetype: str = "audio/mpeg") -> Response:
+    """
+    Sirve varios ficheros como un único recurso con Range (p.ej. un álbum).
+    `partes` = [(ruta, inicio, fin, tamaño_indexado)]: se sirve [inicio, fin)
+    de cada fichero; si el tamaño en disco ya no coincide con el indexado,
+    los offsets no son fiables y se sirve el fichero entero.
+    """
+    segmentos = []
+    for ruta, inicio, fin, tamaño in partes:
+        st = os.stat(ruta)
+        if tamaño != st.st_size or inicio is None or fin is None:
+            inicio, fin = 0, st.st_size
+        segmentos.append(_Segmento(ruta, st, inicio, min(fin, st.st_size)))
+    firma = "|".join(f"{s.ruta}:{s.st.st_size}:{s.st.st_mtime_ns}:{s.inicio}:{s.fin}" for s in segmentos)
+    etag = hashlib.sha1(firma.encode("utf-8")).hexdigest()[:20]
+    mtime = max((s.st.st_mtime for s in segmentos), default=0)
+    return _responder(segmentos, etag, mtime, clave, mimetype)
+
+
+def _responder(segmentos: list, etag_crudo: str, mtime: float, clave: str,
+               mimetype: str, fichero: str = None) -> Response:
+    tamaño = sum(s.fin - s.inicio for s in segmentos)
+    etag = quote_etag(etag_crudo)
+    modificado = datetime.fromtimestamp(int(mtime), tz=timezone.utc)
+    cabeceras = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": http_date(modificado),
+        "Cache-Control": _CACHE_CONTROL,
+    }
+
+    # Revalidación
+    if request.if_none_match.contains(etag_crudo) or (
+        not request.if_none_match
+        and request.if_modified_since
+        and request.if_modified_since >= modificado
+    ):
+        metricas.sumar("audio_peticiones", "304")
+        return Response(status=304, headers=cabeceras)
+
+    rangos = _rangos_pedidos(tamaño) if _if_range_valido(etag, modificado) else None
+    if rangos is not None and len(rangos) > _MAX_RANGOS:
+        rangos = None
+
+    if rangos == []:
+        metricas.sumar("audio_peticiones", "416")
+        return Response(status=416, headers={**cabeceras, "Content-Range": f"bytes */{tamaño}"})
+
+    if rangos is None:
+        metricas.sumar("audio_peticiones", "200")
+        if fichero:
+            # Fichero completo: wsgi.file_wrapper, el servidor lo lee por bloques
+            cuerpo = wrap_file(request.environ, _FicheroContado(fichero, clave))
+        else:
+            cuerpo = _leer(segmentos, [(0, tamaño)], [b""], b"", clave)
+        resp = Response(cuerpo, status=200, mimetype=mimetype, headers=cabeceras,
+                        direct_passthrough=True)
+        resp.content_length = tamaño
+        return resp
+
+    cierre = b""
+    if len(rangos) == 1:
+        (inicio, fin), = rangos
+        partes = [b""]
+        cabeceras["Content-Range"] = f"bytes {inicio}-{fin - 1}/{tamaño}"
+        longitud = fin - inicio
+        tipo = mimetype
+    else:
+        frontera = secrets.token_hex(12)
+        partes = [
+            (f"\r\n--{frontera}\r\nContent-Type: {mimetype}\r\n"
+             f"Content-Range: bytes {i}-{f - 1}/{tamaño}\r\n\r\n").encode()
+            for i, f in rangos
+        ]
+        cierre = f"\r\n--{frontera}--\r\n".encode()
+        longitud = sum(len(p) for p in partes) + sum(f - i for i, f in rangos) + len(cierre)
+        tipo = f"multipart/byteranges; boundary={frontera}"
+
+    metricas.sumar("audio_peticiones", "206")
+
+    cuerpo = _leer(segmentos, rangos, partes, cierre, clave)
+    resp = Response(cuerpo, status=206, headers=cabeceras, direct_passthrough=True)
+    resp.headers["Content-Type"] = tipo
+    resp.content_length = longitud
+    return resp
@@ -0,0 +1,197 @@
+"""
+Búsqueda de texto completo sobre las tablas FTS5 (videos_fts, letras_fts).
+
+Las tablas FTS son de contenido externo y se mantienen sincronizadas con
+triggers (ver database._enable_fts). Aquí solo se construyen las consultas:
+  - expresion_fts("martinez ares") → '"martinez"* "ares"*'  (AND + prefijo)
+  - subconsulta_fts(...) → (rowid, rank) ordenable por bm25, y opcionalmente
+    un extracto snippet() alrededor de la coincidencia
+  - ids_aproximados(...) → fallback difuso por trigramas ("martines ares")
+  - grupos_exactos / grupos_aproximados(...) → agrupaciones cuyo nombre o
+    autores contienen la búsqueda (grupos_trgm), para que "martinez ares"
+    encuentre los vídeos y letras de sus agrupaciones (con_grupos, filtro_grupos)
+
+Las tablas FTS usan `unicode61 remove_diacritics 2`, así que "aragon"
+encuentra "Aragón". La clave `busqueda` de Video/Letra/Grupo guarda el mismo
+texto normalizado (ver normalizar) y alimenta los índices *_trgm.
+"""
+import re
+import sqlite3
+import unicodedata
+
+from sqlalchemy import Float, Integer, String, bindparam, case, literal, null, or_, select, text, union_all
+
+# Pesos bm25 por columna (titulo, descripcion/contenido, grupo_nombre)
+PESOS_VIDEOS = (10.0, 1.0, 5.0)
+PESOS_LETRAS = (5.0, 1.0, 8.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_NO_ALNUM_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+# El tokenizer trigram de FTS5 existe desde SQLite 3.34
+TRIGRAM_DISPONIBLE = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+# Marcas de resaltado en los extractos de snippet(): caracteres de control
+# que no aparecen en el texto, así el cliente escapa el HTML y luego las
+# convierte en <mark> sin riesgo de inyección.
+MARCA_INICIO = "\x02"
+MARCA_FIN = "\x03"
+TOKENS_EXTRACTO = 24
+
+# Fracción mínima de trigramas de la consulta presentes en el candidato
+UMBRAL_SIMILITUD = 0.5
+
+# Agrupaciones como mucho por búsqueda (un autor firma decenas, no cientos)
+MAX_GRUPOS = 50
+
+
+def normalizar(texto: str) -> str:
+    """'Martínez Ares (El Brujo)' → 'martinez ares el brujo'"""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(_NO_ALNUM_RE.sub(" ", texto.lower()).split())
+
+
+def trigramas(texto: str) -> set:
+    """Trigramas de cada palabra (≥3 letras) del texto ya normalizado."""
+    grams = set()
+    for palabra in texto.split():
+        grams.update(palabra[i:i + 3] for i in range(len(palabra) - 2))
+    return grams
+
+
+def expresion_fts(texto: str, columna: str = None) -> str:
+    """
+    Convierte el texto libre del buscador en una expresión MATCH segura:
+    cada palabra entre comillas (sin operadores FTS) y con prefijo '*'.
+    Devuelve '' si no queda ninguna palabra.
+    """
+    tokens = _TOKEN_RE.findall(texto or "")
+    if not tokens:
+        return ""
+    expr = " ".join(f'"{t}"*' for t in tokens)
+    if columna:
+        expr = f"{{{columna}}}: ({expr})"
+    return expr
+
+
+def subconsulta_fts(tabla_fts: str, expresion: str, pesos: tuple, extracto: int = None):
+    """
+    Subconsulta (rowid, rank) sobre la tabla FTS indicada.
+    rank = bm25 ponderado (más negativo = más relevante → ordenar ASC).
+    Con `extracto` (índice de columna FTS) añade la columna `extracto`:
+    fragmento de esa columna alrededor de la coincidencia, con los términos
+    entre MARCA_INICIO y MARCA_FIN.
+    """
+    args = ", ".join(str(p) for p in pesos)
+    columnas = {"rowid": Integer, "rank": Float}
+    select_extracto = ""
+    if extracto is not None:
+        select_extracto = (
+            f", snippet({tabla_fts}, {int(extracto)}, '{MARCA_INICIO}', '{MARCA_FIN}', "
+            f"'…', {TOKENS_EXTRACTO}) AS extracto"
+        )
+        columnas["extracto"] = String
+    return (
+        text(
+            f"SELECT rowid, bm25({tabla_fts}, {args}) AS rank{select_extracto} "
+            f"FROM {tabla_fts} WHERE {tabla_fts} MATCH :expr"
+        )
+        # unique=True: varias subconsultas FTS pueden convivir en la misma query
+        .bindparams(bindparam("expr", value=expresion, unique=True))
+        .columns(**columnas)
+        .subquery()
+    )
+
+
+def ids_aproximados(db, tabla: str, texto: str, limite: int = 100) -> list:
+    """
+    Búsqueda difusa por trigramas sobre {tabla}_trgm (columna `busqueda`).
+    Preselecciona candidatos en el índice (OR de trigramas, orden bm25) y los
+    filtra por la fracción de trigramas de la consulta que contienen.
+    Devuelve ids ordenados de más a menos parecido.
+    """
+    consulta = trigramas(normalizar(texto))
+    if not consulta or not TRIGRAM_DISPONIBLE:
+        return []
+
+    trgm = f"{tabla}_trgm"
+    expr = " OR ".join(f'"{g}"' for g in sorted(consulta))
+    filas = db.execute(
+        text(
+            f"SELECT {tabla}.id, {tabla}.busqueda FROM {trgm} "
+            f"JOIN {tabla} ON {tabla}.id = {trgm}.rowid "
+            f"WHERE {trgm} MATCH :expr ORDER BY {trgm}.rank LIMIT :n"
+        ),
+        {"expr": expr, "n": limite * 4},
+    ).all()
+
+    puntuados = []
+    for id_, clave in filas:
+        similitud = len(consulta & trigramas(clave or "")) / len(consulta)
+        if similitud >= UMBRAL_SIMILITUD:
+            puntuados.append((similitud, id_))
+    puntuados.sort(key=lambda p: -p[0])   # sort estable: conserva el orden bm25
+    return [id_ for _, id_ in puntuados[:limite]]
+
+
+def grupos_exactos(db, texto: str, limite: int = MAX_GRUPOS) -> list:
+    """
+    (id, nombre) de las agrupaciones cuya clave (nombre + autores
+    normalizados) contiene todas las palabras de ≥3 letras del texto, vía
+    grupos_trgm: "martinez ares" → las agrupaciones de Antonio Martínez Ares.
+    """
+    palabras = [p for p in normalizar(texto).split() if len(p) >= 3]
+    if not palabras or not TRIGRAM_DISPONIBLE:
+        return []
+    return [tuple(f) for f in db.execute(
+        text(
+            "SELECT grupos.id, grupos.nombre FROM grupos_trgm "
+            "JOIN grupos ON grupos.id = grupos_trgm.rowid "
+            "WHERE grupos_trgm MATCH :expr ORDER BY grupos_trgm.rank LIMIT :n"
+        ),
+        {"expr": " ".join(f'"{p}"' for p in palabras), "n": limite},
+    ).all()]
+
+
+def grupos_aproximados(db, texto: str, limite: int = MAX_GRUPOS) -> list:
+    """Como grupos_exactos pero con erratas ("martines ares"), por ids_aproximados."""
+    ids = ids_aproximados(db, "grupos", texto, limite)
+    if not ids:
+        return []
+    nombres = dict(db.execute(
+        text("SELECT id, nombre FROM grupos WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids},
+    ).all())
+    return [(id_, nombres[id_]) for id_ in ids if id_ in nombres]
+
+
+def filtro_grupos(modelo, grupos: list):
+    """
+    Filas de `modelo` (Video o Letra) de esas agrupaciones: por grupo_id o,
+    como casi nunca está enlazado, por el nombre desnormalizado.
+    """
+    return or_(
+        modelo.grupo_id.in_([id_ for id_, _ in grupos]),
+        modelo.grupo_nombre.in_([nombre for _, nombre in grupos]),
+    )
+
+
+def con_grupos(fts, modelo, grupos: list):
+    """
+    Amplía una subconsulta_fts con las filas de `grupos` que el texto no
+    encuentra. Entran con rank 0, detrás de cualquier coincidencia de texto
+    (bm25 es negativo), y con extracto NULL si la subconsulta lo lleva.
+    """
+    extra = [null().label("extracto")] if "extracto" in fts.c else []
+    por_texto = select(*fts.c)
+    por_grupo = select(modelo.id.label("rowid"), literal(0.0, Float).label("rank"), *extra).where(
+        filtro_grupos(modelo, grupos),
+        modelo.id.not_in(select(fts.c.rowid)),
+    )
+    return union_all(por_texto, por_grupo).subquery()
+
+
+def orden_por_ids(columna, ids: list):
+    """Expresión ORDER BY que respeta el orden de una lista de ids (el resto, al final)."""
+    return case({id_: i for i, id_ in enumerate(ids)}, value=columna, else_=len(ids))
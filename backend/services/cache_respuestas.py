@@ -0,0 +1,218 @@
+"""
+Caché de respuestas para endpoints de solo lectura del catálogo.
+
+    @bp.route("/", methods=["GET"])
+    @cacheado("videos")
+    def listar_videos(): ...
+
+La clave combina endpoint, argumentos de ruta, query string normalizada y
+la versión de las tablas de las que depende la respuesta (services/catalogo),
+así que cualquier escritura invalida exactamente las entradas afectadas.
+Cada respuesta lleva ETag y Last-Modified y se responde 304 cuando el
+navegador (o Cloudflare) ya tiene esa versión.
+
+Backends (config.CACHE_BACKEND):
+  - memoria: LRU en proceso con TTL (por defecto)
+  - fichero: un fichero por entrada en config.CACHE_DIR
+  - redis:   cualquier servidor compatible con Redis (requiere `redis`)
+  - ninguno: desactiva la caché (se mantienen ETag/304)
+
+Nota: la versión del catálogo es local al proceso; con varios procesos y
+backend compartido, las escrituras de otro proceso se ven al expirar el TTL.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request
+
+from backend.config import config
+from backend.services import catalogo
+
+try:
+    import redis
+    _REDIS_DISPONIBLE = True
+except ImportError:
+    _REDIS_DISPONIBLE = False
+
+
+# ─── Backends ─────────────────────────────────────────────────────────────────
+
+class _CacheMemoria:
+    """LRU en memoria con caducidad por entrada."""
+
+    def __init__(self, max_entradas: int):
+        self._datos = OrderedDict()
+        self._max = max_entradas
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            item = self._datos.get(clave)
+            if not item:
+                return None
+            caduca, valor = item
+            if caduca < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor, ttl: int):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self._max:
+                self._datos.popitem(last=False)
+
+
+class _CacheFichero:
+    """Una entrada por fichero (sobrevive a reinicios del proceso)."""
+
+    def __init__(self, directorio: str):
+        self._dir = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave):
+        return os.path.join(self._dir, hashlib.sha1(clave.encode()).hexdigest() + ".cache")
+
+    def get(self, clave):
+        try:
+            with open(self._ruta(clave), "rb") as f:
+                caduca, valor = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        return valor if caduca >= time.time() else None
+
+    def set(self, clave, valor, ttl: int):
+        ruta = self._ruta(clave)
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump((time.time() + ttl, valor), f)
+            os.replace(tmp, ruta)
+        except OSError as e:
+            print(f"[Cache] Error escribiendo {ruta}: {e}")
+
+
+class _CacheRedis:
+    def __init__(self, url: str):
+        self._r = redis.Redis.from_url(url)
+
+    def get(self, clave):
+        try:
+            crudo = self._r.get("carnavalix:" + clave)
+        except redis.RedisError:
+            return None
+        return pickle.loads(crudo) if crudo else None
+
+    def set(self, clave, valor, ttl: int):
+        try:
+            self._r.setex("carnavalix:" + clave, ttl, pickle.dumps(valor))
+        except redis.RedisError as e:
+            print(f"[Cache] Error Redis: {e}")
+
+
+class _SinCache:
+    def get(self, clave):
+        return None
+
+    def set(self, clave, valor, ttl: int):
+        pass
+
+
+def _crear_backend():
+    tipo = config.CACHE_BACKEND.lower()
+    if tipo == "ninguno":
+        return _SinCache()
+    if tipo == "fichero":
+        return _CacheFichero(config.CACHE_DIR)
+    if tipo == "redis":
+        if _REDIS_DISPONIBLE:
+            return _CacheRedis(config.CACHE_REDIS_URL)
+        print("[Cache] Paquete 'redis' no instalado; usando caché en memoria.")
+    return _CacheMemoria(config.CACHE_MAX_ENTRADAS)
+
+
+_backend = _crear_backend()
+_contadores = {"aciertos": 0, "fallos": 0}
+_lock_contadores = threading.Lock()
+
+
+def _contar(tipo: str):
+    with _lock_contadores:
+        _contadores[tipo] += 1
+
+
+def estadisticas() -> dict:
+    total = _contadores["aciertos"] + _contadores["fallos"]
+    return {
+        "backend": type(_backend).__name__,
+        **_contadores,
+        "tasa_acierto": round(_contadores["aciertos"] / total, 3) if total else 0.0,
+    }
+
+
+# ─── Decorador ────────────────────────────────────────────────────────────────
+
+# Cabeceras de la vista que se guardan con la entrada (el resto se regenera)
+_CABECERAS_CACHEADAS = ("Link",)
+
+
+def _clave(tablas: tuple) -> str:
+    args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    vista = ",".join(f"{k}={v}" for k, v in sorted((request.view_args or {}).items()))
+    version = ".".join(str(v) for v in catalogo.version(*tablas))
+    return f"{request.endpoint}|{vista}|{args}|v{version}"
+
+
+def _responder(entrada: dict):
+    resp = make_response(entrada["cuerpo"], entrada["status"])
+    resp.mimetype = entrada["mimetype"]
+    resp.headers.extend(entrada.get("cabeceras", {}))
+    resp.set_etag(entrada["etag"])
+    resp.last_modified = entrada["modificado"]
+    # El cliente puede guardar la respuesta pero debe revalidarla (→ 304)
+    resp.headers["Cache-Control"] = "public, max-age=0, must-revalidate"
+    return resp.make_conditional(request)
+
+
+def cacheado(*tablas, ttl: int = None):
+    """Cachea la respuesta GET de la vista mientras no cambien `tablas`."""
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method != "GET":
+                return vista(*args, **kwargs)
+
+            clave = _clave(tablas)
+            entrada = _backend.get(clave)
+            if entrada is not None:
+                _contar("aciertos")
+                resp = _responder(entrada)
+                resp.headers["X-Cache"] = "HIT"
+                return resp
+
+            _contar("fallos")
+            resp = make_response(vista(*args, **kwargs))
+            if resp.status_code != 200 or resp.direct_passthrough:
+                return resp
+            cuerpo = resp.get_data()
+            entrada = {
+                "cuerpo": cuerpo,
+                "status": resp.status_code,
+                "mimetype": resp.mimetype,
+                "cabeceras": {k: resp.headers[k] for k in _CABECERAS_CACHEADAS if k in resp.headers},
+                "etag": hashlib.sha1(cuerpo).hexdigest()[:20],
+                "modificado": catalogo.ultima_modificacion(*tablas),
+            }
+            _backend.set(clave, entrada, ttl or config.CACHE_TTL)
+            resp = _responder(entrada)
+            resp.headers["X-Cache"] = "MISS"
+            return resp
+        return envoltura
+    return decorador
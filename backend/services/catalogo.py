@@ -0,0 +1,64 @@
+"""
+Versión del catálogo por tabla.
+
+Cada commit del ORM que inserta, modifica o borra filas incrementa la
+versión de las tablas afectadas (scrapers, importador, admin, votos…).
+Las cachés derivadas (estadísticas, respuestas, pools aleatorios) guardan
+la versión con la que se calcularon y se invalidan solas al cambiar.
+"""
+import threading
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_versiones: dict = {}       # tabla → contador
+_modificado: dict = {}      # tabla → datetime (UTC) del último cambio
+_lock = threading.Lock()
+_arranque = datetime.utcnow().replace(microsecond=0)
+
+_CLAVE_SESION = "catalogo_tablas"
+
+
+def version(*tablas) -> tuple:
+    """Tupla de versiones de las tablas indicadas (comparable entre llamadas)."""
+    with _lock:
+        return tuple(_versiones.get(t, 0) for t in tablas)
+
+
+def ultima_modificacion(*tablas) -> datetime:
+    """Instante del último cambio en cualquiera de las tablas (o el arranque del proceso)."""
+    with _lock:
+        return max([_modificado.get(t, _arranque) for t in tablas] or [_arranque])
+
+
+def invalidar(*tablas):
+    """Marca las tablas como modificadas. Lo llaman los commits y las escrituras fuera del ORM."""
+    ahora = datetime.utcnow().replace(microsecond=0)
+    with _lock:
+        for t in tablas:
+            _versiones[t] = _versiones.get(t, 0) + 1
+            _modificado[t] = ahora
+
+
+# ─── Integración con la sesión de SQLAlchemy ──────────────────────────────────
+
+@event.listens_for(Session, "after_flush")
+def _al_flush(session, flush_context):
+    tablas = session.info.setdefault(_CLAVE_SESION, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tabla = getattr(obj, "__tablename__", None)
+        if tabla:
+            tablas.add(tabla)
+
+
+@event.listens_for(Session, "after_commit")
+def _al_commit(session):
+    tablas = session.info.pop(_CLAVE_SESION, None)
+    if tablas:
+        invalidar(*tablas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _al_rollback(session):
+    session.info.pop(_CLAVE_SESION, None)
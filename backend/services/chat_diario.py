@@ -0,0 +1,252 @@
+"""
+Diario del chat con escritura diferida (write-behind).
+
+on_mensaje y el bot no escriben en la BD al recibir cada mensaje.
+registrar() asigna el id definitivo, deja el mensaje en una cola en memoria
+y devuelve el payload para emitirlo al momento. Un hilo vuelca la cola a
+mensajes_chat en transacciones por lotes, cada CHAT_VOLCADO_MS o en cuanto
+hay CHAT_LOTE mensajes. Así un commit (y su fsync) cubre muchos mensajes y
+una ráfaga durante una final no hace cola en el lock de escritura de SQLite.
+
+Ids: se reservan bloques de CHAT_IDS_BLOQUE con un UPDATE atómico sobre
+config_sistema. El contador nunca queda por debajo de MAX(id)+1, así que
+no choca con filas existentes ni con los bloques de otros procesos.
+
+Contrapresión: la cola admite CHAT_COLA_MAX mensajes. Si está llena,
+registrar() espera hasta CHAT_COLA_ESPERA segundos a que el volcado haga
+sitio. Si no lo hay, lanza ColaLlena y el mensaje no se acepta.
+
+Al apagar (detener_diario, vía servidor.al_apagar) se vuelca lo pendiente.
+Si el proceso muere sin apagarse, se pierde como mucho un intervalo de
+mensajes. Mientras no se vuelcan, el historial los toma de pendientes().
+"""
+import threading
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+
+from backend.config import config
+from backend.database import SessionLocal
+from backend.models import MensajeChat
+from backend.services import catalogo, metricas
+
+_CLAVE_IDS = "chat_siguiente_id"
+_REINTENTO = 1.0            # s entre intentos si el volcado falla
+
+_pendientes = deque()       # (fila, payload); solo el volcador saca por la izquierda
+_cond = threading.Condition()
+_hilo = None
+_activo = False
+
+_ids = iter(())             # resto del bloque de ids reservado
+_lock_ids = threading.Lock()
+
+
+class ColaLlena(Exception):
+    """El diario no ha podido hacer sitio a tiempo (CHAT_COLA_ESPERA)."""
+
+
+# ─── Ids por bloques ──────────────────────────────────────────────────────────
+
+def _reservar_bloque() -> range:
+    n = config.CHAT_IDS_BLOQUE
+    db = SessionLocal()
+    try:
+        for _ in range(2):
+            # El UPDATE toma el lock de escritura: leer después es atómico (también entre procesos)
+            actualizadas = db.execute(text(
+                "UPDATE config_sistema SET valor = MAX(CAST(valor AS INTEGER), "
+                "(SELECT COALESCE(MAX(id), 0) + 1 FROM mensajes_chat)) + :n, updated_at = :ahora "
+                "WHERE clave = :clave"
+            ), {"n": n, "clave": _CLAVE_IDS, "ahora": datetime.utcnow()}).rowcount
+            if actualizadas:
+                hasta = int(db.execute(text("SELECT valor FROM config_sistema WHERE clave = :clave"),
+                                       {"clave": _CLAVE_IDS}).scalar())
+                db.commit()
+                return range(hasta - n, hasta)
+            # Primera vez: crear el contador (si otro proceso se adelanta, reintentar el UPDATE)
+            try:
+                db.execute(text(
+                    "INSERT INTO config_sistema (clave, valor, descripcion, updated_at) "
+                    "SELECT :clave, COALESCE(MAX(id), 0) + 1, :descripcion, :ahora FROM mensajes_chat"
+                ), {"clave": _CLAVE_IDS, "descripcion": "Siguiente id libre del chat (services/chat_diario)",
+                    "ahora": datetime.utcnow()})
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+        raise RuntimeError("No se pudo reservar un bloque de ids del chat")
+    finally:
+        db.close()
+
+
+def _siguiente_id() -> int:
+    global _ids
+    with _lock_ids:
+        id_ = next(_ids, None)
+        if id_ is None:
+            _ids = iter(_reservar_bloque())
+            id_ = next(_ids)
+        return id_
+
+
+# ─── Registro ─────────────────────────────────────────────────────────────────
+
+def registrar(usuario: str, contenido: str, sala: str = "general", tipo: str = "user",
+              usuario_id: int = None, avatar_color: str = None, avatar_emoji: str = None) -> dict:
+    """
+    Acepta un mensaje: le asigna id, lo encola para el volcado y devuelve el
+    payload listo para emitir (misma forma que MensajeChat.to_dict()).
+    Lanza ColaLlena si la cola sigue llena tras CHAT_COLA_ESPERA segundos.
+    """
+    with _cond:
+        if len(_pendientes) >= config.CHAT_COLA_MAX:
+            metricas.sumar("chat_diario", "esperas")
+            _cond.notify_all()
+            if not _cond.wait_for(lambda: len(_pendientes) < config.CHAT_COLA_MAX,
+                                  timeout=config.CHAT_COLA_ESPERA):
+                metricas.sumar("chat_diario", "rechazados")
+                raise ColaLlena()
+
+    fila = {
+        "id": _siguiente_id(),
+        "usuario": usuario,
+        "usuario_id": usuario_id,
+        "contenido": contenido,
+        "tipo": tipo,
+        "sala": sala,
+        "created_at": datetime.utcnow(),
+    }
+    payload = {
+        "id": fila["id"],
+        "usuario": usuario,
+        "contenido": contenido,
+        "tipo": tipo,
+        "sala": sala,
+        "hora": fila["created_at"].strftime("%H:%M"),
+    }
+    if avatar_color or avatar_emoji:
+        payload["avatar_color"] = avatar_color
+        payload["avatar_emoji"] = avatar_emoji
+
+    with _cond:
+        _pendientes.append((fila, payload))
+        if len(_pendientes) >= config.CHAT_LOTE:
+            _cond.notify_all()
+    return payload
+
+
+def pendientes(sala: str) -> list:
+    """Payloads aún sin volcar de una sala, en orden de llegada."""
+    with _cond:
+        return [payload for fila, payload in _pendientes if fila["sala"] == sala]
+
+
+# ─── Volcado ──────────────────────────────────────────────────────────────────
+
+def _insertar(filas: list) -> int:
+    """
+    Inserta un lote en una transacción. Devuelve cuántas filas se guardaron.
+    Va por el pool general, no por el escritor de los trabajos en segundo
+    plano: el chat no debe esperar a un scraper (busy_timeout cubre el lock).
+    """
+    db = SessionLocal()
+    try:
+        try:
+            db.execute(insert(MensajeChat), filas)
+            db.commit()
+            return len(filas)
+        except IntegrityError:
+            # Alguna fila choca (id repetido, usuario borrado…): una a una y se descartan las malas
+            db.rollback()
+            guardadas = 0
+            for fila in filas:
+                try:
+                    db.execute(insert(MensajeChat), [fila])
+                    db.commit()
+                    guardadas += 1
+                except IntegrityError as e:
+                    db.rollback()
+                    print(f"[Chat] Mensaje {fila['id']} descartado: {e.orig}")
+            return guardadas
+    finally:
+        db.close()
+
+
+def _volcar_lote() -> bool:
+    """Vuelca hasta CHAT_LOTE mensajes. False si la BD ha fallado (se reintenta)."""
+    with _cond:
+        lote = [fila for fila, _ in islice(_pendientes, config.CHAT_LOTE)]
+    if not lote:
+        return True
+    try:
+        guardadas = _insertar(lote)
+    except Exception as e:
+        metricas.sumar("chat_diario", "errores")
+        print(f"[Chat] Error volcando {len(lote)} mensajes (se reintenta): {e}")
+        return False
+    # Se sacan de la cola ya confirmados: el historial nunca deja de verlos
+    with _cond:
+        for _ in lote:
+            _pendientes.popleft()
+        _cond.notify_all()      # productores esperando sitio
+    catalogo.invalidar(MensajeChat.__tablename__)
+    metricas.sumar("chat_diario", "lotes")
+    metricas.sumar("chat_diario", "mensajes", guardadas)
+    return True
+
+
+def _volcador():
+    while True:
+        with _cond:
+            if _activo and len(_pendientes) < config.CHAT_LOTE:
+                _cond.wait(config.CHAT_VOLCADO_MS / 1000)
+            if not _pendientes:
+                if not _activo:
+                    return
+                continue
+        if _volcar_lote():
+            continue
+        if not _activo:
+            with _cond:
+                print(f"[Chat] Apagando con la BD fallando: se pierden {len(_pendientes)} mensajes.")
+            return
+        with _cond:
+            _cond.wait(_REINTENTO)
+
+
+def iniciar_diario():
+    """Arranca el hilo que vuelca el chat a la BD."""
+    global _hilo, _activo
+    if _hilo and _hilo.is_alive():
+        return
+    _activo = True
+    _hilo = threading.Thread(target=_volcador, daemon=True, name="chat-diario")
+    _hilo.start()
+
+
+def detener_diario():
+    """Vuelca lo pendiente y detiene el hilo (espera hasta SERVIDOR_APAGADO segundos)."""
+    global _activo
+    with _cond:
+        _activo = False
+        _cond.notify_all()
+    if _hilo:
+        _hilo.join(config.SERVIDOR_APAGADO)
+    with _cond:
+        if _pendientes:
+            print(f"[Chat] {len(_pendientes)} mensajes sin volcar al apagar.")
+
+
+def estado() -> dict:
+    with _cond:
+        n = len(_pendientes)
+    return {
+        "pendientes": n,
+        "max": config.CHAT_COLA_MAX,
+        "lote": config.CHAT_LOTE,
+        "volcado_ms": config.CHAT_VOLCADO_MS,
+        "activo": bool(_hilo and _hilo.is_alive()),
+    }
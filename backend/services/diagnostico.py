@@ -0,0 +1,256 @@
+"""
+Diagnóstico de consultas.
+
+  - planes_consulta: EXPLAIN QUERY PLAN sobre las formas de consulta reales
+    del catálogo (listados, búsqueda, cursor, ranking, importadores…),
+    montadas con las mismas piezas que las rutas; señala las que recorren
+    una tabla completa o necesitan ordenar en un B-tree temporal. Sirve para
+    comprobar que cada combinación de filtros tiene su índice compuesto.
+  - comparar_serializacion: tiempo, nº de consultas y bytes JSON del
+    historial del chat y del listado de vídeos serializando objetos ORM
+    (to_dict, carga perezosa) frente a la proyección de columnas que usan las
+    rutas; y del listado de letras con el texto completo frente al extracto.
+"""
+import re
+import time
+
+from flask import current_app
+from sqlalchemy import desc, event, func, or_, text
+
+from backend.database import Base
+from backend.models import Letra, MensajeChat, Usuario, Video, Voto
+from backend.services.busqueda import (
+    PESOS_LETRAS, PESOS_VIDEOS, con_grupos, expresion_fts, filtro_grupos, orden_por_ids, subconsulta_fts,
+)
+from backend.services.paginacion import criterio_orden, filtro_keyset
+
+# "SCAN videos" sin "USING ... INDEX" = recorrido completo de la tabla
+_SCAN_COMPLETO_RE = re.compile(r"^SCAN (\w+)$")
+_ORDEN_RANKING = (desc(Video.puntuacion_media), desc(Video.total_votos))
+
+# Ordenan el conjunto de coincidencias (bm25, parecido), acotado por el MATCH
+# o por la lista de ids: el B-tree temporal es inevitable y pequeño
+_ORDEN_TEMPORAL_ESPERADO = {
+    "videos.busqueda", "videos.busqueda_cursor", "videos.busqueda_filtros", "videos.busqueda_grupos",
+    "videos.busqueda_difusa", "letras.listado_grupo", "letras.busqueda_extracto",
+    "letras.busqueda_extracto_cursor", "letras.busqueda_grupos",
+}
+
+
+def _pagina(q, orden, valores=None, n: int = 24):
+    """Como pagina_keyset: filtro del cursor (si hay `valores`), ORDER BY y LIMIT."""
+    if valores is not None:
+        q = q.filter(filtro_keyset(list(orden), valores))
+    return q.order_by(*criterio_orden(orden)).limit(n + 1)
+
+
+def _consultas(db) -> dict:
+    """
+    Formas de consulta usadas por routes/ y services/, con valores de ejemplo.
+    Los listados se montan con las mismas piezas que las rutas (proyección
+    columnas_dict, subconsulta_fts, con_grupos, filtro_keyset, extracto de
+    letras), así el plan es el de la consulta que se ejecuta de verdad.
+    Cada valor es una Query del ORM o SQL literal.
+    """
+    from backend.routes.letras import ORDEN_LETRAS, _COLUMNA_CONTENIDO, _extracto_inicio, _filtrar_grupo
+    from backend.routes.videos import ORDEN_CATALOGO
+
+    v = db.query(*Video.columnas_dict())
+    cursor_videos = [2024, 1000, 500]
+    grupos = [(1, "Los Piratas")]
+
+    def fts_videos(con_grupo=False):
+        fts = subconsulta_fts("videos_fts", expresion_fts("aragon"), PESOS_VIDEOS)
+        return con_grupos(fts, Video, grupos) if con_grupo else fts
+
+    def busqueda_videos(q, fts, valores=None):
+        return _pagina(q.join(fts, fts.c.rowid == Video.id), [(fts.c.rank, False), *ORDEN_CATALOGO], valores)
+
+    fts_conteo = fts_videos()
+
+    letras = db.query(*Letra.columnas_dict(Letra.CAMPOS_LISTADO))
+    letras_inicio = letras.add_columns(_extracto_inicio().label("extracto"))
+    fts_letras = subconsulta_fts("letras_fts", expresion_fts("cadiz"), PESOS_LETRAS, extracto=_COLUMNA_CONTENIDO)
+    fts_letras_grupo = con_grupos(
+        subconsulta_fts("letras_fts", expresion_fts("cadiz"), PESOS_LETRAS, extracto=_COLUMNA_CONTENIDO),
+        Letra, grupos,
+    )
+    orden_letras_fts = [(fts_letras.c.rank, False), *ORDEN_LETRAS]
+
+    ranking = db.query(Video).filter(Video.total_votos >= 3)
+    return {
+        # routes/videos.py (proyección, página keyset de per_page + 1)
+        "videos.listado": _pagina(v, ORDEN_CATALOGO),
+        "videos.listado_cursor": _pagina(v, ORDEN_CATALOGO, cursor_videos),
+        "videos.listado_año": _pagina(v.filter(Video.año == 2024), ORDEN_CATALOGO),
+        "videos.listado_modalidad": _pagina(v.filter(Video.modalidad == "chirigota"), ORDEN_CATALOGO),
+        "videos.listado_modalidad_cursor": _pagina(v.filter(Video.modalidad == "chirigota"), ORDEN_CATALOGO,
+                                                   cursor_videos),
+        "videos.listado_modalidad_año": _pagina(v.filter(Video.modalidad == "comparsa", Video.año == 2024),
+                                                ORDEN_CATALOGO),
+        "videos.listado_fase": _pagina(v.filter(Video.fase == "final"), ORDEN_CATALOGO),
+        "videos.listado_tipo": _pagina(v.filter(Video.tipo == "callejera"), ORDEN_CATALOGO),
+        "videos.listado_grupo": _pagina(v.filter(Video.grupo_id == 1), ORDEN_CATALOGO),
+        "videos.listado_destacados": _pagina(v.filter(Video.destacado == True), ORDEN_CATALOGO),  # noqa: E712
+        "videos.listado_con_letra": _pagina(v.filter(Video.tiene_letra == True), ORDEN_CATALOGO),  # noqa: E712
+        "videos.busqueda": busqueda_videos(v, fts_videos()),
+        "videos.busqueda_cursor": busqueda_videos(v, fts_videos(), [-3.5, *cursor_videos]),
+        "videos.busqueda_filtros": busqueda_videos(v.filter(Video.modalidad == "comparsa", Video.año == 2024),
+                                                   fts_videos()),
+        "videos.busqueda_grupos": busqueda_videos(v, fts_videos(con_grupo=True)),
+        "videos.busqueda_difusa": v.filter(or_(Video.id.in_([1, 2, 3]), filtro_grupos(Video, grupos)))
+                                   .order_by(orden_por_ids(Video.id, [1, 2, 3]), *criterio_orden(ORDEN_CATALOGO))
+                                   .limit(24),
+        # Query.count() de con_total: SELECT count(*) FROM (consulta filtrada)
+        "videos.conteo_busqueda": db.query(func.count()).select_from(
+            v.filter(Video.modalidad == "comparsa").join(fts_conteo, fts_conteo.c.rowid == Video.id).subquery()),
+        "videos.por_youtube_id": v.filter(Video.youtube_id == "dQw4w9WgXcQ"),
+        "videos.años": db.query(Video.año).distinct().filter(Video.año.isnot(None)).order_by(desc(Video.año)),
+        "videos.aleatorio_modalidad": db.query(Video.id).filter(Video.modalidad == "coro"),
+        # services/busqueda.py
+        "busqueda.grupos_trgm": "SELECT grupos.id, grupos.nombre FROM grupos_trgm "
+                                "JOIN grupos ON grupos.id = grupos_trgm.rowid "
+                                "WHERE grupos_trgm MATCH '\"martinez\" \"ares\"' ORDER BY grupos_trgm.rank LIMIT 50",
+        # routes/votos.py
+        "votos.ranking": ranking.order_by(*_ORDEN_RANKING).limit(20),
+        "votos.ranking_modalidad": ranking.filter(Video.modalidad == "coro").order_by(*_ORDEN_RANKING).limit(20),
+        "votos.ranking_año": ranking.filter(Video.año == 2024).order_by(*_ORDEN_RANKING).limit(20),
+        "votos.upsert": db.query(Voto).filter(Voto.video_id == 1, Voto.ip_hash == "x"),
+        # routes/letras.py (proyección con extracto)
+        "letras.listado": _pagina(letras_inicio, ORDEN_LETRAS, n=20),
+        "letras.listado_cursor": _pagina(letras_inicio, ORDEN_LETRAS, [2024, 500], n=20),
+        "letras.listado_año": _pagina(letras_inicio.filter(Letra.año == 2024), ORDEN_LETRAS, n=20),
+        "letras.listado_tipo": _pagina(letras_inicio.filter(Letra.tipo_pieza == "pasodoble"), ORDEN_LETRAS, n=20),
+        "letras.listado_grupo": _pagina(_filtrar_grupo(letras_inicio, "piratas"), ORDEN_LETRAS, n=20),
+        "letras.busqueda_extracto": _pagina(
+            letras.join(fts_letras, fts_letras.c.rowid == Letra.id).add_columns(fts_letras.c.extracto),
+            orden_letras_fts, n=20),
+        "letras.busqueda_extracto_cursor": _pagina(
+            letras.join(fts_letras, fts_letras.c.rowid == Letra.id).add_columns(fts_letras.c.extracto),
+            orden_letras_fts, [-2.0, 2024, 500], n=20),
+        "letras.busqueda_grupos": _pagina(
+            letras.join(fts_letras_grupo, fts_letras_grupo.c.rowid == Letra.id)
+            .add_columns(func.coalesce(fts_letras_grupo.c.extracto, _extracto_inicio()).label("extracto")),
+            [(fts_letras_grupo.c.rank, False), *ORDEN_LETRAS], n=20),
+        "letras.por_video": db.query(Letra).filter(Letra.video_id == 1),
+        # services/letras_importer.py
+        "importer.deduplicado": db.query(Letra).filter(Letra.fuente == "https://ejemplo/api/letra/1"),
+        # routes/chat.py
+        "chat.historial": db.query(*MensajeChat.columnas_dict())
+                           .outerjoin(Usuario, Usuario.id == MensajeChat.usuario_id)
+                           .filter(MensajeChat.sala == "general")
+                           .order_by(desc(MensajeChat.created_at), desc(MensajeChat.id)).limit(50),
+        # services/youtube_scraper.py
+        "scraper.existente": db.query(Video.id).filter(Video.youtube_id == "dQw4w9WgXcQ"),
+    }
+
+
+def _sql(db, query) -> str:
+    if isinstance(query, str):
+        return query
+    stmt = query.statement
+    return str(stmt.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def planes_consulta(db) -> list:
+    """
+    Devuelve [{"consulta", "plan", "scan_completo", "orden_temporal", "ok"}]
+    para cada forma de consulta conocida. Solo cuenta como scan completo el
+    de una tabla del modelo (no el de una subconsulta materializada).
+    """
+    tablas = set(Base.metadata.tables)
+    resultado = []
+    for nombre, query in _consultas(db).items():
+        filas = db.execute(text("EXPLAIN QUERY PLAN " + _sql(db, query))).all()
+        detalles = [f[-1] for f in filas]
+        scans = []
+        for d in detalles:
+            m = _SCAN_COMPLETO_RE.match(d)
+            if m and m.group(1) in tablas:
+                scans.append(d)
+        temporal = any("USE TEMP B-TREE" in d for d in detalles)
+        resultado.append({
+            "consulta": nombre,
+            "plan": detalles,
+            "scan_completo": scans,
+            "orden_temporal": temporal,
+            "ok": not scans and (not temporal or nombre in _ORDEN_TEMPORAL_ESPERADO),
+        })
+    return resultado
+
+
+def _medir(db, funcion, repeticiones: int) -> dict:
+    consultas = 0
+
+    def _contar(*_):
+        nonlocal consultas
+        consultas += 1
+
+    event.listen(db.bind, "before_cursor_execute", _contar)
+    try:
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            filas = funcion()
+            db.expunge_all()        # sin identity map caliente entre repeticiones
+        ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+    finally:
+        event.remove(db.bind, "before_cursor_execute", _contar)
+    return {
+        "ms": round(ms, 2),
+        "consultas": consultas // repeticiones,
+        "filas": len(filas),
+        "bytes": len(current_app.json.dumps(filas).encode("utf-8")),
+    }
+
+
+def comparar_serializacion(db, limite: int = 200, repeticiones: int = 5) -> dict:
+    """{caso: {variante: {...}}} con ms, consultas y bytes JSON por ejecución."""
+    orden_chat = (desc(MensajeChat.created_at), desc(MensajeChat.id))
+    orden_videos = (desc(Video.año), desc(Video.vistas), desc(Video.id))
+
+    def chat_orm():
+        q = db.query(MensajeChat).filter(MensajeChat.sala == "general")
+        return [m.to_dict() for m in q.order_by(*orden_chat).limit(limite)]
+
+    def chat_proyeccion():
+        q = (
+            db.query(*MensajeChat.columnas_dict())
+            .outerjoin(Usuario, Usuario.id == MensajeChat.usuario_id)
+            .filter(MensajeChat.sala == "general")
+        )
+        return [MensajeChat.dict_desde_fila(f) for f in q.order_by(*orden_chat).limit(limite)]
+
+    def videos_orm():
+        return [v.to_dict() for v in db.query(Video).order_by(*orden_videos).limit(limite)]
+
+    def videos_proyeccion():
+        q = db.query(*Video.columnas_dict()).order_by(*orden_videos).limit(limite)
+        return [Video.dict_desde_fila(f) for f in q]
+
+    def letras_completas():
+        q = db.query(*Letra.columnas_dict()).order_by(desc(Letra.año), desc(Letra.id)).limit(limite)
+        return [Letra.dict_desde_fila(f) for f in q]
+
+    def letras_extracto():
+        from backend.routes.letras import _extracto_inicio
+        campos = Letra.CAMPOS_LISTADO + ("extracto",)
+        q = (
+            db.query(*Letra.columnas_dict(Letra.CAMPOS_LISTADO), _extracto_inicio().label("extracto"))
+            .order_by(desc(Letra.año), desc(Letra.id)).limit(limite)
+        )
+        return [Letra.dict_desde_fila(f, campos) for f in q]
+
+    return {
+        "chat.historial": {
+            "orm": _medir(db, chat_orm, repeticiones),
+            "proyeccion": _medir(db, chat_proyeccion, repeticiones),
+        },
+        "videos.listado": {
+            "orm": _medir(db, videos_orm, repeticiones),
+            "proyeccion": _medir(db, videos_proyeccion, repeticiones),
+        },
+        "letras.listado": {
+            "contenido": _medir(db, letras_completas, repeticiones),
+            "extracto": _medir(db, letras_extracto, repeticiones),
+        },
+    }
@@ -0,0 +1,66 @@
+"""
+Estadísticas del catálogo para la portada y el panel de admin.
+
+Se calculan con una sola agregación GROUP BY (más una SELECT de conteos)
+y se guardan en memoria hasta que cambia la versión del catálogo, así que
+en régimen normal la portada no toca la base de datos.
+"""
+import threading
+
+from sqlalchemy import case, func, select
+
+from backend.models import Grupo, Letra, Video
+from backend.services import catalogo
+
+MODALIDADES = ["chirigota", "comparsa", "coro", "cuarteto", "romancero"]
+_TABLAS = ("videos", "letras", "grupos")
+
+_cache = {"version": None, "datos": None}
+_lock = threading.Lock()
+
+
+def _calcular(db) -> dict:
+    filas = (
+        db.query(
+            Video.modalidad,
+            func.count(Video.id),
+            func.sum(case((Video.tipo == "callejera", 1), else_=0)),
+            func.sum(case((Video.tiene_letra == True, 1), else_=0)),  # noqa: E712
+        )
+        .group_by(Video.modalidad)
+        .all()
+    )
+    total_letras, total_grupos = db.execute(select(
+        select(func.count(Letra.id)).scalar_subquery(),
+        select(func.count(Grupo.id)).scalar_subquery(),
+    )).one()
+
+    por_modalidad = dict.fromkeys(MODALIDADES, 0)
+    total = callejeras = con_letra = 0
+    for modalidad, n, n_callejeras, n_letra in filas:
+        if modalidad in por_modalidad:
+            por_modalidad[modalidad] = n
+        total += n
+        callejeras += n_callejeras or 0
+        con_letra += n_letra or 0
+
+    return {
+        "total_videos": total,
+        "por_modalidad": por_modalidad,
+        "callejeras": callejeras,
+        "con_letra": con_letra,
+        "total_letras": total_letras,
+        "total_grupos": total_grupos,
+    }
+
+
+def obtener(db) -> dict:
+    """Estadísticas cacheadas; se recalculan solo si el catálogo ha cambiado."""
+    version = catalogo.version(*_TABLAS)
+    with _lock:
+        if _cache["version"] == version:
+            return _cache["datos"]
+    datos = _calcular(db)
+    with _lock:
+        _cache.update(version=version, datos=datos)
+    return datos
@@ -13,7 +13,7 @@ Estrategia:
 import time
 import threading
 import requests
-from backend.database import SessionLocal
+from backend.database import SessionLocal, escritura
 from backend.models import Letra
 
 BASE_URL = "https://g3v3r.pythonanywhere.com"
@@ -76,7 +76,6 @@ def importar_metadata(
 
     session = requests.Session()
     session.headers["User-Agent"] = "Carnavalix-Importer/1.0"
-    db = SessionLocal()
 
     try:
         page = 1
@@ -113,36 +112,40 @@ def importar_metadata(
                 mensaje=f"Importando página {page}/{_estado['total_paginas']}...",
             )
 
-            for item in letras_api:
-                if item.get("calidad", 0) < calidad_min:
-                    _set(omitidas=_estado["omitidas"] + 1)
-                    continue
-
-                fuente_url = f"{DETAIL_ENDPOINT}/{item['id']}"
-
-                # ¿Ya existe esta letra?
-                existente = db.query(Letra).filter(Letra.fuente == fuente_url).first()
-                if existente:
-                    _set(omitidas=_estado["omitidas"] + 1)
-                    continue
-
-                letra = Letra(
-                    titulo=item.get("titulo") or "",
-                    tipo_pieza=item.get("tipo_pieza") or "",
-                    contenido="",           # Se descarga bajo demanda
-                    fuente=fuente_url,       # URL para obtener el contenido después
-                    año=item.get("anio"),
-                    grupo_nombre=item.get("agrupacion") or "",
-                )
-                db.add(letra)
-                _set(importadas=_estado["importadas"] + 1)
+            # La página ya está descargada: una transacción corta del escritor por página
+            limite_alcanzado = False
+            with escritura() as db:
+                for item in letras_api:
+                    if item.get("calidad", 0) < calidad_min:
+                        _set(omitidas=_estado["omitidas"] + 1)
+                        continue
+
+                    fuente_url = f"{DETAIL_ENDPOINT}/{item['id']}"
+
+                    # ¿Ya existe esta letra?
+                    existente = db.query(Letra.id).filter(Letra.fuente == fuente_url).first()
+                    if existente:
+                        _set(omitidas=_estado["omitidas"] + 1)
+                        continue
+
+                    letra = Letra(
+                        titulo=item.get("titulo") or "",
+                        tipo_pieza=item.get("tipo_pieza") or "",
+                        contenido="",           # Se descarga bajo demanda
+                        fuente=fuente_url,       # URL para obtener el contenido después
+                        año=item.get("anio"),
+                        grupo_nombre=item.get("agrupacion") or "",
+                    )
+                    db.add(letra)
+                    _set(importadas=_estado["importadas"] + 1)
 
-                if _estado["importadas"] >= limite:
-                    db.commit()
-                    _set(activo=False, mensaje=f"Límite alcanzado: {limite} letras importadas.")
-                    return
+                    if _estado["importadas"] >= limite:
+                        limite_alcanzado = True
+                        break
 
-            db.commit()
+            if limite_alcanzado:
+                _set(activo=False, mensaje=f"Límite alcanzado: {limite} letras importadas.")
+                return
 
             if page >= data.get("total_pages", 1):
                 break
@@ -160,9 +163,7 @@ def importar_metadata(
 
     except Exception as e:
         _set(activo=False, errores=_estado["errores"] + 1, mensaje=f"Error fatal: {e}")
-        db.rollback()
     finally:
-        db.close()
         session.close()
 
 
@@ -228,32 +229,38 @@ def enriquecer_contenido(limite: int = 500, delay: float = 0.2):
         mensaje="Enriqueciendo letras con contenido...",
     )
 
-    db = SessionLocal()
     try:
-        sin_contenido = (
-            db.query(Letra)
-            .filter(
-                (Letra.contenido == "") | (Letra.contenido.is_(None)),
-                Letra.fuente.isnot(None),
-                Letra.fuente.like("http%"),
+        db = SessionLocal()
+        try:
+            sin_contenido = (
+                db.query(Letra.id, Letra.fuente)
+                .filter(
+                    (Letra.contenido == "") | (Letra.contenido.is_(None)),
+                    Letra.fuente.isnot(None),
+                    Letra.fuente.like("http%"),
+                )
+                .limit(limite)
+                .all()
             )
-            .limit(limite)
-            .all()
-        )
+        finally:
+            db.close()
         _set(total=len(sin_contenido))
 
-        for i, letra in enumerate(sin_contenido):
+        for i, (letra_id, fuente) in enumerate(sin_contenido):
             if not _estado["activo"]:
                 break
             try:
-                resp = requests.get(letra.fuente, timeout=15)
+                resp = requests.get(fuente, timeout=15)
                 data = resp.json()
                 contenido = data.get("contenido") or data.get("texto") or ""
                 if contenido:
-                    letra.contenido = contenido
-                    if not letra.titulo and data.get("titulo"):
-                        letra.titulo = data["titulo"]
-                    db.commit()
+                    # La descarga ya terminó: solo la escritura ocupa el escritor
+                    with escritura() as db:
+                        letra = db.get(Letra, letra_id)
+                        if letra is not None:
+                            letra.contenido = contenido
+                            if not letra.titulo and data.get("titulo"):
+                                letra.titulo = data["titulo"]
                     _set(importadas=_estado["importadas"] + 1)
             except Exception:
                 _set(errores=_estado["errores"] + 1)
@@ -267,6 +274,3 @@ def enriquecer_contenido(limite: int = 500, delay: float = 0.2):
         )
     except Exception as e:
         _set(activo=False, mensaje=f"Error: {e}")
-        db.rollback()
-    finally:
-        db.close()
@@ -0,0 +1,315 @@
+"""
+Modo determinista del canal Live (LIVE_MODO=determinista).
+
+Lo que se emite es una función pura de (lista, inicio, reloj). La lista de
+vídeos se baraja una vez con una semilla y se guarda en programacion_live;
+desde `inicio` se emite en bucle, cada vídeo durante duracion + LIVE_MARGEN.
+Cualquier proceso calcula qué vídeo toca y en qué segundo sin hilos ni
+coordinación, y el navegador hace la misma cuenta con /live/horario.
+
+Los cambios desde admin no tocan la lista: se guardan como overrides con
+ventana [inicio, fin) en overrides_live. Mientras uno está vigente manda
+sobre la lista (si se solapan, el más reciente); al terminar, la lista
+sigue donde iba por reloj.
+
+Si no hay programación guardada, la primera lectura crea una con
+LIVE_SEMILLA y LIVE_EPOCA mediante un INSERT condicional y relee la fila que
+ha quedado. Varios procesos arrancando a la vez acaban con la misma lista,
+y con los valores configurados sería idéntica aunque se generase dos veces.
+Barajar de nuevo con otra semilla es una acción explícita del admin
+(POST /live/horario).
+
+Cada proceso relee programación y overrides como mucho cada
+LIVE_HORARIO_TTL segundos: un cambio hecho en otro proceso tarda eso en
+verse (en el propio, al momento).
+"""
+import bisect
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import DateTime, Integer, Text, insert, literal, select
+
+from backend.config import config
+from backend.database import SessionLocal
+from backend.models import OverrideLive, ProgramacionLive, Video
+from backend.services.live_service import Programado
+
+_FASES = ("final", "semifinal")
+_CANAL = "ONDACADIZCARNAVAL"
+_SIN_DURACION = 3600        # s de ventana por defecto si no se sabe la duración
+_RETENCION = timedelta(days=1)
+
+_EPOCA = datetime(1970, 1, 1)
+
+
+class Horario(NamedTuple):
+    id: int
+    semilla: int
+    inicio: datetime
+    videos: tuple           # Programado, en orden de emisión
+    acumulado: tuple        # segundo de la vuelta en que empieza cada vídeo
+    total: int              # segundos de una vuelta completa
+
+
+class Override(NamedTuple):
+    id: int
+    programado: Programado
+    inicio: datetime
+    fin: datetime
+
+
+_cache = {"leido": None, "horario": None, "overrides": ()}
+_lock = threading.Lock()
+
+
+def _ms(momento: datetime) -> int:
+    return int((momento - _EPOCA).total_seconds() * 1000)
+
+
+def _horario(fila: ProgramacionLive) -> Horario:
+    videos = tuple(Programado(*v) for v in json.loads(fila.videos))
+    acumulado, t = [], 0
+    for v in videos:
+        acumulado.append(t)
+        t += v.duracion + config.LIVE_MARGEN
+    return Horario(fila.id, fila.semilla, fila.inicio, videos, tuple(acumulado), t)
+
+
+def _override(fila: OverrideLive) -> Override:
+    programado = Programado(fila.youtube_id, fila.titulo or fila.youtube_id,
+                            fila.duracion or 0, fila.canal_fuente or _CANAL)
+    return Override(fila.id, programado, fila.inicio, fila.fin)
+
+
+# ─── Escritura (admin) ────────────────────────────────────────────────────────
+
+def _lista(db, semilla: int):
+    """
+    JSON con los vídeos de duración conocida (finales y semifinales; si no
+    hay, todo el catálogo) barajados con `semilla`, y cuántos son. None si no hay.
+    """
+    consulta = db.query(Video).filter(Video.duracion > 0).order_by(Video.id)
+    videos = consulta.filter(Video.fase.in_(_FASES)).all() or consulta.all()
+    if not videos:
+        return None
+    random.Random(semilla).shuffle(videos)
+    lista = [[v.youtube_id, v.titulo, v.duracion, v.grupo_nombre or _CANAL] for v in videos]
+    return json.dumps(lista, ensure_ascii=False), len(lista)
+
+
+def _ultima(db):
+    return db.query(ProgramacionLive).order_by(ProgramacionLive.id.desc()).first()
+
+
+def generar(db, semilla: int = None, inicio: datetime = None):
+    """
+    Admin: baraja de nuevo con `semilla` (aleatoria si no se indica) y
+    sustituye la programación vigente. Devuelve el Horario, o None si no hay vídeos.
+    """
+    semilla = semilla if semilla is not None else random.randrange(2 ** 31)
+    lista = _lista(db, semilla)
+    if lista is None:
+        return None
+    videos, n = lista
+
+    fila = ProgramacionLive(
+        semilla=semilla,
+        inicio=(inicio or datetime.utcnow()).replace(microsecond=0),
+        videos=videos,
+    )
+    db.add(fila)
+    db.flush()
+    # Solo rige la última: las anteriores sobran
+    db.query(ProgramacionLive).filter(ProgramacionLive.id != fila.id).delete(synchronize_session=False)
+    db.commit()
+    invalidar()
+    print(f"[Live] Programación determinista: {n} vídeos (semilla {semilla}).")
+    return _horario(fila)
+
+
+def asegurar(db):
+    """
+    Programación vigente. Si no hay ninguna, la crea con LIVE_SEMILLA y
+    LIVE_EPOCA con un INSERT … WHERE NOT EXISTS (atómico: entre procesos que
+    lo intentan a la vez entra una sola fila) y devuelve la que ha quedado.
+    """
+    fila = _ultima(db)
+    if fila is not None:
+        return _horario(fila)
+    lista = _lista(db, config.LIVE_SEMILLA)
+    if lista is None:
+        return None
+    videos, n = lista
+    inicio = datetime.fromisoformat(config.LIVE_EPOCA).replace(microsecond=0)
+    creada = db.execute(
+        insert(ProgramacionLive).from_select(
+            ["semilla", "inicio", "videos", "created_at"],
+            select(
+                literal(config.LIVE_SEMILLA, Integer),
+                literal(inicio, DateTime),
+                literal(videos, Text),
+                literal(datetime.utcnow(), DateTime),
+            ).where(~select(ProgramacionLive.id).exists()),
+        )
+    ).rowcount
+    db.commit()
+    if creada:
+        invalidar()
+        print(f"[Live] Programación determinista: {n} vídeos (semilla {config.LIVE_SEMILLA}).")
+    fila = _ultima(db)
+    return _horario(fila) if fila else None
+
+
+def forzar(db, programado: Programado, inicio: datetime = None, fin: datetime = None) -> Override:
+    """
+    Emite `programado` durante [inicio, fin) por encima de la programación.
+    Por defecto desde ahora y durante un pase del vídeo.
+    """
+    inicio = (inicio or datetime.utcnow()).replace(microsecond=0)
+    if fin is None:
+        fin = inicio + timedelta(seconds=(programado.duracion + config.LIVE_MARGEN)
+                                 if programado.duracion else _SIN_DURACION)
+    if fin <= inicio:
+        raise ValueError("El fin del override debe ser posterior al inicio")
+    fila = OverrideLive(inicio=inicio, fin=fin.replace(microsecond=0), **programado._asdict())
+    db.add(fila)
+    db.query(OverrideLive).filter(OverrideLive.fin < datetime.utcnow() - _RETENCION).delete(
+        synchronize_session=False)
+    db.commit()
+    invalidar()
+    return _override(fila)
+
+
+def anular(db, override_id: int) -> bool:
+    """Borra un override. False si no existía."""
+    borrados = db.query(OverrideLive).filter(OverrideLive.id == override_id).delete(
+        synchronize_session=False)
+    db.commit()
+    invalidar()
+    return bool(borrados)
+
+
+def invalidar():
+    """Fuerza a releer programación y overrides en la próxima consulta de este proceso."""
+    with _lock:
+        _cache["leido"] = None
+
+
+# ─── Lectura ──────────────────────────────────────────────────────────────────
+
+def vigente():
+    """
+    (Horario o None, overrides no terminados), releídos de la BD como mucho
+    cada LIVE_HORARIO_TTL segundos. Sin programación guardada se crea la
+    configurada (ver asegurar).
+    """
+    with _lock:
+        leido = _cache["leido"]
+        if leido is not None and time.monotonic() - leido < config.LIVE_HORARIO_TTL:
+            return _cache["horario"], _cache["overrides"]
+
+    db = SessionLocal()
+    try:
+        horario = asegurar(db)
+        overrides = tuple(
+            _override(o) for o in
+            db.query(OverrideLive).filter(OverrideLive.fin > datetime.utcnow()).order_by(OverrideLive.id)
+        )
+    finally:
+        db.close()
+
+    with _lock:
+        _cache.update(leido=time.monotonic(), horario=horario, overrides=overrides)
+    return horario, overrides
+
+
+def _en(horario, overrides, ahora: datetime):
+    """(Programado, inicio de su pase, fin de su pase) en `ahora`, o None si no hay nada."""
+    activo = None
+    for o in overrides:             # por id: si se solapan gana el más reciente
+        if o.inicio <= ahora < o.fin:
+            activo = o
+
+    if activo is not None:
+        programado = activo.programado
+        if programado.duracion:
+            pase = programado.duracion + config.LIVE_MARGEN
+            n = int((ahora - activo.inicio).total_seconds() // pase)
+            empieza = activo.inicio + timedelta(seconds=n * pase)
+            termina = min(empieza + timedelta(seconds=pase), activo.fin)
+        else:
+            empieza, termina = activo.inicio, activo.fin
+    elif horario is not None and horario.total:
+        vuelta, resto = divmod((ahora - horario.inicio).total_seconds(), horario.total)
+        i = bisect.bisect_right(horario.acumulado, resto) - 1
+        programado = horario.videos[i]
+        # Aritmética entera: el mismo pase da el mismo started_at en cualquier proceso
+        empieza = horario.inicio + timedelta(seconds=int(vuelta) * horario.total + horario.acumulado[i])
+        termina = empieza + timedelta(seconds=programado.duracion + config.LIVE_MARGEN)
+    else:
+        return None
+
+    # Un override que empieza antes corta el pase
+    for o in overrides:
+        if ahora < o.inicio < termina:
+            termina = o.inicio
+    return programado, empieza, termina
+
+
+def calcular(horario, overrides, ahora: datetime):
+    """
+    Estado en `ahora` con la forma de EstadoLive.to_dict() más `siguiente`.
+    Función pura: el mismo resultado en cualquier proceso.
+    """
+    actual = _en(horario, overrides, ahora)
+    if actual is None:
+        return None
+    programado, empieza, termina = actual
+    siguiente = _en(horario, overrides, termina)
+    transcurridos = int((ahora - empieza).total_seconds())
+    return {
+        **programado._asdict(),
+        "started_at": empieza.isoformat(),
+        "segundos_transcurridos": min(transcurridos, programado.duracion - 1) if programado.duracion else 0,
+        "siguiente": siguiente[0]._asdict() if siguiente else None,
+        "modo": "determinista",
+    }
+
+
+def estado(ahora: datetime = None):
+    horario, overrides = vigente()
+    return calcular(horario, overrides, ahora or datetime.utcnow())
+
+
+def proximos(n: int, ahora: datetime = None) -> list:
+    """Los `n` pases siguientes al actual, con su hora de inicio (UTC)."""
+    horario, overrides = vigente()
+    momento = ahora or datetime.utcnow()
+    actual = _en(horario, overrides, momento)
+    resultado = []
+    while actual is not None and len(resultado) < n:
+        momento = actual[2]
+        actual = _en(horario, overrides, momento)
+        if actual is not None:
+            resultado.append({**actual[0]._asdict(), "empieza": actual[1].isoformat()})
+    return resultado
+
+
+def publico() -> dict:
+    """Todo lo necesario para que el navegador calcule el estado por su cuenta (/live/horario)."""
+    horario, overrides = vigente()
+    return {
+        "ahora_ms": _ms(datetime.utcnow()),
+        "margen": config.LIVE_MARGEN,
+        "id": horario.id if horario else None,
+        "inicio_ms": _ms(horario.inicio) if horario else None,
+        "videos": [list(v) for v in horario.videos] if horario else [],
+        "overrides": [
+            {**o.programado._asdict(), "id": o.id, "inicio_ms": _ms(o.inicio), "fin_ms": _ms(o.fin)}
+            for o in overrides
+        ],
+    }
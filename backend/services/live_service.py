@@ -1,90 +1,261 @@
 """
 Servicio del canal Live 24/7.
-Monitoriza el estado del canal y avanza al siguiente vídeo cuando termina el actual.
+
+El estado del canal vive en memoria (una copia de EstadoLive sin sesión) y
+se escribe también en la tabla estado_live (write-through) para sobrevivir
+a reinicios. Un hilo planificador duerme en una Condition hasta el final
+exacto del vídeo actual (started_at + duracion + LIVE_MARGEN) y entonces
+avanza. Un cambio manual (siguiente/programar) lo despierta para que
+recalcule. Cada cambio se emite al momento por Socket.IO (`live_cambio`,
+con el estado completo), así que los clientes no sondean y /live/estado
+responde sin tocar la BD.
+
+Cola de emisión: los LIVE_COLA vídeos siguientes se eligen por adelantado
+(finales/semifinales primero, sin repetir los recientes). Avanzar es sacar
+la cabeza de la cola, sin consultas en el momento del cambio. La cola se
+publica en /live/cola con la hora prevista de cada vídeo, y el estado
+incluye `siguiente` para que el cliente precargue su embed. Los vídeos con
+duración desconocida (0) no entran en la cola porque pararían el canal:
+su duración se resuelve con yt-dlp en segundo plano y entran en una
+vuelta posterior.
+
+El estado es por proceso: en modo cola el canal debe servirse desde un
+único proceso. Con LIVE_MODO=determinista no hay estado ni planificador: el
+estado se calcula del reloj (ver live_horario) y siguiente/programar crean
+overrides con ventana de tiempo, así que vale con varios procesos.
 """
 import threading
-import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from backend.config import config
 from backend.database import SessionLocal
 from backend.models import EstadoLive, Video
+from backend.services.aleatorio import video_aleatorio
+
+MODOS = ("cola", "determinista")
+_REINTENTO = 60             # s entre intentos cuando el catálogo está vacío
+_REINTENTO_ERROR = 5        # s tras un error de BD (lock, timeout): el canal no debe quedarse parado
+
+_actual = None              # EstadoLive transitorio (sin sesión) o None
+_cola = ()                  # tupla de Programado; se sustituye entera (lectura sin lock)
+_cond = threading.Condition()
+_lock_cambio = threading.RLock()    # elegir + escribir + publicar, de uno en uno
+_hilo = None
+_activo = False
+
+_resolutor = None           # ThreadPoolExecutor de un hilo para yt-dlp
+_resolviendo: set = set()
+_sin_duracion: set = set()  # youtube_ids cuya duración no se pudo obtener
+_lock_resolver = threading.Lock()
+
+
+class Programado(NamedTuple):
+    youtube_id: str
+    titulo: str
+    duracion: int
+    canal_fuente: str
+
+
+def _programado(video: Video) -> Programado:
+    return Programado(video.youtube_id, video.titulo, video.duracion or 0,
+                      video.grupo_nombre or "ONDACADIZCARNAVAL")
+
+
+def modo() -> str:
+    if config.LIVE_MODO not in MODOS:
+        raise ValueError(f"LIVE_MODO={config.LIVE_MODO!r} no válido (opciones: {', '.join(MODOS)})")
+    return config.LIVE_MODO
+
+
+def _determinista() -> bool:
+    return modo() == "determinista"
+
+
+def estado_actual():
+    """Estado del canal en memoria (EstadoLive sin sesión), o None si no hay vídeo."""
+    return _actual
+
+
+def estado_dict():
+    """Estado actual + `siguiente` (cabeza de la cola, para precargar), o None."""
+    if _determinista():
+        from backend.services import live_horario
+        return live_horario.estado()
+    estado, cola = _actual, _cola
+    if estado is None:
+        return None
+    return {**estado.to_dict(), "siguiente": cola[0]._asdict() if cola else None}
+
+
+def programacion() -> list:
+    """Vídeos en cola con la hora prevista de inicio (UTC; None si el actual no tiene final)."""
+    if _determinista():
+        from backend.services import live_horario
+        return live_horario.proximos(config.LIVE_COLA)
+    estado, cola = _actual, _cola
+    inicio = None
+    if estado is not None and estado.duracion and estado.started_at:
+        inicio = estado.started_at + timedelta(seconds=estado.duracion + config.LIVE_MARGEN)
+    resultado = []
+    for p in cola:
+        resultado.append({**p._asdict(), "empieza": inicio.isoformat() if inicio else None})
+        if inicio:
+            inicio += timedelta(seconds=p.duracion + config.LIVE_MARGEN)
+    return resultado
+
+
+def _copia(estado: EstadoLive) -> EstadoLive:
+    return EstadoLive(
+        id=1,
+        youtube_id=estado.youtube_id,
+        titulo=estado.titulo,
+        duracion=estado.duracion or 0,
+        started_at=estado.started_at,
+        canal_fuente=estado.canal_fuente,
+    )
 
-_monitor_thread = None
-_monitor_running = False
+
+def _publicar(db, datos: dict) -> EstadoLive:
+    """
+    Escribe el estado en la BD y, ya confirmado, lo publica en memoria,
+    despierta al planificador y lo emite a la sala "live".
+    """
+    global _actual
+    estado = db.get(EstadoLive, 1)
+    if estado is None:
+        estado = EstadoLive(id=1)
+        db.add(estado)
+    for campo, valor in datos.items():
+        setattr(estado, campo, valor)
+    db.commit()
+
+    nuevo = _copia(estado)
+    with _cond:
+        _actual = nuevo
+        _cond.notify_all()
+    emitir_cambio()
+    return nuevo
+
+
+def emitir_cambio():
+    """Emite el estado actual a la sala "live" (`live_cambio`)."""
+    try:
+        from backend.main import socketio
+        socketio.emit("live_cambio", estado_dict(), to="live")
+    except Exception:
+        pass
+
+
+def _forzar(db, programado: Programado, inicio=None, fin=None) -> bool:
+    """Modo determinista: override con ventana de tiempo en lugar de cambiar el estado."""
+    from backend.services import live_horario
+    live_horario.forzar(db, programado, inicio, fin)
+    emitir_cambio()
+    return True
 
 
 def _seleccionar_siguiente_video(db):
     """
     Selecciona el siguiente vídeo para el canal live.
-    Prioriza finales y semifinales de forma aleatoria.
+    Prioriza finales y semifinales de forma aleatoria, sin repetir los recientes.
     """
-    from sqlalchemy.sql.expression import func
-
     # Primero intentar finales/semifinales
-    video = (
-        db.query(Video)
-        .filter(Video.fase.in_(["final", "semifinal"]))
-        .order_by(func.random())
-        .first()
-    )
+    video = video_aleatorio(db, fases=("final", "semifinal"), sin_repetir=True)
     if video:
         return video
 
     # Si no hay finales/semifinales, cualquier vídeo del catálogo
-    return db.query(Video).order_by(func.random()).first()
+    return video_aleatorio(db, sin_repetir=True)
 
 
-def avanzar_al_siguiente():
+def _rellenar_cola(db, en_antena: str = None):
     """
-    Avanza al siguiente vídeo en el canal live.
-    Devuelve el youtube_id del nuevo vídeo o None si no hay vídeos.
+    Completa la cola hasta LIVE_COLA vídeos de duración conocida, sin
+    repetir los que ya están en cola ni el que está en antena.
     """
-    db = SessionLocal()
-    try:
+    global _cola
+    cola = list(_cola)
+    vistos = {p.youtube_id for p in cola}
+    vistos.add(en_antena or (_actual.youtube_id if _actual else None))
+    intentos = config.LIVE_COLA * 4
+    while len(cola) < config.LIVE_COLA and intentos > 0:
+        intentos -= 1
         video = _seleccionar_siguiente_video(db)
-        if not video:
-            return None
-
-        estado = db.query(EstadoLive).filter(EstadoLive.id == 1).first()
-        if estado:
-            estado.youtube_id = video.youtube_id
-            estado.titulo = video.titulo
-            estado.duracion = video.duracion or 0
-            estado.started_at = datetime.utcnow()
-            estado.canal_fuente = video.grupo_nombre or "ONDACADIZCARNAVAL"
-        else:
-            estado = EstadoLive(
-                id=1,
-                youtube_id=video.youtube_id,
-                titulo=video.titulo,
-                duracion=video.duracion or 0,
-                started_at=datetime.utcnow(),
-                canal_fuente=video.grupo_nombre or "ONDACADIZCARNAVAL",
-            )
-            db.add(estado)
-
-        db.commit()
-        print(f"[Live] Nuevo vídeo: {video.titulo[:60]} ({video.youtube_id})")
-
-        # Notificar por SocketIO si está disponible
-        try:
-            from backend.main import socketio
-            socketio.emit("live_cambio", estado.to_dict(), to="live")
-        except Exception:
-            pass
+        if video is None:
+            break
+        if video.youtube_id in vistos:
+            continue
+        if not video.duracion:
+            _resolver_duracion(video.youtube_id)     # entrará en otra vuelta
+            continue
+        vistos.add(video.youtube_id)
+        cola.append(_programado(video))
+    _cola = tuple(cola)
 
-        return video.youtube_id
 
+def avanzar_al_siguiente(db=None):
+    """
+    Avanza al siguiente vídeo en el canal live (la cabeza de la cola).
+    Devuelve el youtube_id del nuevo vídeo o None si no hay vídeos (o hubo un error).
+    `db`: sesión de la petición; sin ella se abre una propia.
+    """
+    propia = db is None
+    db = db or SessionLocal()
+    try:
+        return _avanzar(db)
     except Exception as e:
         print(f"[Live] Error avanzando: {e}")
         db.rollback()
         return None
     finally:
-        db.close()
+        if propia:
+            db.close()
 
 
-def programar_video(youtube_id: str) -> bool:
-    """Programa un vídeo específico en el canal live."""
-    db = SessionLocal()
+def _avanzar(db):
+    """Como avanzar_al_siguiente, pero los errores de BD se propagan."""
+    global _cola
+    if _determinista():
+        for _ in range(config.LIVE_COLA * 4):   # mejor uno con duración: ventana justa
+            video = _seleccionar_siguiente_video(db)
+            if video is None or video.duracion:
+                break
+        if not video:
+            return None
+        _forzar(db, _programado(video))
+        print(f"[Live] Override: {video.titulo[:60]} ({video.youtube_id})")
+        return video.youtube_id
+
+    with _lock_cambio:
+        if not _cola:
+            _rellenar_cola(db)
+        if _cola:
+            siguiente, _cola = _cola[0], _cola[1:]
+        else:
+            # Ningún vídeo con duración conocida: cualquiera, como último recurso
+            video = _seleccionar_siguiente_video(db)
+            if not video:
+                return None
+            siguiente = _programado(video)
+            if not siguiente.duracion:
+                _resolver_duracion(siguiente.youtube_id)
+        # Reponer antes de publicar: live_cambio lleva ya el nuevo `siguiente`
+        _rellenar_cola(db, en_antena=siguiente.youtube_id)
+        _publicar(db, {**siguiente._asdict(), "started_at": datetime.utcnow()})
+    print(f"[Live] Nuevo vídeo: {siguiente.titulo[:60]} ({siguiente.youtube_id})")
+    return siguiente.youtube_id
+
+
+def programar_video(youtube_id: str, db=None, inicio=None, fin=None) -> bool:
+    """
+    Programa un vídeo específico en el canal live (`db` como en avanzar_al_siguiente).
+    `inicio`/`fin` (UTC) solo en modo determinista: ventana del override.
+    """
+    global _cola
+    propia = db is None
+    db = db or SessionLocal()
     try:
         video = db.query(Video).filter(Video.youtube_id == youtube_id).first()
         if video:
@@ -101,31 +272,20 @@ def programar_video(youtube_id: str) -> bool:
                 duracion = 0
                 titulo = youtube_id
 
-        estado = db.query(EstadoLive).filter(EstadoLive.id == 1).first()
-        if estado:
-            estado.youtube_id = youtube_id
-            estado.titulo = titulo
-            estado.duracion = duracion
-            estado.started_at = datetime.utcnow()
-        else:
-            db.add(EstadoLive(
-                id=1,
-                youtube_id=youtube_id,
-                titulo=titulo,
-                duracion=duracion,
-                started_at=datetime.utcnow(),
-            ))
-
-        db.commit()
-
-        try:
-            from backend.main import socketio
-            estado2 = db.query(EstadoLive).filter(EstadoLive.id == 1).first()
-            if estado2:
-                socketio.emit("live_cambio", estado2.to_dict(), to="live")
-        except Exception:
-            pass
+        if _determinista():
+            canal = (video.grupo_nombre if video else None) or "ONDACADIZCARNAVAL"
+            return _forzar(db, Programado(youtube_id, titulo, duracion, canal), inicio, fin)
 
+        with _lock_cambio:
+            _cola = tuple(p for p in _cola if p.youtube_id != youtube_id)
+            _publicar(db, {
+                "youtube_id": youtube_id,
+                "titulo": titulo,
+                "duracion": duracion,
+                "started_at": datetime.utcnow(),
+            })
+        if not duracion:
+            _resolver_duracion(youtube_id)
         return True
 
     except Exception as e:
@@ -133,52 +293,154 @@ def programar_video(youtube_id: str) -> bool:
         db.rollback()
         return False
     finally:
-        db.close()
+        if propia:
+            db.close()
+
+
+# ─── Duraciones desconocidas ──────────────────────────────────────────────────
+
+def _resolver_duracion(youtube_id: str):
+    """Encola la consulta de la duración con yt-dlp (una vez por vídeo y proceso)."""
+    global _resolutor
+    with _lock_resolver:
+        if youtube_id in _resolviendo or youtube_id in _sin_duracion:
+            return
+        _resolviendo.add(youtube_id)
+        if _resolutor is None:
+            _resolutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-duracion")
+    _resolutor.submit(_resolver, youtube_id)
+
+
+def _resolver(youtube_id: str):
+    try:
+        from backend.services.youtube_scraper import metadatos_ytdlp
+        meta = metadatos_ytdlp(youtube_id)
+        duracion = int(meta.get("duracion") or 0) if meta else 0
+        if not duracion:
+            with _lock_resolver:
+                _sin_duracion.add(youtube_id)
+            return
+        db = SessionLocal()
+        try:
+            video = db.query(Video).filter(Video.youtube_id == youtube_id).first()
+            if video:
+                video.duracion = duracion
+                db.commit()
+            # Si es el vídeo en antena, ya tiene final: el planificador lo recalcula
+            with _lock_cambio:
+                if _actual is not None and _actual.youtube_id == youtube_id and not _actual.duracion:
+                    _publicar(db, {"duracion": duracion})
+        finally:
+            db.close()
+        print(f"[Live] Duración de {youtube_id}: {duracion}s")
+    except Exception as e:
+        print(f"[Live] Error resolviendo la duración de {youtube_id}: {e}")
+    finally:
+        with _lock_resolver:
+            _resolviendo.discard(youtube_id)
+
 
+# ─── Planificador ─────────────────────────────────────────────────────────────
 
-def _monitor_loop():
+def _espera(estado) -> float:
+    """Segundos hasta que toca avanzar: 0 = ya; None = sin final conocido."""
+    if estado is None or not estado.youtube_id:
+        return 0
+    if not estado.duracion or not estado.started_at:
+        return None     # duración desconocida: se queda hasta un cambio manual
+    fin = estado.started_at + timedelta(seconds=estado.duracion + config.LIVE_MARGEN)
+    return max(0.0, (fin - datetime.utcnow()).total_seconds())
+
+
+def _avanzar_si_sigue(estado) -> bool:
     """
-    Bucle de monitorización: detecta cuando termina el vídeo actual
-    y avanza al siguiente automáticamente.
-    Comprueba cada 30 segundos.
+    Avanza si `estado` sigue siendo el actual (nadie lo cambió mientras tanto).
+    False si no hay vídeos; los errores de BD se propagan al planificador.
     """
-    global _monitor_running
-    print("[Live] Monitor iniciado.")
-    while _monitor_running:
+    with _lock_cambio:
+        if _actual is not estado:
+            return True
+        db = SessionLocal()
         try:
-            db = SessionLocal()
-            try:
-                estado = db.query(EstadoLive).filter(EstadoLive.id == 1).first()
-                if estado and estado.youtube_id:
-                    if estado.duracion and estado.duracion > 0:
-                        elapsed = int((datetime.utcnow() - estado.started_at).total_seconds())
-                        # Avanzar si el vídeo ha terminado (con 15s de margen)
-                        if elapsed >= estado.duracion + 15:
-                            print(f"[Live] Vídeo terminado ({elapsed}s / {estado.duracion}s). Avanzando...")
-                            avanzar_al_siguiente()
-                    # else: duracion=0 o desconocida → dejar el vídeo actual sin cambiar
-                else:
-                    # Sin registro o sin youtube_id → intentar iniciar
-                    avanzar_al_siguiente()
-            finally:
-                db.close()
-        except Exception as e:
-            print(f"[Live] Error en monitor: {e}")
+            return _avanzar(db) is not None
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
 
-        time.sleep(30)
+
+def _cargar():
+    """Recupera el último estado guardado (tras un reinicio)."""
+    global _actual
+    db = SessionLocal()
+    try:
+        estado = db.get(EstadoLive, 1)
+        if estado and estado.youtube_id:
+            _actual = _copia(estado)
+    finally:
+        db.close()
+
+
+def _preparar_cola():
+    db = SessionLocal()
+    try:
+        with _lock_cambio:
+            _rellenar_cola(db)
+    finally:
+        db.close()
+
+
+def _planificador():
+    print("[Live] Planificador iniciado.")
+    try:
+        _preparar_cola()
+    except Exception as e:
+        print(f"[Live] Error preparando la cola: {e}")
+    while _activo:
+        with _cond:
+            estado = _actual
+            espera = _espera(estado)
+            if espera != 0:
+                _cond.wait(espera)      # despierta al final del vídeo o con cada cambio
+                continue
+        try:
+            if estado is not None:
+                print(f"[Live] Vídeo terminado ({estado.duracion}s). Avanzando...")
+            if _avanzar_si_sigue(estado):
+                continue
+            espera = _REINTENTO             # catálogo vacío: no hay prisa
+        except Exception as e:
+            print(f"[Live] Error en planificador (reintento en {_REINTENTO_ERROR}s): {e}")
+            espera = _REINTENTO_ERROR       # BD ocupada: reintentar pronto
+        # Reintentar más tarde (o antes, si hay un cambio)
+        with _cond:
+            _cond.wait(espera)
 
 
 def iniciar_monitor():
-    """Inicia el hilo de monitorización del canal live."""
-    global _monitor_thread, _monitor_running
-    if _monitor_thread and _monitor_thread.is_alive():
+    """Carga el estado guardado e inicia el planificador del canal live."""
+    global _hilo, _activo
+    if _determinista():
+        print("[Live] Modo determinista: sin planificador (el estado sale del reloj).")
         return
-    _monitor_running = True
-    _monitor_thread = threading.Thread(target=_monitor_loop, daemon=True)
-    _monitor_thread.start()
+    if _hilo and _hilo.is_alive():
+        return
+    if config.SOCKETIO_MESSAGE_QUEUE:
+        print("[Live] Aviso: con varios procesos cada uno tendría su propio planificador; "
+              "usa LIVE_MODO=determinista.")
+    try:
+        _cargar()
+    except Exception as e:
+        print(f"[Live] No se pudo leer el estado guardado: {e}")
+    _activo = True
+    _hilo = threading.Thread(target=_planificador, daemon=True, name="live")
+    _hilo.start()
 
 
 def detener_monitor():
-    """Detiene el hilo de monitorización."""
-    global _monitor_running
-    _monitor_running = False
+    """Detiene el planificador."""
+    global _activo
+    _activo = False
+    with _cond:
+        _cond.notify_all()
@@ -0,0 +1,53 @@
+"""
+Contadores de uso en memoria (por proceso), agrupados por familia:
+
+    metricas.sumar("audio_bytes", "chirigotas/Los Yesterday/01 - ….mp3", 65536)
+    metricas.valores("audio_bytes", top=20)
+
+Familias: audio_bytes/audio_peticiones (services/audio_stream) y
+api_bytes/api_respuestas (tamaño de las respuestas JSON por endpoint, main).
+
+Se reinician al arrancar; sirven para el panel de admin y para dimensionar
+(qué pistas se escuchan, cuántos bytes sale por cada una), no como registro.
+"""
+import threading
+
+_contadores: dict = {}      # familia → {clave: valor}
+_lock = threading.Lock()
+
+
+def sumar(familia: str, clave: str, n: int = 1):
+    """Suma n al contador familia/clave."""
+    with _lock:
+        grupo = _contadores.setdefault(familia, {})
+        grupo[clave] = grupo.get(clave, 0) + n
+
+
+def valores(familia: str, top: int = None) -> dict:
+    """Contadores de una familia, de mayor a menor (los `top` primeros si se indica)."""
+    with _lock:
+        items = sorted(_contadores.get(familia, {}).items(), key=lambda kv: -kv[1])
+    return dict(items[:top] if top else items)
+
+
+def instantanea(top: int = None) -> dict:
+    """Todas las familias: {familia: {total, claves, valores}}."""
+    with _lock:
+        familias = list(_contadores)
+    resultado = {}
+    for familia in familias:
+        datos = valores(familia)
+        resultado[familia] = {
+            "total": sum(datos.values()),
+            "claves": len(datos),
+            "valores": dict(list(datos.items())[:top]) if top else datos,
+        }
+    return resultado
+
+
+def reiniciar(familia: str = None):
+    with _lock:
+        if familia:
+            _contadores.pop(familia, None)
+        else:
+            _contadores.clear()
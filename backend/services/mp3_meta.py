@@ -0,0 +1,204 @@
+"""
+Lectura de metadatos MP3 sin dependencias externas.
+
+  - Etiqueta ID3v2 (v2.2/2.3/2.4): título, nº de pista, artista, TLEN.
+  - Primera trama MPEG de audio: versión, capa, bitrate, frecuencia.
+  - Cabecera Xing/Info o VBRI (VBR): nº total de tramas → duración exacta.
+  - Sin cabecera VBR: duración estimada como CBR a partir del tamaño.
+
+Solo se leen los primeros KB del fichero (y los 128 bytes finales para
+descontar una etiqueta ID3v1), así que es barato incluso en lote.
+"""
+import os
+import struct
+
+_BLOQUE = 64 * 1024
+
+# Bitrates en kbps: [versión MPEG1 | MPEG2/2.5][capa 1-3][índice]
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_FRECUENCIAS = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+_VERSIONES = {0b00: 2.5, 0b10: 2, 0b11: 1}   # 0b01 reservado
+_CAPAS = {0b01: 3, 0b10: 2, 0b11: 1}         # 0b00 reservado
+
+# Marcos ID3 de texto que interesan (v2.3/2.4 → v2.2)
+_MARCOS = {"TIT2": "titulo", "TRCK": "pista", "TPE1": "artista", "TLEN": "tlen"}
+_MARCOS_V22 = {"TT2": "titulo", "TRK": "pista", "TP1": "artista", "TLE": "tlen"}
+
+
+def _syncsafe(b: bytes) -> int:
+    return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+
+
+def _texto_id3(datos: bytes) -> str:
+    if not datos:
+        return ""
+    codificacion, cuerpo = datos[0], datos[1:]
+    codec = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}.get(codificacion, "latin-1")
+    return cuerpo.decode(codec, errors="replace").strip("\x00").strip()
+
+
+def _leer_id3(cabecera: bytes, f) -> tuple:
+    """Devuelve (tamaño_total_etiqueta, {titulo, pista, artista, tlen})."""
+    if len(cabecera) < 10 or cabecera[:3] != b"ID3":
+        return 0, {}
+    version, flags = cabecera[3], cabecera[5]
+    tamaño = _syncsafe(cabecera[6:10]) + 10
+    if flags & 0x10:
+        tamaño += 10        # pie de etiqueta (v2.4)
+
+    f.seek(10)
+    cuerpo = f.read(tamaño - 10)
+    etiquetas = {}
+    pos = 0
+    if version == 2:
+        while pos + 6 <= len(cuerpo) and cuerpo[pos] != 0:
+            marco = cuerpo[pos:pos + 3].decode("latin-1")
+            largo = int.from_bytes(cuerpo[pos + 3:pos + 6], "big")
+            if marco in _MARCOS_V22:
+                etiquetas[_MARCOS_V22[marco]] = _texto_id3(cuerpo[pos + 6:pos + 6 + largo])
+            pos += 6 + largo
+    else:
+        if flags & 0x40 and len(cuerpo) >= 4:   # cabecera extendida
+            ext = cuerpo[:4]
+            pos = _syncsafe(ext) if version == 4 else struct.unpack(">I", ext)[0] + 4
+        while pos + 10 <= len(cuerpo) and cuerpo[pos] != 0:
+            marco = cuerpo[pos:pos + 4].decode("latin-1", errors="replace")
+            crudo = cuerpo[pos + 4:pos + 8]
+            largo = _syncsafe(crudo) if version == 4 else struct.unpack(">I", crudo)[0]
+            if largo <= 0:
+                break
+            if marco in _MARCOS:
+                etiquetas[_MARCOS[marco]] = _texto_id3(cuerpo[pos + 10:pos + 10 + largo])
+            pos += 10 + largo
+    return tamaño, etiquetas
+
+
+def _cabecera_trama(b: bytes):
+    """Decodifica 4 bytes de cabecera MPEG; None si no es una cabecera válida."""
+    if len(b) < 4 or b[0] != 0xFF or (b[1] & 0xE0) != 0xE0:
+        return None
+    version = _VERSIONES.get((b[1] >> 3) & 0b11)
+    capa = _CAPAS.get((b[1] >> 1) & 0b11)
+    indice_br = b[2] >> 4
+    indice_fr = (b[2] >> 2) & 0b11
+    if version is None or capa is None or indice_br in (0, 15) or indice_fr == 3:
+        return None
+
+    bitrate = _BITRATES[(1 if version == 1 else 2, capa)][indice_br]
+    frecuencia = _FRECUENCIAS[version][indice_fr]
+    relleno = (b[2] >> 1) & 1
+    mono = (b[3] >> 6) == 0b11
+    if capa == 1:
+        largo = (12 * bitrate * 1000 // frecuencia + relleno) * 4
+        muestras = 384
+    elif capa == 2 or version == 1:
+        largo = 144 * bitrate * 1000 // frecuencia + relleno
+        muestras = 1152
+    else:
+        largo = 72 * bitrate * 1000 // frecuencia + relleno
+        muestras = 576
+    return {
+        "version": version,
+        "capa": capa,
+        "bitrate": bitrate,
+        "frecuencia": frecuencia,
+        "mono": mono,
+        "largo": largo,
+        "muestras": muestras,
+    }
+
+
+def _buscar_primera_trama(datos: bytes):
+    """Offset y cabecera de la primera trama válida (confirmada por la siguiente)."""
+    pos = datos.find(b"\xff")
+    while 0 <= pos < len(datos) - 4:
+        cab = _cabecera_trama(datos[pos:pos + 4])
+        if cab:
+            siguiente = pos + cab["largo"]
+            if siguiente + 4 > len(datos) or _cabecera_trama(datos[siguiente:siguiente + 4]):
+                return pos, cab
+        pos = datos.find(b"\xff", pos + 1)
+    return None, None
+
+
+def _tramas_vbr(trama: bytes, cab: dict):
+    """
+    Nº de tramas según la cabecera Xing/Info o VBRI de la primera trama, o
+    None (también si la trama está cortada antes del campo).
+    """
+    if cab["version"] == 1:
+        lado = 17 if cab["mono"] else 32
+    else:
+        lado = 9 if cab["mono"] else 17
+    xing = 4 + lado
+    if trama[xing:xing + 4] in (b"Xing", b"Info"):
+        if len(trama) < xing + 8:
+            return None
+        flags = struct.unpack(">I", trama[xing + 4:xing + 8])[0]
+        if flags & 0x1 and len(trama) >= xing + 12:
+            return struct.unpack(">I", trama[xing + 8:xing + 12])[0]
+    if trama[36:40] == b"VBRI" and len(trama) >= 54:
+        return struct.unpack(">I", trama[50:54])[0]
+    return None
+
+
+def leer_metadatos(ruta: str) -> dict:
+    """
+    Metadatos de un MP3:
+      duracion (segundos, float), bitrate (kbps medio), frecuencia (Hz),
+      vbr (bool), titulo/pista/artista (ID3) y el tramo de audio puro
+      [inicio_audio, fin_audio): sin ID3v2, sin la trama Xing/Info y sin ID3v1,
+      que es lo que se concatena al servir un álbum entero.
+    Lanza ValueError si no se encuentra ninguna trama MPEG.
+    """
+    tamaño_fichero = os.path.getsize(ruta)
+    with open(ruta, "rb") as f:
+        tamaño_id3, etiquetas = _leer_id3(f.read(10), f)
+        f.seek(tamaño_id3)
+        datos = f.read(_BLOQUE)
+        tiene_id3v1 = False
+        if tamaño_fichero >= 128:
+            f.seek(-128, os.SEEK_END)
+            tiene_id3v1 = f.read(3) == b"TAG"
+
+    offset, cab = _buscar_primera_trama(datos)
+    if cab is None:
+        tlen = etiquetas.get("tlen", "")
+        if tlen.isdigit():
+            return {"duracion": int(tlen) / 1000, "bitrate": 0, **etiquetas}
+        raise ValueError(f"No se encontró audio MPEG en {ruta}")
+
+    inicio = tamaño_id3 + offset
+    fin = tamaño_fichero - (128 if tiene_id3v1 else 0)
+    bytes_audio = fin - inicio
+    tramas = _tramas_vbr(datos[offset:offset + cab["largo"]], cab)
+    if tramas:
+        inicio += cab["largo"]      # la trama Xing/Info no lleva audio
+        duracion = tramas * cab["muestras"] / cab["frecuencia"]
+        bitrate = round(bytes_audio * 8 / duracion / 1000) if duracion else cab["bitrate"]
+    else:
+        duracion = bytes_audio * 8 / (cab["bitrate"] * 1000)
+        bitrate = cab["bitrate"]
+
+    return {
+        "duracion": duracion,
+        "bitrate": bitrate,
+        "frecuencia": cab["frecuencia"],
+        "vbr": bool(tramas) and bitrate != cab["bitrate"],
+        "inicio_audio": inicio,
+        "fin_audio": fin,
+        "titulo": etiquetas.get("titulo"),
+        "pista": etiquetas.get("pista"),
+        "artista": etiquetas.get("artista"),
+    }
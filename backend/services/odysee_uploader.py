@@ -8,7 +8,7 @@ Para subir el archivo de vídeo real necesitarías descargarlo primero (yt-dlp).
 """
 import requests
 from backend.config import config
-from backend.database import SessionLocal
+from backend.database import SessionLocal, escritura
 from backend.models import Video
 
 
@@ -118,15 +118,16 @@ def sincronizar_pendientes(limite: int = 20):
             .limit(limite)
             .all()
         )
-        subidos = 0
-        for video in pendientes:
-            url = client.publicar_video(video)
-            if url:
-                video.odysee_url = url
-                db.commit()
-                subidos += 1
-                print(f"[Odysee] Subido: {video.titulo} → {url}")
-
-        print(f"[Odysee] Sincronización completa: {subidos}/{len(pendientes)}")
     finally:
-        db.close()
+        db.close()      # la subida tarda minutos: no retener la conexión
+
+    subidos = 0
+    for video in pendientes:
+        url = client.publicar_video(video)
+        if url:
+            with escritura() as w:
+                w.get(Video, video.id).odysee_url = url
+            subidos += 1
+            print(f"[Odysee] Subido: {video.titulo} → {url}")
+
+    print(f"[Odysee] Sincronización completa: {subidos}/{len(pendientes)}")
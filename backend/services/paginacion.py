@@ -0,0 +1,146 @@
+"""
+Paginación por cursor (keyset) y conteos cacheados.
+
+En lugar de OFFSET, el cliente envía el cursor opaco que devolvió la página
+anterior; el cursor codifica la clave de orden de la última fila servida y
+la siguiente página se obtiene con un WHERE sobre esa clave (usa el índice
+compuesto correspondiente, coste constante sea cual sea la profundidad).
+
+Los totales (COUNT(*)) se guardan en un LRU acotado de _MAX_CONTEOS
+entradas con la versión del catálogo en la clave: un cambio en las tablas
+los deja inservibles al momento y el texto libre de q no hace crecer la
+memoria sin límite.
+"""
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import DateTime, and_, or_
+
+from backend.services import catalogo
+
+# Segundos que se reutiliza un total calculado con COUNT(*)
+TTL_CONTEO = 60
+_MAX_CONTEOS = 512
+
+_conteos = OrderedDict()    # clave → (instante, total), del menos al más usado
+_lock = threading.Lock()
+
+
+def codificar_cursor(valores: list) -> str:
+    """[2024, 1532, 87] → token base64url opaco."""
+    crudo = json.dumps(valores, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(token: str) -> list:
+    """Inverso de codificar_cursor. Lanza ValueError si el token no es válido."""
+    try:
+        relleno = "=" * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + relleno))
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {e}") from e
+    if not isinstance(valores, list):
+        raise ValueError("Cursor inválido")
+    return valores
+
+
+def filtro_keyset(orden: list, valores: list):
+    """
+    Condición "filas posteriores a `valores`" para un ORDER BY compuesto.
+
+    `orden` es una lista de (columna, descendente). Sigue la semántica de
+    SQLite: NULL es el menor valor (primero en ASC, último en DESC).
+    La última columna debe ser única y no nula (normalmente el id).
+    """
+    (col, descendente), *resto = orden
+    valor, *resto_valores = valores
+    if not resto:
+        return col < valor if descendente else col > valor
+
+    siguiente = filtro_keyset(resto, resto_valores)
+    if valor is None:
+        if descendente:
+            return and_(col.is_(None), siguiente)
+        return or_(col.isnot(None), and_(col.is_(None), siguiente))
+    if descendente:
+        return or_(col < valor, col.is_(None), and_(col == valor, siguiente))
+    return or_(col > valor, and_(col == valor, siguiente))
+
+
+def contar_cacheado(q, clave, ttl: int = TTL_CONTEO) -> int:
+    """COUNT(*) de la query reutilizado durante `ttl` segundos por clave de filtros."""
+    ahora = time.monotonic()
+    with _lock:
+        previo = _conteos.get(clave)
+        if previo and ahora - previo[0] < ttl:
+            _conteos.move_to_end(clave)
+            return previo[1]
+    total = q.count()
+    with _lock:
+        _conteos[clave] = (ahora, total)
+        _conteos.move_to_end(clave)
+        for caducada in [c for c, (instante, _) in _conteos.items() if ahora - instante >= ttl]:
+            del _conteos[caducada]
+        while len(_conteos) > _MAX_CONTEOS:
+            _conteos.popitem(last=False)
+    return total
+
+
+def clave_conteo(path: str, args, *tablas) -> tuple:
+    """
+    Clave de caché de conteo a partir de la ruta, los filtros (sin
+    paginación) y la versión de las `tablas` consultadas.
+    """
+    ignorar = {"cursor", "page", "per_page", "con_total", "limit"}
+    filtros = tuple(sorted((k, v) for k, v in args.items() if k not in ignorar))
+    return (path, filtros, catalogo.version(*tablas))
+
+
+def criterio_orden(orden: list) -> list:
+    """[(col, descendente), ...] → expresiones para ORDER BY."""
+    return [col.desc() if descendente else col.asc() for col, descendente in orden]
+
+
+def _desde_json(col, valor):
+    """Las fechas viajan en el cursor como texto ISO; el resto tal cual."""
+    if valor is not None and isinstance(getattr(col, "type", None), DateTime):
+        return datetime.fromisoformat(valor)
+    return valor
+
+
+def pagina_keyset(q, orden: list, cursor: str, per_page: int):
+    """
+    Ejecuta una página keyset de la query.
+    `cursor` vacío = primera página. Devuelve (objetos, siguiente_cursor|None);
+    si la query es una proyección de columnas, filas con esas columnas.
+    Lanza ValueError si el cursor no corresponde a este orden.
+    """
+    descripciones = q.column_descriptions
+    n_entidades = len(descripciones)
+    # Query de una entidad (objetos) frente a proyección de columnas (filas)
+    es_entidad = n_entidades == 1 and descripciones[0]["expr"] is descripciones[0]["entity"]
+    if cursor:
+        valores = decodificar_cursor(cursor)
+        if len(valores) != len(orden):
+            raise ValueError("Cursor inválido para este listado")
+        valores = [_desde_json(col, v) for (col, _), v in zip(orden, valores)]
+        q = q.filter(filtro_keyset(orden, valores))
+
+    columnas = [col for col, _ in orden]
+    filas = (
+        q.add_columns(*columnas)
+        .order_by(*criterio_orden(orden))
+        .limit(per_page + 1)
+        .all()
+    )
+    siguiente = None
+    if len(filas) > per_page:
+        filas = filas[:per_page]
+        siguiente = codificar_cursor(list(filas[-1][n_entidades:]))
+    if es_entidad:
+        return [f[0] for f in filas], siguiente
+    return [f[:n_entidades] for f in filas], siguiente
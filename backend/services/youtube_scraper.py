@@ -36,7 +36,7 @@ except ImportError:
     _API_DISPONIBLE = False
 
 from backend.config import config
-from backend.database import SessionLocal
+from backend.database import SessionLectura, escritura
 from backend.models import Video, Grupo
 
 # ---------------------------------------------------------------------------
@@ -492,6 +492,32 @@ def _listar_videos_canal_ytdlp(channel_url: str, max_videos: int = 200) -> list:
     return ids
 
 
+def _ids_existentes(youtube_ids: list) -> set:
+    """youtube_ids que ya están en la BD (una consulta de lectura, sin retener la conexión)."""
+    if not youtube_ids:
+        return set()
+    db = SessionLectura()
+    try:
+        return {
+            fila[0] for fila in
+            db.query(Video.youtube_id).filter(Video.youtube_id.in_(set(youtube_ids)))
+        }
+    finally:
+        db.close()
+
+
+def _guardar(lote: list):
+    """
+    Escribe los vídeos de `lote` en una transacción corta del escritor y lo
+    vacía. La metadata (yt-dlp, API) se obtiene antes, fuera de la transacción.
+    """
+    if not lote:
+        return
+    with escritura() as db:
+        db.add_all(lote)
+    lote.clear()
+
+
 def scrapear_canal_coac(channel_url: str, max_videos: int = 200) -> dict:
     """
     Scracea todos los videos de un canal de YouTube.
@@ -505,7 +531,7 @@ def scrapear_canal_coac(channel_url: str, max_videos: int = 200) -> dict:
     Guarda los videos en DB y devuelve un resumen con nuevos/existentes/errores.
     """
     print(f"[Canal] Scrapeando canal: {channel_url}")
-    db = SessionLocal()
+    lote = []
     nuevos = 0
     existentes = 0
     errores = 0
@@ -524,10 +550,10 @@ def scrapear_canal_coac(channel_url: str, max_videos: int = 200) -> dict:
             return {"nuevos": 0, "existentes": 0, "errores": 1, "canal": channel_url}
 
         print(f"[Canal] Encontrados {len(ids_canal)} videos en el canal")
+        ya_en_bd = _ids_existentes(ids_canal)
 
         for vid_id in ids_canal:
-            existente = db.query(Video).filter(Video.youtube_id == vid_id).first()
-            if existente:
+            if vid_id in ya_en_bd:
                 existentes += 1
                 continue
 
@@ -552,14 +578,14 @@ def scrapear_canal_coac(channel_url: str, max_videos: int = 200) -> dict:
                 tipo=meta["tipo"],
                 grupo_nombre=meta_raw["canal"],
             )
-            db.add(video)
+            lote.append(video)
             nuevos += 1
 
-            if nuevos % 20 == 0:
-                db.commit()
+            if len(lote) >= 20:
+                _guardar(lote)
                 print(f"[Canal] Guardados {nuevos} nuevos videos...")
 
-        db.commit()
+        _guardar(lote)
         resumen = {
             "nuevos": nuevos,
             "existentes": existentes,
@@ -571,15 +597,12 @@ def scrapear_canal_coac(channel_url: str, max_videos: int = 200) -> dict:
 
     except Exception as e:
         print(f"[Canal] Error inesperado: {e}")
-        db.rollback()
         return {
-            "nuevos": nuevos,
+            "nuevos": nuevos - len(lote),
             "existentes": existentes,
             "errores": errores + 1,
             "canal": channel_url,
         }
-    finally:
-        db.close()
 
 
 # ---------------------------------------------------------------------------
@@ -614,7 +637,7 @@ def scrapear_coac(
     nuevos = 0
     existentes = 0
     errores = 0
-    db = SessionLocal()
+    lote = []
 
     templates = getattr(
         config,
@@ -636,14 +659,13 @@ def scrapear_coac(
 
                 resultados = buscar_videos(query, max_results=25, forzar_ytdlp=forzar_ytdlp)
                 queries_usadas += 1
+                ya_en_bd = _ids_existentes([r["youtube_id"] for r in resultados])
 
                 for r in resultados:
-                    existente_db = db.query(Video).filter(
-                        Video.youtube_id == r["youtube_id"]
-                    ).first()
-                    if existente_db:
+                    if r["youtube_id"] in ya_en_bd:
                         existentes += 1
                         continue
+                    ya_en_bd.add(r["youtube_id"])   # la misma búsqueda puede repetir un vídeo
 
                     meta = _inferir_metadatos(r["titulo"], r["descripcion"])
 
@@ -671,10 +693,10 @@ def scrapear_coac(
                         tipo=meta["tipo"],
                         grupo_nombre=r.get("canal", ""),
                     )
-                    db.add(video)
+                    lote.append(video)
                     nuevos += 1
 
-                db.commit()
+                _guardar(lote)
 
                 # Control de cuota de API (~100 unidades por search)
                 if not forzar_ytdlp and queries_usadas >= 80:
@@ -695,12 +717,9 @@ def scrapear_coac(
 
     except Exception as e:
         print(f"[Scraper] Error inesperado: {e}")
-        db.rollback()
         return {
-            "nuevos": nuevos,
+            "nuevos": nuevos - len(lote),
             "existentes": existentes,
             "errores": errores + 1,
             "queries_usadas": queries_usadas,
         }
-    finally:
-        db.close()
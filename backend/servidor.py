@@ -0,0 +1,198 @@
+"""
+Arranque del servidor HTTP + Socket.IO según config.SERVIDOR:
+
+  desarrollo  socketio.run con el servidor de Werkzeug (recarga, depuración).
+              No es para producción.
+  waitress    WSGI multihilo (SERVIDOR_HILOS hilos, SERVIDOR_CONEXIONES
+              conexiones). Va en Windows sin dependencias nativas. No admite
+              WebSocket: Socket.IO usa long-polling, y cada cliente de chat o
+              live ocupa un hilo mientras espera. Hay que dimensionar
+              SERVIDOR_HILOS por encima de los usuarios conectados a la vez.
+  eventlet    green threads: HTTP y WebSocket en el mismo proceso, miles de
+  gevent      conexiones con poca memoria. Hace falta el paquete (y
+              gevent-websocket para gevent). La stdlib se parchea
+              (parchear()) antes de importar Flask; las consultas a SQLite
+              siguen siendo bloqueantes, así que conviene mantenerlas cortas.
+
+Varios procesos (detrás de un balanceador con sesiones persistentes, que
+long-polling necesita) comparten las salas de Socket.IO con
+SOCKETIO_MESSAGE_QUEUE: cada emit se publica en la cola (Redis o cualquier
+broker que admita python-socketio) y todos los procesos lo reparten a sus
+clientes. Sin cola, un emit solo llega a los clientes del propio proceso.
+
+En todos los modos SIGINT/SIGTERM apagan de forma ordenada. El servidor deja
+de aceptar conexiones, espera hasta SERVIDOR_APAGADO segundos a las
+peticiones en curso y ejecuta las funciones registradas con al_apagar()
+(volcados pendientes, pools de BD). Una segunda señal corta sin esperar.
+"""
+import _thread
+import signal
+import threading
+import time
+from urllib.parse import urlsplit
+
+from backend.config import config
+
+MODOS = ("desarrollo", "waitress", "eventlet", "gevent")
+
+_al_apagar = []
+
+
+def modo() -> str:
+    if config.SERVIDOR not in MODOS:
+        raise ValueError(f"SERVIDOR={config.SERVIDOR!r} no válido (opciones: {', '.join(MODOS)})")
+    return config.SERVIDOR
+
+
+def parchear():
+    """Monkey-patching de eventlet/gevent. Debe llamarse antes de importar Flask."""
+    if modo() == "eventlet":
+        import eventlet
+        eventlet.monkey_patch()
+    elif modo() == "gevent":
+        from gevent import monkey
+        monkey.patch_all()
+
+
+def transportes_socketio() -> str:
+    """Transportes que el cliente debe probar (waitress no admite WebSocket)."""
+    return "polling" if modo() == "waitress" else "websocket,polling"
+
+
+def opciones_socketio() -> dict:
+    """message_queue/channel para SocketIO(); vacío si no hay SOCKETIO_MESSAGE_QUEUE."""
+    if not config.SOCKETIO_MESSAGE_QUEUE:
+        return {}
+    return {"message_queue": config.SOCKETIO_MESSAGE_QUEUE, "channel": config.SOCKETIO_CANAL}
+
+
+def cola_socketio() -> str:
+    """URL de la cola sin credenciales (para logs y métricas), o None."""
+    url = config.SOCKETIO_MESSAGE_QUEUE
+    if not url:
+        return None
+    partes = urlsplit(url)
+    if partes.password:
+        partes = partes._replace(netloc=partes.netloc.replace(f":{partes.password}@", ":***@"))
+    return partes.geturl()
+
+
+def estado_socketio() -> dict:
+    return {"async_mode": config.SOCKETIO_ASYNC_MODE, "cola": cola_socketio(), "canal": config.SOCKETIO_CANAL}
+
+
+def al_apagar(funcion):
+    """Registra una función a ejecutar al apagar (en orden inverso al registro)."""
+    _al_apagar.append(funcion)
+    return funcion
+
+
+def _apagar():
+    for funcion in reversed(_al_apagar):
+        try:
+            funcion()
+        except Exception as e:
+            print(f"[Servidor] Error al apagar ({funcion.__name__}): {e}")
+    print("[Servidor] Detenido.")
+
+
+def _dos_señales(primera):
+    """Manejador que ejecuta `primera` con la primera señal y sale sin esperar con la segunda."""
+    recibidas = []
+
+    def manejador(signum, frame):
+        if recibidas:
+            print("[Servidor] Segunda señal: salida inmediata.")
+            raise SystemExit(1)
+        recibidas.append(signum)
+        print(f"[Servidor] Apagando (esperando hasta {config.SERVIDOR_APAGADO}s a las peticiones en curso)...")
+        primera()
+
+    return manejador
+
+
+# ─── Modos ────────────────────────────────────────────────────────────────────
+
+def _waitress(app):
+    from waitress.server import create_server
+
+    servidor = create_server(
+        app,
+        host=config.HOST,
+        port=config.PORT,
+        threads=config.SERVIDOR_HILOS,
+        connection_limit=config.SERVIDOR_CONEXIONES,
+        channel_timeout=config.SERVIDOR_KEEPALIVE,
+        ident="Carnavalix",
+    )
+
+    def esperar_en_curso():
+        despachador = servidor.task_dispatcher
+        limite = time.monotonic() + config.SERVIDOR_APAGADO
+        while time.monotonic() < limite and (despachador.active_count or despachador.queue):
+            time.sleep(0.1)
+        # Saca al hilo principal del bucle de waitress (run() apaga los hilos)
+        _thread.interrupt_main()
+
+    def primera():
+        servidor.close()        # deja de escuchar; las conexiones abiertas siguen
+        threading.Thread(target=esperar_en_curso, daemon=True).start()
+
+    manejador = _dos_señales(primera)
+    signal.signal(signal.SIGINT, manejador)
+    signal.signal(signal.SIGTERM, manejador)
+    try:
+        servidor.run()
+    except KeyboardInterrupt:
+        pass
+
+
+def _eventlet(app, socketio):
+    # eventlet.wsgi.server espera a las peticiones en curso al recibir KeyboardInterrupt
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        socketio.run(
+            app, host=config.HOST, port=config.PORT,
+            log_output=config.DEBUG,
+            max_size=config.SERVIDOR_CONEXIONES,
+            keepalive=config.SERVIDOR_KEEPALIVE,
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+def _gevent(app, socketio):
+    import gevent
+    from gevent.pool import Pool
+
+    def primera():
+        # stop(timeout): cierra el socket de escucha y espera a los handlers
+        gevent.spawn(socketio.wsgi_server.stop, timeout=config.SERVIDOR_APAGADO)
+
+    manejador = _dos_señales(primera)
+    signal.signal(signal.SIGINT, manejador)
+    signal.signal(signal.SIGTERM, manejador)
+    socketio.run(
+        app, host=config.HOST, port=config.PORT,
+        log_output=config.DEBUG,
+        spawn=Pool(config.SERVIDOR_CONEXIONES),
+    )
+
+
+def arrancar(app, socketio):
+    """Sirve la app con el modo configurado hasta recibir SIGINT/SIGTERM."""
+    cola = cola_socketio()
+    print(f"[Servidor] Modo {modo()} (Socket.IO: {config.SOCKETIO_ASYNC_MODE}"
+          f"{f', cola {cola}' if cola else ''}) en http://{config.HOST}:{config.PORT}")
+    try:
+        if modo() == "waitress":
+            _waitress(app)
+        elif modo() == "eventlet":
+            _eventlet(app, socketio)
+        elif modo() == "gevent":
+            _gevent(app, socketio)
+        else:
+            socketio.run(app, host=config.HOST, port=config.PORT,
+                         debug=config.DEBUG, use_reloader=False)
+    finally:
+        _apagar()
@@ -0,0 +1,134 @@
+"""
+Prueba de carga HTTP (solo stdlib) para comparar modos de servidor.
+
+    # Terminal 1: arrancar con el modo a probar
+    set SERVIDOR=desarrollo        (o waitress / eventlet / gevent)
+    python -m backend.main
+
+    # Terminal 2
+    python deploy/carga.py --url http://localhost:8000 --concurrencia 50 --duracion 20
+
+Cada cliente mantiene su conexión abierta (keep-alive) y recorre las rutas
+en bucle. Al final muestra peticiones/s, latencias p50/p95/p99, códigos de
+estado y bytes recibidos. Repetir con cada SERVIDOR y comparar req/s.
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+RUTAS = (
+    "/api/videos/?per_page=24",
+    "/api/videos/estadisticas",
+    "/api/letras/?per_page=24",
+    "/api/votos/ranking",
+    "/api/audio/",
+    "/live/estado",
+    "/",
+)
+
+
+class _Resultados:
+    def __init__(self):
+        self.latencias = []
+        self.estados = Counter()
+        self.errores = Counter()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def anotar(self, segundos: float, estado: int, n_bytes: int):
+        with self.lock:
+            self.latencias.append(segundos)
+            self.estados[estado] += 1
+            self.bytes += n_bytes
+
+    def fallo(self, error: Exception):
+        with self.lock:
+            self.errores[type(error).__name__] += 1
+
+
+def _cliente(destino, rutas, fin: float, resultados: _Resultados, cabeceras: dict):
+    conexion = None
+    i = 0
+    while time.monotonic() < fin:
+        ruta = rutas[i % len(rutas)]
+        i += 1
+        try:
+            if conexion is None:
+                clase = http.client.HTTPSConnection if destino.scheme == "https" else http.client.HTTPConnection
+                conexion = clase(destino.hostname, destino.port, timeout=30)
+            inicio = time.perf_counter()
+            conexion.request("GET", ruta, headers=cabeceras)
+            resp = conexion.getresponse()
+            cuerpo = resp.read()
+            resultados.anotar(time.perf_counter() - inicio, resp.status, len(cuerpo))
+            if resp.getheader("Connection", "").lower() == "close":
+                conexion.close()
+                conexion = None
+        except (OSError, http.client.HTTPException) as e:
+            resultados.fallo(e)
+            if conexion:
+                conexion.close()
+            conexion = None
+    if conexion:
+        conexion.close()
+
+
+def _percentil(ordenadas: list, p: float) -> float:
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))]
+
+
+def ejecutar(url: str, concurrencia: int, duracion: float, rutas=RUTAS, comprimir: bool = True) -> dict:
+    destino = urlsplit(url)
+    cabeceras = {"Accept-Encoding": "gzip, br"} if comprimir else {}
+    resultados = _Resultados()
+    fin = time.monotonic() + duracion
+    hilos = [
+        threading.Thread(target=_cliente, args=(destino, list(rutas), fin, resultados, cabeceras), daemon=True)
+        for _ in range(concurrencia)
+    ]
+    inicio = time.monotonic()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    transcurrido = time.monotonic() - inicio
+
+    ordenadas = sorted(resultados.latencias)
+    return {
+        "peticiones": len(ordenadas),
+        "req_s": round(len(ordenadas) / transcurrido, 1),
+        "p50_ms": round(_percentil(ordenadas, 0.50) * 1000, 1),
+        "p95_ms": round(_percentil(ordenadas, 0.95) * 1000, 1),
+        "p99_ms": round(_percentil(ordenadas, 0.99) * 1000, 1),
+        "media_ms": round(statistics.fmean(ordenadas) * 1000, 1) if ordenadas else 0.0,
+        "estados": dict(resultados.estados),
+        "errores": dict(resultados.errores),
+        "mb_recibidos": round(resultados.bytes / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de Carnavalix")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrencia", type=int, default=50, help="clientes simultáneos")
+    parser.add_argument("--duracion", type=float, default=20, help="segundos")
+    parser.add_argument("--ruta", action="append", help="ruta a pedir (repetible; por defecto un recorrido típico)")
+    parser.add_argument("--sin-compresion", action="store_true", help="no enviar Accept-Encoding")
+    args = parser.parse_args()
+
+    print(f"[Carga] {args.concurrencia} clientes durante {args.duracion}s contra {args.url}")
+    r = ejecutar(args.url, args.concurrencia, args.duracion, args.ruta or RUTAS, not args.sin_compresion)
+    print(f"[Carga] {r['peticiones']} peticiones → {r['req_s']} req/s")
+    print(f"[Carga] latencia p50 {r['p50_ms']} ms · p95 {r['p95_ms']} ms · p99 {r['p99_ms']} ms "
+          f"(media {r['media_ms']} ms)")
+    print(f"[Carga] estados {r['estados']}  errores {r['errores'] or '-'}  recibidos {r['mb_recibidos']} MB")
+
+
+if __name__ == "__main__":
+    main()
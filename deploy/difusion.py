@@ -0,0 +1,150 @@
+"""
+Prueba de difusión Socket.IO: latencia de los broadcasts a las salas.
+
+    pip install "python-socketio[asyncio_client]"
+
+    # Un proceso
+    python deploy/difusion.py --url http://localhost:8000 --clientes 2000
+
+    # Varios procesos con SOCKETIO_MESSAGE_QUEUE (uno por puerto)
+    python deploy/difusion.py --url http://localhost:8000 --url http://localhost:8001 --clientes 4000
+
+Conecta --clientes clientes simulados repartidos entre las salas (general y
+live por defecto) y entre las --url. Cuando han entrado todos, un emisor
+aparte manda --mensajes mensajes de chat a cada sala contra la PRIMERA
+--url, y cada cliente anota cuánto tardaron en llegarle. Con varias --url,
+los clientes de las demás solo los reciben si la cola reparte entre
+procesos, así que la columna de entregas dice si la cola funciona.
+
+Salida por sala: entregas recibidas/esperadas y latencia p50/p95/p99. Emisor
+y clientes comparten el bucle de este proceso: con muchos miles, la latencia
+incluye también la cola de eventos del propio cliente (mirar la CPU).
+
+Al entrar, cada cliente provoca un aviso "sistema" a toda su sala (N² avisos
+en total); --calma es la pausa antes de medir para que se agoten. Los
+mensajes de prueba quedan en el historial del chat (usuario "carga",
+contenido "[carga] …").
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from collections import Counter, defaultdict
+
+try:
+    import socketio
+except ImportError:
+    raise SystemExit('Falta el cliente de Socket.IO: pip install "python-socketio[asyncio_client]"')
+
+SALAS = ("general", "live")
+_CONECTANDO_A_LA_VEZ = 100
+
+
+class _Medidas:
+    def __init__(self, marca: str):
+        self.marca = marca
+        self.enviados = {}                      # contenido → instante de envío
+        self.latencias = defaultdict(list)      # sala → [s]
+        self.errores = Counter()
+
+    def recibido(self, sala: str, msg: dict):
+        inicio = self.enviados.get(msg.get("contenido"))
+        if inicio is not None:
+            self.latencias[sala].append(time.perf_counter() - inicio)
+
+
+async def _cliente(url: str, sala: str, indice: int, medidas: _Medidas, transportes: list):
+    sio = socketio.AsyncClient(reconnection=False)
+
+    @sio.on("mensaje")
+    async def _mensaje(msg):
+        medidas.recibido(sala, msg)
+
+    await sio.connect(url, transports=transportes, wait_timeout=30)
+    await sio.emit("unirse", {"sala": sala, "nombre": f"carga-{indice}"})
+    return sio
+
+
+def _percentil(ordenadas: list, p: float) -> float:
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))]
+
+
+async def ejecutar(urls: list, clientes: int, salas=SALAS, mensajes: int = 50, intervalo: float = 0.2,
+                   calma: float = 10, transportes=("websocket", "polling")) -> dict:
+    medidas = _Medidas(f"[carga] {uuid.uuid4().hex[:8]}")
+    transportes = list(transportes)
+    limite = asyncio.Semaphore(_CONECTANDO_A_LA_VEZ)
+    por_sala = Counter()
+
+    async def conectar(i):
+        sala = salas[i % len(salas)]
+        async with limite:
+            try:
+                sio = await _cliente(urls[i % len(urls)], sala, i, medidas, transportes)
+            except Exception as e:
+                medidas.errores[type(e).__name__] += 1
+                return None
+        por_sala[sala] += 1
+        return sio
+
+    inicio = time.monotonic()
+    conectados = [s for s in await asyncio.gather(*(conectar(i) for i in range(clientes))) if s]
+    print(f"[Difusión] {len(conectados)}/{clientes} clientes conectados en "
+          f"{time.monotonic() - inicio:.1f}s; esperando {calma}s...")
+    await asyncio.sleep(calma)
+
+    emisor = socketio.AsyncClient(reconnection=False)
+    await emisor.connect(urls[0], transports=transportes, wait_timeout=30)
+    for n in range(mensajes):
+        for sala in salas:
+            contenido = f"{medidas.marca} {sala} {n}"
+            medidas.enviados[contenido] = time.perf_counter()
+            await emisor.emit("mensaje", {"sala": sala, "contenido": contenido, "usuario": "carga"})
+        await asyncio.sleep(intervalo)
+    await asyncio.sleep(max(5.0, intervalo * 10))      # últimas entregas
+
+    await asyncio.gather(emisor.disconnect(), *(s.disconnect() for s in conectados), return_exceptions=True)
+
+    resultado = {"conectados": len(conectados), "errores": dict(medidas.errores), "salas": {}}
+    for sala in salas:
+        ordenadas = sorted(medidas.latencias[sala])
+        esperadas = mensajes * por_sala[sala]
+        resultado["salas"][sala] = {
+            "clientes": por_sala[sala],
+            "entregas": len(ordenadas),
+            "esperadas": esperadas,
+            "p50_ms": round(_percentil(ordenadas, 0.50) * 1000, 1),
+            "p95_ms": round(_percentil(ordenadas, 0.95) * 1000, 1),
+            "p99_ms": round(_percentil(ordenadas, 0.99) * 1000, 1),
+            "media_ms": round(statistics.fmean(ordenadas) * 1000, 1) if ordenadas else 0.0,
+        }
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de difusión de Socket.IO en Carnavalix")
+    parser.add_argument("--url", action="append", help="servidor (repetible: un proceso por URL)")
+    parser.add_argument("--clientes", type=int, default=1000, help="clientes simulados")
+    parser.add_argument("--sala", action="append", help=f"sala (repetible; por defecto {', '.join(SALAS)})")
+    parser.add_argument("--mensajes", type=int, default=50, help="mensajes por sala")
+    parser.add_argument("--intervalo", type=float, default=0.2, help="s entre rondas de mensajes")
+    parser.add_argument("--calma", type=float, default=10, help="s de espera tras conectar")
+    parser.add_argument("--polling", action="store_true", help="solo long-polling (SERVIDOR=waitress)")
+    args = parser.parse_args()
+
+    urls = args.url or ["http://localhost:8000"]
+    transportes = ("polling",) if args.polling else ("websocket", "polling")
+    r = asyncio.run(ejecutar(urls, args.clientes, tuple(args.sala or SALAS), args.mensajes,
+                             args.intervalo, args.calma, transportes))
+    for sala, s in r["salas"].items():
+        print(f"[Difusión] #{sala}: {s['clientes']} clientes · entregas {s['entregas']}/{s['esperadas']} · "
+              f"p50 {s['p50_ms']} ms · p95 {s['p95_ms']} ms · p99 {s['p99_ms']} ms (media {s['media_ms']} ms)")
+    if r["errores"]:
+        print(f"[Difusión] errores de conexión {r['errores']}")
+
+
+if __name__ == "__main__":
+    main()
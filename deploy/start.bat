@@ -35,6 +35,10 @@ if not exist ".env" (
     copy deploy\.env.example .env
 )
 
+:: Estáticos con huella y precomprimidos (.gz/.br) para /assets
+echo  [*] Construyendo estaticos...
+python -m backend.assets
+
 :: Arrancar el servidor
 echo  [*] Iniciando en http://localhost:5000
 echo  [*] Panel admin: http://localhost:5000/admin
@@ -9,6 +9,7 @@ let _playlistActual  = [];          // tracks del grupo seleccionado
 let _grupoActual     = "";          // nombre del grupo en reproducción
 let _iconoActual     = "🎵";        // icono de la modalidad actual
 let _trackIdx        = -1;          // índice del track en curso
+let _precarga        = null;        // <audio> oculto con la pista siguiente
 
 const audio = document.getElementById("audioElement");
 audio.volume = 0.8;
@@ -110,7 +111,7 @@ function cargarGrupo(modalidad, icono, grupo) {
     li.innerHTML = `
       <span class="track-num">${String(idx + 1).padStart(2, "0")}</span>
       <span class="track-titulo">${escHtml(track.titulo)}</span>
-      <span class="track-duracion" id="${durId}">—</span>
+      <span class="track-duracion" id="${durId}">${track.duracion ? formatTime(track.duracion) : "—"}</span>
       <button class="track-play-btn" title="Reproducir">▶</button>
     `;
 
@@ -122,8 +123,9 @@ function cargarGrupo(modalidad, icono, grupo) {
 
     lista.appendChild(li);
 
-    // Pre-cargar duración sin reproducir (usando un Audio temporal)
-    precargarDuracion(track.url, durId);
+    // La API ya trae la duración; solo si aún no está extraída se
+    // pre-carga sin reproducir (usando un Audio temporal)
+    if (!track.duracion) precargarDuracion(track.url, durId);
   });
 
   // Botón "Reproducir todo"
@@ -136,8 +138,9 @@ function reproducir(idx) {
   _trackIdx = idx;
   const track = _playlistActual[idx];
 
-  audio.src = track.url;
+  audio.src = urlPista(track);
   audio.play().catch(err => console.warn("[Audio] play() bloqueado:", err));
+  precargarSiguiente(idx + 1);
 
   // Panel inferior
   document.getElementById("playerTitulo").textContent = track.titulo;
@@ -244,6 +247,27 @@ function escHtml(s) {
     .replace(/>/g, "&gt;");
 }
 
+/**
+ * Descarga por adelantado la pista siguiente para que el cambio al terminar
+ * la actual no tenga hueco (el navegador la sirve luego desde su caché).
+ */
+function precargarSiguiente(idx) {
+  if (idx >= _playlistActual.length) return;
+  if (!_precarga) _precarga = new Audio();
+  _precarga.preload = "auto";
+  _precarga.src = urlPista(_playlistActual[idx]);
+}
+
+/**
+ * URL de la pista; en conexiones lentas o con ahorro de datos pide la
+ * versión de 64 kbps (el servidor sirve el original si aún no existe).
+ */
+function urlPista(track) {
+  const conn = navigator.connection;
+  const lenta = conn && (conn.saveData || ["slow-2g", "2g", "3g"].includes(conn.effectiveType));
+  return lenta ? `${track.url}?calidad=64` : track.url;
+}
+
 /**
  * Carga un Audio temporal sólo para leer la duración y actualizarla en la lista.
  * No reproduce nada.
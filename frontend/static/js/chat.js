@@ -2,7 +2,7 @@
    CarnavalPlay — Chat 24/7
    ══════════════════════════════════════════════════════════════════ */
 
-const socket = io({ transports: ["websocket", "polling"] });
+const socket = CP.socket();
 let salaActual = "general";
 
 document.addEventListener("DOMContentLoaded", () => {
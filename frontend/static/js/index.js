@@ -329,9 +329,10 @@ function renderLetras(letras) {
     card.querySelector(".letra-card-titulo").textContent = l.titulo || "Sin título";
     card.querySelector(".letra-card-grupo").textContent  = l.grupo_nombre || "";
 
-    const preview = (l.contenido || "").trim().substring(0, 130);
-    card.querySelector(".letra-card-preview").textContent = preview
-      ? preview + (l.contenido?.length > 130 ? "…" : "")
+    // extracto: principio de la letra o fragmento de la búsqueda (\x02…\x03 = coincidencia)
+    const extracto = (l.extracto || "").trim();
+    card.querySelector(".letra-card-preview").innerHTML = extracto
+      ? _resaltarExtracto(extracto)
       : "(sin contenido)";
 
     card.querySelector(".btn-ver-letra").addEventListener("click", () => abrirLetra(l));
@@ -358,19 +359,30 @@ function abrirLetra(l) {
   document.getElementById("letraModalTitulo").textContent = l.titulo || "Sin título";
   document.getElementById("letraModalGrupo").textContent  = l.grupo_nombre || "";
 
-  // Formatear contenido: saltos de línea → párrafos
+  // El listado solo trae el extracto: el texto completo se pide al abrir
   const contenidoEl = document.getElementById("letraModalContenido");
   if (contenidoEl) {
-    const lineas = (l.contenido || "(Sin contenido)").split("\n");
-    contenidoEl.innerHTML = lineas
-      .map(line => line.trim() ? `<p>${_escHtml(line)}</p>` : `<br>`)
-      .join("");
+    contenidoEl.innerHTML = `<div class="loading-state"><div class="spinner"></div></div>`;
+    CP.get(`/api/letras/${l.id}`)
+      .then(letra => { contenidoEl.innerHTML = _parrafosLetra(letra.contenido); })
+      .catch(() => { contenidoEl.innerHTML = "<p>No se pudo cargar la letra.</p>"; });
   }
 
   document.getElementById("letraModal").style.display = "flex";
   document.body.style.overflow = "hidden";
 }
 
+// Formatear contenido: saltos de línea → párrafos
+function _parrafosLetra(contenido) {
+  return (contenido || "(Sin contenido)").split("\n")
+    .map(line => line.trim() ? `<p>${_escHtml(line)}</p>` : `<br>`)
+    .join("");
+}
+
+function _resaltarExtracto(texto) {
+  return _escHtml(texto).replace(/\x02/g, "<mark>").replace(/\x03/g, "</mark>");
+}
+
 function cerrarLetraModal() {
   const modal = document.getElementById("letraModal");
   if (modal) modal.style.display = "none";
@@ -106,9 +106,10 @@ function renderLetras(letras) {
     card.querySelector(".letra-card-titulo").textContent = l.titulo || "Sin título";
     card.querySelector(".letra-card-grupo").textContent  = l.grupo_nombre || "";
 
-    const preview = (l.contenido || "").trim().substring(0, 140);
-    card.querySelector(".letra-card-preview").textContent =
-      preview ? (preview + (l.contenido?.length > 140 ? "…" : "")) : "(sin contenido)";
+    // extracto: principio de la letra o fragmento de la búsqueda (\x02…\x03 = coincidencia)
+    const extracto = (l.extracto || "").trim();
+    card.querySelector(".letra-card-preview").innerHTML =
+      extracto ? resaltarExtracto(extracto) : "(sin contenido)";
 
     card.querySelector(".btn-ver-letra").addEventListener("click", () => abrirModal(l));
     grid.appendChild(card);
@@ -134,12 +135,19 @@ function abrirModal(l) {
   document.getElementById("letraModalTitulo").textContent = l.titulo || "Sin título";
   document.getElementById("letraModalGrupo").textContent  = l.grupo_nombre || "";
 
+  // El listado solo trae el extracto: el texto completo se pide al abrir
   const contenidoEl = document.getElementById("letraModalContenido");
   if (contenidoEl) {
-    contenidoEl.innerHTML = (l.contenido || "(Sin contenido)")
-      .split("\n")
-      .map(line => line.trim() ? `<p>${escHtml(line)}</p>` : "<br>")
-      .join("");
+    contenidoEl.innerHTML = `<div class="loading-state"><div class="spinner"></div></div>`;
+    fetch(`/api/letras/${l.id}`)
+      .then(r => { if (!r.ok) throw new Error(r.status); return r.json(); })
+      .then(letra => {
+        contenidoEl.innerHTML = (letra.contenido || "(Sin contenido)")
+          .split("\n")
+          .map(line => line.trim() ? `<p>${escHtml(line)}</p>` : "<br>")
+          .join("");
+      })
+      .catch(() => { contenidoEl.innerHTML = "<p>No se pudo cargar la letra.</p>"; });
   }
 
   document.getElementById("letraModal").style.display = "flex";
@@ -152,6 +160,10 @@ function cerrarModal() {
   document.body.style.overflow = "";
 }
 
+function resaltarExtracto(texto) {
+  return escHtml(texto).replace(/\x02/g, "<mark>").replace(/\x03/g, "</mark>");
+}
+
 function escHtml(s) {
   return (s || "")
     .replace(/&/g, "&amp;")
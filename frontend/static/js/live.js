@@ -1,16 +1,28 @@
 /* ══════════════════════════════════════════════════════════════════
    Carnavalix — Canal Live 24/7
    Usa iframe estático (igual que player.html) para máxima compatibilidad.
-   Sincroniza con el servidor cada 30 s actualizando el src del iframe.
+   El servidor emite live_cambio con el estado completo en cuanto cambia el
+   vídeo; el sondeo de /live/estado es solo una red de seguridad.
+   El estado trae `siguiente` (cabeza de la cola de emisión): su embed se
+   carga oculto poco antes del cambio y al llegar live_cambio solo se muestra.
+   En modo determinista (estado.modo) el estado es una función del reloj:
+   se descarga /live/horario una vez y el cambio de vídeo se calcula aquí,
+   con un temporizador al final de cada pase; live_cambio solo avisa de que
+   hay overrides nuevos.
    Socket.io propio: NO depende de chat.js (que es para /chat).
    ══════════════════════════════════════════════════════════════════ */
 
 let _estadoActual = null;
 let _syncInterval = null;
-const SYNC_INTERVAL_MS = 30000; // sincronizar cada 30 segundos
+let _precarga = null;          // { youtube_id, iframe } del siguiente vídeo, oculto
+let _timerPrecarga = null;
+let _horario = null;           // modo determinista: /live/horario preparado (ver cargarHorario)
+let _timerHorario = null;
+const PRECARGA_ANTES_S = 20;   // precargar el siguiente embed 20 s antes del cambio
+const SYNC_INTERVAL_MS = 300000; // resincronizar cada 5 min (los cambios llegan por socket)
 
 // Socket propio para el live (no comparte con /chat)
-const _socket = io({ transports: ["websocket", "polling"] });
+const _socket = CP.socket();
 
 document.addEventListener("DOMContentLoaded", iniciarLive);
 
@@ -25,32 +37,38 @@ async function iniciarLive() {
     setTimeout(async () => {
       const e2 = await obtenerEstado();
       if (e2) {
-        _estadoActual = e2;
-        cargarPlayer(e2.youtube_id, e2.segundos_transcurridos);
-        actualizarInfoPanel(e2);
+        aplicarEstado(e2);
         _syncInterval = setInterval(sincronizarEstado, SYNC_INTERVAL_MS);
       }
     }, 15000);
     return;
   }
 
-  _estadoActual = estado;
-  cargarPlayer(estado.youtube_id, estado.segundos_transcurridos);
-  actualizarInfoPanel(estado);
+  aplicarEstado(estado);
 
   // Polling de sincronización
   _syncInterval = setInterval(sincronizarEstado, SYNC_INTERVAL_MS);
 }
 
 // ── Player ────────────────────────────────────────────────────────────────────
+function urlEmbed(ytId, start, autoplay) {
+  // enablejsapi=1: el embed precargado se arranca con postMessage al mostrarlo
+  return `https://www.youtube.com/embed/${ytId}?autoplay=${autoplay ? 1 : 0}&start=${start}&controls=0&rel=0&modestbranding=1&iv_load_policy=3&disablekb=1&enablejsapi=1`;
+}
+
 function cargarPlayer(ytId, seekTo) {
   const iframe = document.getElementById("livePlayer");
   const loading = document.getElementById("liveLoading");
   if (!iframe) return;
 
   const start = Math.max(0, Math.floor(seekTo || 0));
+  if (_precarga && _precarga.youtube_id === ytId) {
+    mostrarPrecarga(iframe, start);
+    if (loading) loading.style.display = "none";
+    return;
+  }
   // controls=0 oculta la barra de progreso → comportamiento de canal TV
-  iframe.src = `https://www.youtube.com/embed/${ytId}?autoplay=1&start=${start}&controls=0&rel=0&modestbranding=1&iv_load_policy=3&disablekb=1`;
+  iframe.src = urlEmbed(ytId, start, true);
 
   // Ocultar spinner cuando cargue el iframe
   iframe.onload = () => {
@@ -59,13 +77,57 @@ function cargarPlayer(ytId, seekTo) {
   if (loading) loading.style.display = "flex";
 }
 
+// ── Precarga del siguiente vídeo de la cola ──────────────────────────────────
+function programarPrecarga(estado) {
+  clearTimeout(_timerPrecarga);
+  const sig = estado.siguiente;
+  if (!sig || !estado.duracion) return;
+  const quedan = estado.duracion - (estado.segundos_transcurridos || 0) - PRECARGA_ANTES_S;
+  _timerPrecarga = setTimeout(() => precargar(sig.youtube_id), Math.max(0, quedan) * 1000);
+}
+
+function precargar(ytId) {
+  const actual = document.getElementById("livePlayer");
+  if (!actual || _precarga?.youtube_id === ytId) return;
+  _precarga?.iframe.remove();
+  const iframe = actual.cloneNode(false);
+  iframe.removeAttribute("id");
+  iframe.style.visibility = "hidden";     // no display:none: el navegador no lo cargaría
+  iframe.src = urlEmbed(ytId, 0, false);
+  actual.after(iframe);
+  _precarga = { youtube_id: ytId, iframe };
+}
+
+function mostrarPrecarga(anterior, start) {
+  const { iframe } = _precarga;
+  _precarga = null;
+  iframe.id = "livePlayer";
+  iframe.style.visibility = "";
+  anterior.remove();
+  const orden = (func, args = []) =>
+    iframe.contentWindow?.postMessage(JSON.stringify({ event: "command", func, args }), "*");
+  if (start > 2) orden("seekTo", [start, true]);
+  orden("playVideo");
+}
+
 // ── Sincronización con el servidor ───────────────────────────────────────────
 async function sincronizarEstado() {
+  if (_horario) return cargarHorario();
   const estado = await obtenerEstado();
-  if (!estado) return;
+  if (estado) aplicarEstado(estado);
+}
+
+function alCambiar(estado) {
+  if (estado?.modo === "determinista") cargarHorario();   // trae los overrides nuevos
+  else if (estado) aplicarEstado(estado);
+}
 
-  // Si el vídeo cambió, recargar el player con el nuevo vídeo y seek
-  if (!_estadoActual || estado.youtube_id !== _estadoActual.youtube_id) {
+function aplicarEstado(estado) {
+  if (estado.modo === "determinista" && !_horario) cargarHorario();
+  programarPrecarga(estado);
+  // Si el vídeo cambió (o se reprogramó el mismo), recargar el player con el nuevo vídeo y seek
+  if (!_estadoActual || estado.youtube_id !== _estadoActual.youtube_id
+      || estado.started_at !== _estadoActual.started_at) {
     _estadoActual = estado;
     actualizarInfoPanel(estado);
     cargarPlayer(estado.youtube_id, estado.segundos_transcurridos);
@@ -77,6 +139,89 @@ async function sincronizarEstado() {
   _estadoActual = estado;
 }
 
+// ── Modo determinista: el estado se calcula del reloj ────────────────────────
+async function cargarHorario() {
+  try {
+    const res = await fetch("/live/horario");
+    if (!res.ok) return;
+    const h = await res.json();
+    const total = h.videos.reduce((t, v) => t + v[2] + h.margen, 0);
+    let t = 0;
+    _horario = {
+      ...h,
+      total,
+      desfase: h.ahora_ms - Date.now(),       // reloj del servidor − reloj local
+      videos: h.videos.map(([youtube_id, titulo, duracion, canal_fuente]) => {
+        const v = { youtube_id, titulo, duracion, canal_fuente, desde: t };
+        t += duracion + h.margen;
+        return v;
+      }),
+    };
+    tickHorario();
+  } catch { /* se reintenta en la próxima sincronización */ }
+}
+
+// Mismo cálculo que backend/services/live_horario._en: { video, empieza, termina } en ms
+function enHorario(h, ahora) {
+  let activo = null;
+  for (const o of h.overrides) if (o.inicio_ms <= ahora && ahora < o.fin_ms) activo = o;
+
+  let video, empieza, termina;
+  if (activo) {
+    video = activo;
+    if (activo.duracion) {
+      const pase = (activo.duracion + h.margen) * 1000;
+      empieza = activo.inicio_ms + Math.floor((ahora - activo.inicio_ms) / pase) * pase;
+      termina = Math.min(empieza + pase, activo.fin_ms);
+    } else {
+      empieza = activo.inicio_ms;
+      termina = activo.fin_ms;
+    }
+  } else if (h.total) {
+    const rel = (ahora - h.inicio_ms) / 1000;
+    const vuelta = Math.floor(rel / h.total);
+    const resto = rel - vuelta * h.total;
+    let lo = 0, hi = h.videos.length - 1;
+    while (lo < hi) {                       // último vídeo con desde <= resto
+      const mid = (lo + hi + 1) >> 1;
+      if (h.videos[mid].desde <= resto) lo = mid; else hi = mid - 1;
+    }
+    video = h.videos[lo];
+    empieza = h.inicio_ms + (vuelta * h.total + video.desde) * 1000;
+    termina = empieza + (video.duracion + h.margen) * 1000;
+  } else {
+    return null;
+  }
+
+  for (const o of h.overrides) if (ahora < o.inicio_ms && o.inicio_ms < termina) termina = o.inicio_ms;
+  return { video, empieza, termina };
+}
+
+function tickHorario() {
+  clearTimeout(_timerHorario);
+  const h = _horario;
+  const ahora = Date.now() + h.desfase;
+  const actual = enHorario(h, ahora);
+  if (!actual) return;
+  const { video, empieza, termina } = actual;
+  const sig = enHorario(h, termina);
+  const transcurridos = Math.floor((ahora - empieza) / 1000);
+  aplicarEstado({
+    modo: "determinista",
+    youtube_id: video.youtube_id,
+    titulo: video.titulo,
+    duracion: video.duracion,
+    canal_fuente: video.canal_fuente,
+    started_at: new Date(empieza).toISOString().slice(0, 19),   // = isoformat() del servidor
+    segundos_transcurridos: video.duracion ? Math.min(transcurridos, video.duracion - 1) : 0,
+    siguiente: sig ? {
+      youtube_id: sig.video.youtube_id, titulo: sig.video.titulo,
+      duracion: sig.video.duracion, canal_fuente: sig.video.canal_fuente,
+    } : null,
+  });
+  _timerHorario = setTimeout(tickHorario, termina - ahora + 50);
+}
+
 // ── API estado ────────────────────────────────────────────────────────────────
 async function obtenerEstado() {
   try {
@@ -137,10 +282,10 @@ function iniciarChat(sala) {
   });
   _socket.on("sistema", (d) => añadirSistema(d.mensaje));
 
-  // El servidor cambió el vídeo → sincronizar player
-  _socket.on("live_cambio", () => {
-    sincronizarEstado();
-  });
+  // El servidor cambió el vídeo → el evento trae el estado, sin pedir /live/estado
+  _socket.on("live_cambio", alCambiar);
+  // Tras una reconexión pudo perderse algún cambio
+  _socket.io.on("reconnect", sincronizarEstado);
 
   // Enviar mensajes
   const input = document.getElementById("chatInput");
@@ -215,8 +360,7 @@ function escHtml(s) {
 
 // ── Botón admin: siguiente vídeo ──────────────────────────────────────────────
 document.getElementById("btnLiveSiguientePub")?.addEventListener("click", async () => {
-  await fetch("/live/siguiente", { method: "POST" });
-  setTimeout(sincronizarEstado, 1500);
+  await fetch("/live/siguiente", { method: "POST" });   // el cambio llega por live_cambio
 });
 
 // Indicador de conexión (opcional debug)
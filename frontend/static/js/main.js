@@ -67,6 +67,12 @@ window.CP = {
     return res.json();
   },
 
+  /** Conexión Socket.IO con los transportes que admite el servidor (meta socketio-transportes) */
+  socket() {
+    const meta = document.querySelector('meta[name="socketio-transportes"]');
+    return io({ transports: (meta?.content || "websocket,polling").split(",") });
+  },
+
   async post(url, body) {
     const res = await fetch(url, {
       method: "POST",
@@ -6,11 +6,15 @@ document.addEventListener("DOMContentLoaded", async () => {
   const ytId = window.YOUTUBE_ID;
   if (!ytId) return;
 
-  await Promise.all([
-    cargarInfoVideo(ytId),
-    cargarLetras(ytId),
-    cargarRelacionados(ytId),
-  ]);
+  // Una sola petición: vídeo + letras + relacionados
+  try {
+    const video = await CP.get(`/api/videos/yt/${encodeURIComponent(ytId)}`);
+    mostrarInfoVideo(video);
+    if (video.letras?.length) renderLetras(video.letras);
+    renderRelacionados(video.relacionados || [], ytId);
+  } catch (e) {
+    console.warn("Error cargando vídeo:", e);
+  }
 
   initEstrellas();
   initFavorito(ytId);
@@ -19,56 +23,31 @@ document.addEventListener("DOMContentLoaded", async () => {
 });
 
 // ── Info del vídeo ─────────────────────────────────────────────────
-async function cargarInfoVideo(ytId) {
-  try {
-    // Buscar por youtube_id
-    const data = await CP.get(`/api/videos/?q=${ytId}&per_page=1`);
-    const video = data.videos?.[0];
-    if (!video) return;
-
-    document.title = `${video.titulo} · CarnavalPlay`;
-    document.getElementById("playerTitulo").textContent = video.titulo;
-    document.getElementById("metaAño").textContent = video.año || "";
-    document.getElementById("metaModalidad").textContent = video.modalidad || "";
-    document.getElementById("metaFase").textContent = video.fase || "";
-    document.getElementById("metaGrupo").textContent = video.grupo_nombre || "";
-
-    // Rating
-    const starsEl = document.getElementById("starsInput");
-    starsEl.dataset.videoId = video.id;
-    document.getElementById("ratingMedia").textContent =
-      video.total_votos > 0
-        ? `${video.puntuacion_media} / 5 (${video.total_votos} votos)`
-        : "Sin votos aún";
-
-    // Odysee
-    if (video.odysee_url) {
-      const panel = document.getElementById("playerOdysee");
-      panel.style.display = "block";
-      document.getElementById("odyseeLink").href = video.odysee_url;
-    }
-  } catch (e) {
-    console.warn("Error cargando info vídeo:", e);
+function mostrarInfoVideo(video) {
+  document.title = `${video.titulo} · CarnavalPlay`;
+  document.getElementById("playerTitulo").textContent = video.titulo;
+  document.getElementById("metaAño").textContent = video.año || "";
+  document.getElementById("metaModalidad").textContent = video.modalidad || "";
+  document.getElementById("metaFase").textContent = video.fase || "";
+  document.getElementById("metaGrupo").textContent = video.grupo_nombre || "";
+
+  // Rating
+  const starsEl = document.getElementById("starsInput");
+  starsEl.dataset.videoId = video.id;
+  document.getElementById("ratingMedia").textContent =
+    video.total_votos > 0
+      ? `${video.puntuacion_media} / 5 (${video.total_votos} votos)`
+      : "Sin votos aún";
+
+  // Odysee
+  if (video.odysee_url) {
+    const panel = document.getElementById("playerOdysee");
+    panel.style.display = "block";
+    document.getElementById("odyseeLink").href = video.odysee_url;
   }
 }
 
 // ── Letras ─────────────────────────────────────────────────────────
-async function cargarLetras(ytId) {
-  try {
-    // Primero necesitamos el ID interno del vídeo
-    const data = await CP.get(`/api/videos/?q=${ytId}&per_page=1`);
-    const video = data.videos?.[0];
-    if (!video) return;
-
-    const letras = await CP.get(`/api/letras/por-video/${video.id}`);
-    if (!letras.length) return;
-
-    renderLetras(letras);
-  } catch (e) {
-    console.warn("Error cargando letras:", e);
-  }
-}
-
 function renderLetras(letras) {
   const body = document.getElementById("letrasBody");
   const tabsEl = document.getElementById("letrasTabs");
@@ -124,46 +103,34 @@ function escapeHtml(str) {
 }
 
 // ── Vídeos relacionados ────────────────────────────────────────────
-async function cargarRelacionados(ytId) {
-  try {
-    const data = await CP.get(`/api/videos/?q=${ytId}&per_page=1`);
-    const video = data.videos?.[0];
-    if (!video) return;
-
-    const rel = await CP.get(
-      `/api/videos/?modalidad=${video.modalidad || ""}&per_page=8&page=1`
-    );
-
-    const grid = document.getElementById("relacionadosGrid");
-    if (!grid) return;
-    grid.innerHTML = "";
-
-    rel.videos
-      .filter(v => v.youtube_id !== ytId)
-      .slice(0, 6)
-      .forEach(v => {
-        const a = document.createElement("a");
-        a.href = `/player/${v.youtube_id}`;
-        a.className = "card";
-        a.innerHTML = `
-          <div class="card-thumb" style="aspect-ratio:16/9">
-            <img class="card-img" src="${v.thumbnail}" alt="${escapeHtml(v.titulo)}" loading="lazy"/>
-            <div class="card-overlay"><span class="card-play">▶</span></div>
-            <span class="card-tipo">${v.modalidad || ""}</span>
-          </div>
-          <div class="card-info">
-            <h3 class="card-titulo">${escapeHtml(v.titulo)}</h3>
-            <div class="card-meta">
-              <span>${v.año || ""}</span>
-              <span>${v.fase || ""}</span>
-            </div>
+function renderRelacionados(relacionados, ytId) {
+  const grid = document.getElementById("relacionadosGrid");
+  if (!grid) return;
+  grid.innerHTML = "";
+
+  relacionados
+    .filter(v => v.youtube_id !== ytId)
+    .slice(0, 6)
+    .forEach(v => {
+      const a = document.createElement("a");
+      a.href = `/player/${v.youtube_id}`;
+      a.className = "card";
+      a.innerHTML = `
+        <div class="card-thumb" style="aspect-ratio:16/9">
+          <img class="card-img" src="${v.thumbnail}" alt="${escapeHtml(v.titulo)}" loading="lazy"/>
+          <div class="card-overlay"><span class="card-play">▶</span></div>
+          <span class="card-tipo">${v.modalidad || ""}</span>
+        </div>
+        <div class="card-info">
+          <h3 class="card-titulo">${escapeHtml(v.titulo)}</h3>
+          <div class="card-meta">
+            <span>${v.año || ""}</span>
+            <span>${v.fase || ""}</span>
           </div>
-        `;
-        grid.appendChild(a);
-      });
-  } catch (e) {
-    console.warn("Error relacionados:", e);
-  }
+        </div>
+      `;
+      grid.appendChild(a);
+    });
 }
 
 // ── Sistema de estrellas ───────────────────────────────────────────